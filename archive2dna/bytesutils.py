@@ -14,33 +14,54 @@ import hashlib
 
 
 def sha256(filename):
-    """Computes sha256 checksum of file."""
+    """Computes sha256 checksum of file, or of data if filename is bytes-like."""
     h = hashlib.sha256()
+    if isinstance(filename, (bytes, bytearray, memoryview)):
+        h.update(filename)
+        return h.hexdigest()
     with open(filename, "rb") as f:
         for block in iter(lambda: f.read(4096), b""):
             h.update(block)
     return h.hexdigest()
 
 
-def split_bytes_in_four(b):
-    """Split each byte in four bytes by pairs of bits, corresponding to a DNA base each"""
-    b2 = bytes()
-    for x in b:
-        bits = bin(x).lstrip("0b").zfill(8)
-        b2 += int(bits[0:2], 2).to_bytes(1, byteorder="big")
-        b2 += int(bits[2:4], 2).to_bytes(1, byteorder="big")
-        b2 += int(bits[4:6], 2).to_bytes(1, byteorder="big")
-        b2 += int(bits[6:8], 2).to_bytes(1, byteorder="big")
-    return b2
-
-
-def merge_four_bytes_in_one(b):
-    """Merges groups of 4 bytes together (taking the 2 lower bits of each)."""
-    b2 = bytes()
-    for i in range(len(b) // 4):
-        bits = ""
-        for j in range(4):
-            bitsj = bin(b[4 * i + j]).lstrip("0b").zfill(8)
-            bits += bitsj[6:8]
-        b2 += int(bits, 2).to_bytes(1, byteorder="big")
-    return b2
+# Lookup table splitting a byte in four pairs of bits (one byte per pair, i.e. per DNA base)
+# e.g. split_table[0x1B] == b"\x00\x01\x02\x03"
+split_table = [bytes([(x >> 2 * (3 - j)) & 3 for j in range(4)]) for x in range(256)]
+
+# Translation tables derived from split_table for bulk operations:
+# - split_tables[j] maps a byte to its j-th pair of bits
+# - merge_tables[j] maps a byte to its 2 lower bits, shifted to the position of the j-th pair
+split_tables = [bytes([split_table[x][j] for x in range(256)]) for j in range(4)]
+merge_tables = [bytes([(x & 3) << 2 * (3 - j) for x in range(256)]) for j in range(4)]
+
+
+def split_bytes_in_four(b, out=None):
+    """Split each byte in four bytes by pairs of bits, corresponding to a DNA base each.
+    The result is written into out (bytearray or memoryview of length 4*len(b)) if
+    provided, else into a new bytearray, which is returned."""
+    if not isinstance(b, (bytes, bytearray)):
+        b = bytes(b)
+    if out is None:
+        out = bytearray(4 * len(b))
+    for j in range(4):
+        out[j::4] = b.translate(split_tables[j])
+    return out
+
+
+def merge_four_bytes_in_one(b, out=None):
+    """Merges groups of 4 bytes together (taking the 2 lower bits of each).
+    The result is written into out (bytearray or memoryview of length len(b)//4) if
+    provided, else into a new bytearray, which is returned."""
+    if not isinstance(b, (bytes, bytearray)):
+        b = bytes(b)
+    n = len(b) // 4
+    # pairs of bits of a byte are disjoint: they are combined with a bitwise OR
+    # over whole sequences (as big integers)
+    merged = 0
+    for j in range(4):
+        merged |= int.from_bytes(b[j : 4 * n : 4].translate(merge_tables[j]), "big")
+    if out is None:
+        out = bytearray(n)
+    out[:n] = merged.to_bytes(n, "big")
+    return out
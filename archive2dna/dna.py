@@ -13,6 +13,7 @@
 import hashlib
 import array
 import random
+import sys
 
 #############################
 ### DNA to bits and bytes ###
@@ -27,36 +28,57 @@ for kk, v in bits2dna_dict.items():
     dna2bits_dict[v] = kk
 
 
+# Lookup table between bytes and groups of four DNA bases (4-mers),
+# e.g. byte2dna_table[0x1B] == "ATGC"
+byte2dna_table = []
+for x in range(256):
+    tmp = bin(x).lstrip("0b").zfill(8)
+    byte2dna_table.append(
+        "".join([bits2dna_dict[tmp[2 * j : 2 * j + 2]] for j in range(4)])
+    )
+
+# Translation tables derived from byte2dna_table for bulk conversions:
+# - byte2base_tables[j] maps a byte to the j-th base of its 4-mer (ASCII)
+# - dna2byte_tables[j] maps the j-th base of a 4-mer to its contribution to the byte
+byte2base_tables = [
+    bytes([ord(byte2dna_table[x][j]) for x in range(256)]) for j in range(4)
+]
+dna2byte_tables = [
+    bytes.maketrans(b"ATGC", bytes([v << 2 * (3 - j) for v in range(4)]))
+    for j in range(4)
+]
+
+
 # Conversion from bytes to DNA and reeerse
 
 
 def bytes2dna(b):
     """Converts a byte (type:bytes) to a DNA sequence (type:string)."""
-    out = ""
-    if b is not None:
-        for x in b:
-            tmp = bin(x).lstrip("0b").zfill(8)
-            out += bits2dna_dict[tmp[0:2]]
-            out += bits2dna_dict[tmp[2:4]]
-            out += bits2dna_dict[tmp[4:6]]
-            out += bits2dna_dict[tmp[6:8]]
-        return out
-    else:
+    if b is None:
         return ""
+    b = bytes(b)
+    out = bytearray(4 * len(b))
+    for j in range(4):
+        out[j::4] = b.translate(byte2base_tables[j])
+    return out.decode("ascii")
 
 
 def dna2bytes(d):
-    """Converts a DNA sequence (type:string) to bytes (type:bytes)."""
+    """Converts a DNA sequence (type:string) to bytes (type:bytes).
+    Trailing bases that do not form a complete group of four are ignored."""
     if d == None or d == "None":
         return None
-    out = b""
-    for i in range(int(len(d) / 4)):
-        bits = dna2bits_dict[d[4 * i]]
-        bits += dna2bits_dict[d[4 * i + 1]]
-        bits += dna2bits_dict[d[4 * i + 2]]
-        bits += dna2bits_dict[d[4 * i + 3]]
-        out += int(bits, 2).to_bytes(len(bits) // 8, byteorder="big")
-    return out
+    n = len(d) // 4
+    ascii_dna = d[: 4 * n].encode("ascii")
+    if len(ascii_dna.translate(None, b"ATGC")) != 0:
+        raise ValueError("Invalid DNA sequence: only bases A, T, G and C are allowed")
+    # The contributions of the four bases of each 4-mer use disjoint bits of the
+    # output byte: they are combined with a bitwise OR over whole sequences
+    # (as big integers), which avoids a Python loop over bytes.
+    out = 0
+    for j in range(4):
+        out |= int.from_bytes(ascii_dna[j::4].translate(dna2byte_tables[j]), "big")
+    return out.to_bytes(n, "big")
 
 
 def bits2dna(b):
@@ -100,36 +122,124 @@ def get_bytearray(a):
 
 
 # Merge and split bases in arrays
+#
+# Sequences of bases are processed in batches (e.g. all lines of a block):
+# they are concatenated and each base position within a group is handled for
+# all groups at once, using strided slices and bitwise operations on big
+# integers. Each group of bases is stored in a big-endian lane of the size of
+# the returned array items, lanes are wide enough so that no carry occurs.
+
+
+def symbols_typecode(block_size):
+    """Returns the typecode of the smallest unsigned array able to store symbols
+    made of block_size DNA bases (2 bits each)."""
+    for typecode in "BHILQ":
+        if array.array(typecode).itemsize * 4 >= block_size:
+            return typecode
+    raise ValueError("Symbols of {n} bases are not supported".format(n=block_size))
+
+
+def _bases_bytes(a):
+    """Returns a sequence of DNA bases as a bytes-like object (one byte per base)."""
+    if isinstance(a, (bytes, bytearray)):
+        return a
+    if isinstance(a, array.array) and a.itemsize == 1:
+        return a
+    return bytes(list(a))
+
+
+def _to_lanes(b, itemsize):
+    """Copies each byte of b into the lower byte of a big-endian lane of itemsize bytes."""
+    if itemsize == 1:
+        return b
+    out = bytearray(itemsize * len(b))
+    out[itemsize - 1 :: itemsize] = b
+    return out
+
+
+def merge_bases_2d(a, block_size=7):
+    """Batched merge_bases: converts each sequence of single DNA bases of the list a
+    (e.g. all lines of a block) into an array of bases grouped by block_size.
+    The group of last bases of a sequence is padded with 0's if its length is not
+    a multiple of block_size. Returned arrays are unsigned (see symbols_typecode)."""
+    typecode = symbols_typecode(block_size)
+    itemsize = array.array(typecode).itemsize
+    counts = []
+    parts = []
+    for x in a:
+        x = _bases_bytes(x)
+        n = len(x) // block_size
+        if len(x) % block_size != 0:
+            n += 1
+            parts.append(x)
+            parts.append(bytes(n * block_size - len(x)))
+        else:
+            parts.append(x)
+        counts.append(n)
+    flat = b"".join(parts)
+    m = sum(counts)
+    packed = 0
+    for j in range(block_size):
+        lanes = _to_lanes(flat[j::block_size], itemsize)
+        packed |= int.from_bytes(lanes, "big") << 2 * (block_size - j - 1)
+    symbols = array.array(typecode)
+    symbols.frombytes(packed.to_bytes(itemsize * m, "big"))
+    if itemsize > 1 and sys.byteorder == "little":
+        symbols.byteswap()
+    out = []
+    start = 0
+    for n in counts:
+        out.append(symbols[start : start + n])
+        start += n
+    return out
+
+
+def split_bases_2d(a, block_size=7):
+    """Batched split_bases: converts each array of DNA bases grouped by block_size
+    of the list a into an array of single DNA bases (array.array('b'))."""
+    typecode = symbols_typecode(block_size)
+    itemsize = array.array(typecode).itemsize
+    counts = []
+    symbols = array.array(typecode)
+    for x in a:
+        counts.append(len(x))
+        if isinstance(x, array.array) and x.typecode == typecode:
+            symbols.extend(x)
+        elif isinstance(x, (bytes, bytearray)) and itemsize == 1:
+            symbols.frombytes(x)
+        else:
+            symbols.fromlist(list(x))
+    m = len(symbols)
+    if itemsize > 1 and sys.byteorder == "little":
+        symbols.byteswap()
+    packed = int.from_bytes(symbols.tobytes(), "big")
+    mask = int.from_bytes((bytes(itemsize - 1) + b"\x03") * m, "big")
+    bases = bytearray(m * block_size)
+    for j in range(block_size):
+        lanes = ((packed >> 2 * (block_size - j - 1)) & mask).to_bytes(
+            itemsize * m, "big"
+        )
+        bases[j::block_size] = lanes[itemsize - 1 :: itemsize]
+    out = []
+    start = 0
+    for n in counts:
+        out.append(
+            array.array("b", bases[start * block_size : (start + n) * block_size])
+        )
+        start += n
+    return out
 
 
 def merge_bases(a, block_size=7):
     """Converta array of single DNA bases into array of bases grouped by block_size.
     Warning: works if array length is not a multiple of block_size,
     in this case the group of last bases is padded with 0's"""
-    blocks = len(a) // block_size
-    if len(a) % block_size != 0:
-        blocks += 1
-    out = array.array("i")
-    for i in range(blocks):
-        # last block may be shorter
-        block_range = min([block_size, len(a) - i * block_size])
-        n = 0
-        for j in range(block_range):
-            n += a[i * block_size + j] << 2 * (block_size - j - 1)
-        out.append(n)
-    return out
+    return array.array("i", merge_bases_2d([a], block_size=block_size)[0])
 
 
 def split_bases(a, block_size=7):
     """Converta array of DNA bases grouped by blocksize into array of single DNA bases"""
-    out = array.array("i")
-    for i in range(len(a)):
-        n = 0
-        for j in range(block_size):
-            base_j = a[i] >> 2 * (block_size - j - 1)
-            base_j = base_j & 3  # mask: keep two last bits
-            out.append(base_j)
-    return out
+    return array.array("i", split_bases_2d([a], block_size=block_size)[0])
 
 
 # Check DNA sequence vaidity
@@ -142,10 +252,61 @@ def stripDna(s):
 
 def isValidDna(s):
     """Checks wether the sting is a valid DNA sequence"""
-    for c in set(s):
-        if not c in "ATGC":
-            return False
-    return True
+    return len(s.encode("ascii", "replace").translate(None, b"ATGC")) == 0
+
+
+# Bulk conversion of DNA segments to bits and reverse
+
+# Translation tables between DNA bases (ASCII) and bits (one byte per base)
+# only the two lower bits of a byte are used to select a base
+bits2dna_table = bytes(
+    [ord(bits2dna_dict[bin(x & 3).lstrip("0b").zfill(2)]) for x in range(256)]
+)
+dna2bits_table = bytes.maketrans(b"ATGC", b"\x00\x01\x02\x03")
+
+
+def segments2bits(segments, length=0):
+    """Converts a list of DNA segments (strings) to a list of bytes, with one byte (2 bits)
+    per base. All segments are validated and translated in one pass.
+    Segments shorter than length are padded with zeros at their end."""
+    text = "".join(segments).encode("ascii", "replace")
+    if len(text.translate(None, b"ATGC")) != 0:
+        for i, s in enumerate(segments):
+            if not isValidDna(s):
+                raise ValueError("Invalid DNA segment {i}: {s}".format(i=i, s=s))
+    bits = text.translate(dna2bits_table)
+    out = []
+    start = 0
+    for s in segments:
+        stop = start + len(s)
+        if len(s) < length:
+            out.append(bits[start:stop] + bytes(length - len(s)))
+        else:
+            out.append(bits[start:stop])
+        start = stop
+    return out
+
+
+def bits2segments(columns):
+    """Converts a list of columns of bits (bytes-like objects, e.g. array.array('b'),
+    with one byte per base) to a list of DNA segments (strings) in one pass. Columns may
+    also be sequences of ints padded with None (e.g. rows of the SQL representation)."""
+    columns = [
+        (
+            col
+            if isinstance(col, (bytes, bytearray, memoryview, array.array))
+            else bytes(x for x in col if x is not None)
+        )
+        for col in columns
+    ]
+    text = b"".join(columns).translate(bits2dna_table).decode("ascii")
+    out = []
+    start = 0
+    for col in columns:
+        stop = start + len(col)
+        out.append(text[start:stop])
+        start = stop
+    return out
 
 
 #########################
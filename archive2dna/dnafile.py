@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# This file is part of archive2dna.
+#
+# archive2dna is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+# Foobar is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with archive2dna. If not, see <https://www.gnu.org/licenses/>
+#
+# Author : Jan Krause-Bilvin
+# First release: 2022-02-02
+
+"""Compact binary file format for sets of DNA segments (2 bits per base).
+
+Layout of a file:
+    - header: MAGIC, header length (uint32), header (JSON: parameters, primer, ...)
+    - segments: each segment packed with 4 bases per byte (see dna.dna2bytes),
+      padded with A's to a whole number of bytes
+    - table: for each segment, offset in file (uint64) and length in bases (uint32)
+    - trailer: table offset (uint64), segments count (uint64), MAGIC
+
+The table is written after the segments so that segments can be streamed. Any
+segment is then read by its ordinal without parsing the others, e.g. on a mmap.
+"""
+
+import json
+import mmap
+import struct
+
+from . import dna
+
+MAGIC = b"A2DNA2B1"
+header_struct = struct.Struct("<8sI")
+entry_struct = struct.Struct("<QI")
+trailer_struct = struct.Struct("<QQ8s")
+
+
+def is_dna_file(data):
+    """Checks wether data (bytes-like) starts as a binary DNA segments file."""
+    return bytes(data[: len(MAGIC)]) == MAGIC
+
+
+def write_segments(outfile, segments, header=None):
+    """Writes DNA segments (any iterable of strings) into binary file object outfile,
+    segment by segment. header is a dictionary saved in the file header (JSON).
+    Returns the number of segments written."""
+    header_bytes = json.dumps(header or {}).encode("utf-8")
+    outfile.write(header_struct.pack(MAGIC, len(header_bytes)))
+    outfile.write(header_bytes)
+    offset = header_struct.size + len(header_bytes)
+    table = bytearray()
+    for segment in segments:
+        padding = -len(segment) % 4
+        packed = dna.dna2bytes(segment + "A" * padding)
+        outfile.write(packed)
+        table += entry_struct.pack(offset, len(segment))
+        offset += len(packed)
+    outfile.write(table)
+    count = len(table) // entry_struct.size
+    outfile.write(trailer_struct.pack(offset, count, MAGIC))
+    return count
+
+
+class DnaFile:
+    """Read access to a binary DNA segments file (see write_segments).
+    data is a bytes-like object, typically a mmap (see open): segments are
+    only read and unpacked when accessed."""
+
+    def __init__(self, data):
+        self.data = data
+        if not is_dna_file(data):
+            raise ValueError("Not a binary DNA segments file")
+        if len(data) < header_struct.size + trailer_struct.size:
+            raise ValueError("Truncated binary DNA segments file")
+        magic, header_length = header_struct.unpack_from(data, 0)
+        start = header_struct.size
+        self.header = json.loads(bytes(data[start : start + header_length]))
+        self.table_offset, self.count, magic = trailer_struct.unpack_from(
+            data, len(data) - trailer_struct.size
+        )
+        if magic != MAGIC:
+            raise ValueError("Truncated binary DNA segments file")
+
+    @classmethod
+    def open(cls, f):
+        """Opens binary file object f using a read only mmap."""
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            return cls(data)
+        except ValueError:
+            data.close()
+            raise
+
+    def __len__(self):
+        return self.count
+
+    def segment(self, i):
+        """Returns DNA segment of ordinal i (string)."""
+        if i < 0:
+            i += self.count
+        if not 0 <= i < self.count:
+            raise IndexError("segment ordinal out of range")
+        offset, length = entry_struct.unpack_from(
+            self.data, self.table_offset + i * entry_struct.size
+        )
+        return dna.bytes2dna(self.data[offset : offset + (length + 3) // 4])[:length]
+
+    def __getitem__(self, i):
+        return self.segment(i)
+
+    def segments(self):
+        """Returns all DNA segments (list of strings), converted at once."""
+        table = self.data[
+            self.table_offset : self.table_offset + self.count * entry_struct.size
+        ]
+        entries = list(entry_struct.iter_unpack(table))
+        if len(entries) == 0:
+            return []
+        start = entries[0][0]
+        text = dna.bytes2dna(self.data[start : self.table_offset])
+        return [
+            text[4 * (offset - start) : 4 * (offset - start) + length]
+            for offset, length in entries
+        ]
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
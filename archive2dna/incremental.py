@@ -0,0 +1,282 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# This file is part of archive2dna.
+#
+# archive2dna is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+# Foobar is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with archive2dna. If not, see <https://www.gnu.org/licenses/>
+#
+# Author : Jan Krause-Bilvin
+# First release: 2022-02-02
+
+"""Incremental decoding of DNA reads as they arrive (e.g. from a running sequencer).
+
+Reads are added by batches: their inner code is decoded at once and decoded segments
+are kept per index (copies of a segment are counted, the most frequent one is used).
+The layout is read from countdowns as soon as they are consistent, and outer code
+decoding is tried on each block once its missing segments are few enough to be
+restored (missing segments are known erasures). Decoded blocks only keep their message
+bases, their reads are dropped.
+
+The package is recoverable once all blocks are decoded: sequencing may stop there.
+The number of blocks is known from a short last block, from the expected number of
+segments if given, else (zipped packages) once the decoded blocks form a valid zip.
+The decoder state may be saved to a binary DNA file (see dnafile) and resumed."""
+
+import io
+import os
+import math
+import logging
+import zipfile
+from collections import Counter
+
+from . import dna
+from . import dnafile
+from . import package
+from . import representation
+
+# Container attributes saved with the decoder state
+attributes = [
+    "inner_corrections",
+    "outer_corrections",
+    "segments_beyond_repair",
+    "segments_lost",
+]
+
+
+class IncrementalDecoder:
+    def __init__(self, container, n_segments=None):
+        """Decodes reads with the parameters of container (package.Container), which also
+        holds statistics. n_segments is the number of segments of the package, if known.
+        """
+        self.container = container
+        self.n_segments = n_segments
+        self.sizes = Counter()  # sizes of reads
+        self.copies = {}  # segment number -> Counter of decoded segments (bytes)
+        self.ends = Counter()  # segment number + countdown -> reads (countdown > 0)
+        self.decoded = {}  # block -> message bases of its data columns
+        self.attempts = {}  # block -> segments present at the last failed attempt
+
+    def add(self, segments):
+        """Adds a batch of DNA reads (strings, with primers). Returns the list of blocks
+        decoded thanks to this batch."""
+        c = self.container
+        segments = c.without_primers(list(segments))
+        if len(segments) == 0:
+            return []
+        self.sizes.update([len(x) for x in segments])
+
+        # inner code (segments are not padded, only the last one may be shorter)
+        columns = dna.segments2bits(segments)
+        c.data = representation.Representation.from_columns(
+            columns, range(len(columns)), [c.dN, len(columns)]
+        )
+        c.decode_inner_code()
+        indices, count_down = c.read_indexes()
+        for i, column in enumerate(c.data.data):
+            if count_down[i] != 0:
+                self.ends[indices[i] + count_down[i]] += 1
+            if self.block_of(indices[i]) not in self.decoded:
+                copies = self.copies.setdefault(indices[i], Counter())
+                copies[bytes(column["column"])] += 1
+        c.data = None
+
+        return [blk for blk in self.blocks() if self.decode_block(blk)]
+
+    def read_layout(self):
+        """Reads the layout from countdowns of the reads seen so far, each read voting for its
+        end (see Container.read_layout), if they support it (see Container.layout_supported)
+        and are consistent: each countdown ends on the last ecc column or on the last column
+        of a block, except on the last column of a short last block. Returns the number of segments of the package if known (else
+        None), or False if the layout is unknown.
+        """
+        c = self.container
+        targets = sorted(self.ends)
+        if len(targets) < 2:
+            return False
+        if c.vote_layout(self.ends) is None or not c.layout_supported():
+            return False
+        if c.dblocksize <= c.dnecso:
+            return False
+        ends = [c.dnecso - 1, c.dblocksize - 1]
+        others = [t for t in targets if t % c.dblocksize not in ends]
+        if len(others) > 1 or (len(others) == 1 and others[0] != targets[-1]):
+            return False
+        if len(others) == 1:
+            return targets[-1] + 1
+        return self.n_segments
+
+    def block_of(self, index):
+        if self.container.dblocksize is None:
+            return None
+        return index // self.container.dblocksize
+
+    def blocks(self):
+        """Returns blocks not decoded yet whose extent is known (see block_stop)."""
+        n_columns = self.read_layout()
+        if n_columns is False:
+            return []
+        return [
+            blk
+            for blk in range(max(self.ends) // self.container.dblocksize + 1)
+            if blk not in self.decoded and self.block_stop(blk) is not None
+        ]
+
+    def block_stop(self, blk):
+        """Returns the last column (excluded) of block blk, or None if unknown (the end of
+        the block has not been seen and the number of segments is unknown)."""
+        c = self.container
+        block_stop = (blk + 1) * c.dblocksize
+        n_columns = self.read_layout()
+        if n_columns:
+            return min([block_stop, n_columns])
+        if block_stop - 1 <= max(self.ends):
+            return block_stop
+        return None
+
+    def decode_block(self, blk):
+        """Tries to decode outer code of block blk, if its missing segments may be restored:
+        at most necso outer code symbols (missing segments are known erasures).
+        Returns True if the block is decoded."""
+        c = self.container
+        n_lines = c.dN
+        n_columns = self.read_layout()
+        block_start = blk * c.dblocksize
+        block_stop = self.block_stop(blk)
+        indexes = range(block_start, block_stop)
+
+        # most frequent copy of each segment, only the last one may be shorter
+        columns = {}
+        for i in indexes:
+            if i in self.copies:
+                column = self.copies[i].most_common(1)[0][0]
+                if len(column) == n_lines or (n_columns and i == n_columns - 1):
+                    columns[i] = column
+        missing = [i for i in indexes if i not in columns]
+        symbols = set([(i - block_start) // c.dmo for i in missing])
+        if len(symbols) > c.necso or self.attempts.get(blk) == len(columns):
+            return False
+
+        c.data = representation.Representation.from_columns(
+            [columns.get(i, bytes(n_lines)) for i in indexes],
+            indexes,
+            [n_lines, block_stop],
+        )
+        error, error_message = c.error, c.error_message
+        outer_corrections = c.outer_corrections
+        c.error = False
+        c.decode_outer_code_block(
+            blk,
+            package.RSCodec(c.necso, nsize=c.n),
+            erasures=[i - block_start for i in missing],
+        )
+        decoded = not c.error
+        if decoded:
+            line_offset = c.dnecsi + c.dI
+            self.decoded[blk] = [
+                bytes(c.data.getcolumn(i)[line_offset:n_lines])
+                for i in range(block_start + c.dnecso, block_stop)
+            ]
+            c.segments_lost += len(missing)
+            for i in indexes:
+                self.copies.pop(i, None)
+            logging.info("incremental decoding : block {blk} decoded".format(blk=blk))
+        else:
+            self.attempts[blk] = len(columns)
+            c.outer_corrections = outer_corrections
+        c.error, c.error_message = error, error_message
+        c.data = None
+        return decoded
+
+    def numblocks(self):
+        """Returns the number of blocks of the package if known, else None."""
+        c = self.container
+        n_columns = self.read_layout()
+        if n_columns is False:
+            return None
+        if n_columns is not None:
+            return int(math.ceil(n_columns / c.dblocksize))
+
+        # zipped package: decoded blocks up to the last block end seen form a valid zip
+        numblocks = (max(self.ends) + 1) // c.dblocksize
+        if not c.auto_zip or any([b not in self.decoded for b in range(numblocks)]):
+            return None
+        chunks = map(self.package_chunker(), range(numblocks))
+        try:
+            with zipfile.ZipFile(io.BytesIO(b"".join(chunks))) as zip_file:
+                if zip_file.testzip() is None:
+                    return numblocks
+        except zipfile.BadZipFile:
+            pass
+        return None
+
+    def recoverable(self):
+        """Returns True if all blocks are decoded, i.e. the whole package is recoverable."""
+        numblocks = self.numblocks()
+        return numblocks is not None and all(
+            [blk in self.decoded for blk in range(numblocks)]
+        )
+
+    def package_chunker(self):
+        return self.container.package_chunker(lambda blk: self.decoded[blk])
+
+    def write_binary(self, outfile=None):
+        """Writes binary data of the decoded package (see Container.write_package) into
+        binary file object outfile, or returns it if outfile is None.
+        Raises ValueError if the package is not recoverable yet."""
+        if not self.recoverable():
+            raise ValueError("Package not recoverable yet")
+        c = self.container
+        c.numblocks = self.numblocks()
+        c.set_segments_sizes(self.sizes)
+        chunks = map(self.package_chunker(), range(c.numblocks))
+        return c.write_package(chunks, outfile)
+
+    def save(self, filename):
+        """Saves the decoder state into a binary DNA file, replaced atomically: copies of
+        segments of blocks not decoded yet, and message bases of decoded blocks."""
+        header = {
+            "n_segments": self.n_segments,
+            "sizes": sorted(self.sizes.items()),
+            "ends": sorted(self.ends.items()),
+            "copies": [],
+            "decoded": [],
+            "attempts": sorted(self.attempts.items()),
+            "attributes": {a: getattr(self.container, a) for a in attributes},
+        }
+        columns = []
+        for index, copies in sorted(self.copies.items()):
+            for column, count in copies.items():
+                header["copies"].append([index, count])
+                columns.append(column)
+        for blk, block_columns in sorted(self.decoded.items()):
+            header["decoded"].append([blk, len(block_columns)])
+            columns += block_columns
+        with open(filename + ".tmp", "wb") as f:
+            dnafile.write_segments(f, dna.bits2segments(columns), header)
+        os.replace(filename + ".tmp", filename)
+
+    @classmethod
+    def load(cls, filename, container):
+        """Returns the decoder saved in filename (see save), with container of the same
+        parameters as the saved one."""
+        with open(filename, "rb") as f:
+            dna_file = dnafile.DnaFile.open(f)
+            try:
+                header = dna_file.header
+                columns = iter(dna.segments2bits(dna_file.segments()))
+            finally:
+                dna_file.close()
+        decoder = cls(container, header["n_segments"])
+        decoder.sizes = Counter(dict([tuple(x) for x in header["sizes"]]))
+        decoder.ends = Counter(dict([tuple(x) for x in header["ends"]]))
+        for index, count in header["copies"]:
+            decoder.copies.setdefault(index, Counter())[bytes(next(columns))] = count
+        for blk, n in header["decoded"]:
+            decoder.decoded[blk] = [bytes(next(columns)) for i in range(n)]
+        decoder.attempts = dict([tuple(x) for x in header["attempts"]])
+        for name, value in header["attributes"].items():
+            setattr(container, name, value)
+        decoder.read_layout()
+        return decoder
@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# This file is part of archive2dna.
+#
+# archive2dna is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+# Foobar is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with archive2dna. If not, see <https://www.gnu.org/licenses/>
+#
+# Author : Jan Krause-Bilvin
+# First release: 2022-02-02
+
+"""Inventory of a pool of DNA reads, from their primers and indexes only.
+
+Reads are grouped by primer (the leading primer must match the complement primer at
+the end of the read). Inner code is not decoded: only the masked index of each read is
+read (bases dnecsi to dnecsi+dI), so a read with errors in its index may be counted
+under a wrong segment number. Reads longer than a segment, too short to hold an index or
+with invalid bases are not counted. For each primer, the layout is read from countdowns (see Container.read_layout)
+and each block is reported with its reads, distinct segments and missing segments.
+
+A block is estimated decodable if its missing segments span at most necso outer code
+symbols (missing segments are known erasures for the outer code)."""
+
+import itertools
+import math
+from collections import Counter
+from statistics import median
+
+from . import dna
+
+
+def split_primers(read, length):
+    """Returns the primer of a read (None if primers are not used) and the segment between
+    primer and complement primer, or (False, None) if they do not match."""
+    if length == 0:
+        return None, read
+    primer = read[:length]
+    if len(read) < 2 * length or read[-length:] != dna.complement_primer(primer):
+        return False, None
+    return primer, read[length:-length]
+
+
+def scan(container, reads, primer_length=None, chunk_size=2**16):
+    """Reads the index of DNA reads (iterable of strings, with primers), chunk by chunk,
+    with the parameters of container (package.Container). primer_length is the length of
+    primers in bases, by default it is read from the median length of the first reads.
+    Returns a Counter of read (segment number, countdown) per primer, the number of reads
+    not counted per primer and the number of reads without matching primers."""
+    start, stop = container.dnecsi, container.dnecsi + container.dI
+    counts = {}
+    invalid = Counter()
+    unassigned = 0
+    reads = iter(reads)
+    while True:
+        chunk = list(itertools.islice(reads, chunk_size))
+        if len(chunk) == 0:
+            break
+        if primer_length is None:
+            primer_length = max(
+                [(median([len(x) for x in chunk]) - container.dN) // 2, 0]
+            )
+        indexes = {}
+        for read in chunk:
+            primer, segment = split_primers(read, primer_length)
+            if primer is False:
+                unassigned += 1
+            elif not stop <= len(segment) <= container.dN or not dna.isValidDna(
+                segment
+            ):
+                invalid[primer] += 1
+            else:
+                indexes.setdefault(primer, []).append(segment[start:stop])
+        for primer, masked in indexes.items():
+            bases = dna.segments2bits(["".join(masked)])[0]
+            numbers, count_downs = container.read_index(bases)
+            counts.setdefault(primer, Counter()).update(zip(numbers, count_downs))
+    return counts, invalid, unassigned
+
+
+def summary(container, counts):
+    """Returns the inventory of one primer from its Counter of (segment number, countdown)
+    (see scan): reads, segments, layout and coverage of each block."""
+    numbers = Counter()
+    for (number, count_down), n in counts.items():
+        numbers[number] += n
+    out = {"reads": sum(numbers.values()), "segments": len(numbers)}
+
+    count_downs = [(x, x, cd) for (x, cd) in counts if cd != 0]
+    if container.manifest is None and len(count_downs) == 0:
+        out["layout"] = None
+        return out
+    last_index = container.read_layout(count_downs, len(numbers))
+    if last_index is None:
+        out["layout"] = None
+        return out
+    numblocks = int(math.ceil((last_index + 1) / container.dblocksize))
+    out["layout"] = {
+        "dnecso": container.dnecso,
+        "necso": container.necso,
+        "dblocksize": container.dblocksize,
+        "numblocks": numblocks,
+        "last_segment": last_index,
+        "votes": container.layout_votes,
+        "margin": container.layout_margin,
+    }
+    out["outliers"] = sum([n for x, n in numbers.items() if x > last_index])
+
+    blocks = []
+    for blk in range(numblocks):
+        block_start = blk * container.dblocksize
+        block_stop = min([block_start + container.dblocksize, last_index + 1])
+        indexes = range(block_start, block_stop)
+        missing = [i for i in indexes if i not in numbers]
+        symbols = set([(i - block_start) // container.dmo for i in missing])
+        blocks.append(
+            {
+                "block": blk,
+                "reads": sum([numbers[i] for i in indexes if i in numbers]),
+                "segments": len(indexes) - len(missing),
+                "missing": len(missing),
+                "missing_symbols": len(symbols),
+                "decodable": len(symbols) <= container.necso,
+            }
+        )
+    out["blocks"] = blocks
+    out["decodable"] = all([b["decodable"] for b in blocks])
+    return out
+
+
+def inventory(container, reads, primer_length=None, chunk_size=2**16):
+    """Returns the inventory of DNA reads (iterable of strings, with primers, see scan):
+    for each primer (None if primers are not used), the number of reads not counted
+    (invalid) and its summary (see summary), and the number of reads without matching
+    primers."""
+    counts, invalid, unassigned = scan(container, reads, primer_length, chunk_size)
+    primers = {}
+    for primer in sorted(set(counts) | set(invalid), key=str):
+        primers[primer] = summary(container, counts.get(primer, Counter()))
+        primers[primer]["invalid"] = invalid[primer]
+    return {"primers": primers, "unassigned": unassigned}
@@ -15,16 +15,32 @@
 ################
 
 # standard library
+import os
+import json
 import math
 import array
+import bisect
+import hashlib
+import itertools
 import io
+import gzip
+import time
+import shutil
+import tempfile
 import zipfile
 import logging
+import concurrent.futures
+from collections import Counter
 from statistics import median, mean
 
 # package
 from . import dna
 from . import bytesutils
+from . import dnafile
+from . import pipeline
+from . import parallel
+from . import runs
+from . import zipalign
 
 # from reedsolo import RSCodec
 from . import reedsolo_local as reedsolo
@@ -48,8 +64,19 @@ class Container:
         representation_url="sqlite://",  # SQL representation config (sqlalchemy URL)
         logging_file="None",
         logging_level="INFO",
-        auto_zip=True,
-    ):  # turns auto zipping/untipping on or off
+        auto_zip=True,  # turns auto zipping/untipping on or off
+        zip_stored=False,  # zip without compression (package bytes addressable by block)
+        block_aligned=False,  # members of the package (a zip) start on block boundaries
+        slack_blocks=1,  # spare blocks after each member of a block aligned package
+        pipeline_depth=0,  # overlap stages of consecutive blocks on threads if > 0
+        workers=1,  # number of processes used for Reed Solomon coding
+        blocks=None,  # minimal number of outer code blocks (default: as few as possible)
+        max_blocksize=None,  # maximal number of segments per outer code block
+        checkpoint_dir=None,  # resume outer coding from checkpoints in this directory
+        checkpoint_interval=60,  # minimal time between two checkpoints in seconds
+        layout_min_support=0.9,  # fraction of countdown votes the layout must explain
+        layout_min_margin=1,  # votes the layout must have more than the next layout
+    ):
 
         # Auto zip
         # If true package is zipped before encoding and unzipped after decoding
@@ -57,10 +84,58 @@ class Container:
         # e.g. if the container is already a zip, this can be turned of (set to false)
         self.auto_zip = auto_zip
 
+        # Zip compression
+        # If true, the package is stored in the zip without compression, so that a range
+        # of its bytes maps to the blocks containing it (see partial)
+        self.zip_stored = zip_stored
+        self.zip_compression = (
+            zipfile.ZIP_STORED if zip_stored else zipfile.ZIP_DEFLATED
+        )
+
+        # Block aligned package
+        # If true, the package (a zip) is not zipped again: its members are moved to outer
+        # code block boundaries, so that a revision of a member only changes its blocks
+        # (see align_package and encode_revision)
+        # Spare blocks are left after each member, so that a member may grow in a revision
+        # without moving the following ones
+        self.block_aligned = block_aligned
+        self.slack_blocks = slack_blocks
+        if block_aligned:
+            self.auto_zip = False
+
+        # Pipeline
+        # If > 0, stages of streamed encoding and decoding (see encode_stream and
+        # decode_binary) process consecutive blocks concurrently, with at most
+        # pipeline_depth blocks waiting between two stages
+        self.pipeline_depth = pipeline_depth
+
+        # Worker processes
+        # If > 1, lines of outer code blocks are coded by a pool of worker
+        # processes, on a copy of the block in shared memory (see parallel)
+        self.workers = workers
+
+        # Layout check
+        # At decoding, the layout read from countdowns must explain at least
+        # layout_min_support of the votes, and layout_min_margin votes more than the next
+        # layout, else decoding stops before the outer code (see check_layout)
+        self.layout_min_support = layout_min_support
+        self.layout_min_margin = layout_min_margin
+
         # Representation type
         # Either python objects or cache in a SQL database
         self.representation_type = representation_type
 
+        # Checkpoints
+        # If a directory is given, the representation and the progress of outer coding
+        # are saved there periodically, and resumed if the job is run again with the
+        # same input and parameters (see save_checkpoint)
+        if checkpoint_dir is not None and representation_type == "sql":
+            raise ValueError("Checkpoints require the python representation")
+        self.checkpoint_dir = checkpoint_dir
+        self.checkpoint_interval = checkpoint_interval
+        self.checkpoint_id = None
+        self.checkpoint_time = time.time()
+
         # Logging
         if logging_level == "DEBUG":
             log_level = logging.DEBUG
@@ -133,6 +208,10 @@ class Container:
         self.target_redundancy = target_redundancy
         self.numblocks = None  # number of outer code blocks
         self.dblocksize = None
+        # options to split data in more blocks than required by the outer code length
+        # (layout is read from index countdowns at decoding, see sort_segments)
+        self.blocks = blocks
+        self.max_blocksize = max_blocksize
 
         # Mask : random bytes and integerts, generation: secrets.token_bytes(256) , random.randint(0,3S)
         self.rand_mask = b"\xaf\x92i\xa9\xf1\x0c\"\xc2\xf4\xe4\xc6\xa80'j\xc6w\x08h\xc8)H\xb9\xfa\xb5\x93&\x04!\xcd\xc7\xcbw\x98\x05Z\xda\x01\xacP\x05I\xbe\\y\x8e\xff\xb2\x13\\p\xab\xd8m\x19\x97\xae\xfe\xba\x04\x94\xc5\x90\xb1c\n\xa9[\\i\xfd\xc9^\xf8do\xc5\xa8\xceQ\x12\x01\xb9&n\xaa\xfa\xc9\xf8I\xe1\xc4\xc7g\x045#\x17\x9a`\x08s\x9fG\xd9Y\xbd\xb9R}=G|Ah\xd5\x93\xbd\xb3\nrJ\xf3~\xc6\xa6\xd0\xaeM\x1a:b\xf3*XR<\r\xe0-\xeb\xf5\xd8\x1c\xd7\xb6\x1f.\xe4\x04\x01rNoWkt\xad)\x9f\xd0\x8b\xf5\xe7\x021#\xc7\x85\xb3\xac(|D\xa1\x1c\x8f\x17\xc0<\xf4\xa3\x8d\xf0*\x92c\x00\x0b\xbf^\x88\x1a4\xdd\n\x97d>e[\n\xff\xe1\x01\xab\x98C\x07erG\xce\xdb\xa1m\x17\xab1D\x00\xda\xb3\x9c\xa0\x8b\x19P8\x16Cun\xd97`\xdf\xcd\x95\x9e\x0f9\x16\x90\xff\xfaJ\xe6\xb7\xbaI\x97\xda\xc2\xcd\x82"
@@ -428,66 +507,84 @@ class Container:
         self.outer_corrections = 0
         self.segments_beyond_repair = 0
         self.segments_lost = 0
+        self.lost_indexes = []  # segments lost or beyond repair (see sort_segments)
+        self.layout_votes = None  # countdowns votes for the layout (see read_layout)
+        self.layout_support = None
+        self.layout_margin = None
         self.binary_size = None
         self.error = False
         self.error_message = ""
 
+        # Layout manifest
+        # package_size is set at encoding, checksums (sha256 of the package bytes of each
+        # block) when blocks are encoded by encode_stream or when the manifest is
+        # requested (see layout_manifest), manifest at decoding if the layout is known
+        # (see from_manifest)
+        self.package_size = None
+        self.checksums = None
+        self.manifest = None
+        self.revised_blocks = None  # blocks encoded by encode_revision
+        self.members = None  # offsets of members of a block aligned package, by name
+
     ###################
     ### Random mask ###
     ###################
 
     def xor_bytes(self, x1_bytes, x2_bytes):
-        """Bitwise XOR on bytes strings"""
-        return bytes([_x1 ^ _x2 for _x1, _x2 in zip(x1_bytes, x2_bytes)])
-
-    def mask_bytes(self, binary_data):
-        """Masks byte using a XOR"""
+        """Bitwise XOR on bytes strings (truncated to the shortest one).
+        Bytes strings are XORed as whole big integers rather than byte by byte."""
+        n = min([len(x1_bytes), len(x2_bytes)])
+        x1 = int.from_bytes(x1_bytes[:n], "big")
+        x2 = int.from_bytes(x2_bytes[:n], "big")
+        return (x1 ^ x2).to_bytes(n, "big")
+
+    def mask_bytes(self, binary_data, offset=0, out=None, chunk_size=2**20):
+        """Masks byte using a XOR with the random mask repeated over the data.
+        offset is the position of binary_data in the whole data, which allows to mask
+        (and unmask) data chunk by chunk. The mask is applied chunk_size bytes at a time
+        (rounded to a multiple of the mask size), so that temporary objects are bounded by
+        a chunk. The result is written into out (bytearray or memoryview of the size of
+        binary_data) if provided, else returned as bytes."""
         dlen = len(binary_data)
         rlen = len(self.rand_mask)
-        nchunks = dlen // rlen
-        nrest = dlen % rlen
-        dataRA = b""
-        j = 0
-        for i in range(nchunks):
-            j = i
-            dataRA += self.xor_bytes(
-                binary_data[i * rlen : (i + 1) * rlen], self.rand_mask
-            )
-        dataRA += self.xor_bytes(
-            binary_data[(j + 1) * rlen : (j + 1) * rlen + nrest], self.rand_mask[:nrest]
-        )
-        return dataRA
+        chunk_size = max([chunk_size // rlen, 1]) * rlen
+        start = offset % rlen
+        # each chunk starts at the same position of the mask
+        mask = (self.rand_mask * (chunk_size // rlen + 1))[start : start + chunk_size]
+        chunks = []
+        for i in range(0, dlen, chunk_size):
+            chunk = self.xor_bytes(binary_data[i : i + chunk_size], mask)
+            if out is None:
+                chunks.append(chunk)
+            else:
+                out[i : i + len(chunk)] = chunk
+        if out is None:
+            return b"".join(chunks)
+        return out
 
     ###########################
     ### Data input : binary ###
     ###########################
 
-    def load_binary(self, binary_data):
-        """Reads a binary file, applies random mask, reshapes to table.
-        Binary data is stored by columns: first column 1 is filled,
-        then column 2, and so on."""
-        logging.info("start : load binary")
-        self.binary_size = len(binary_data)
-        # zip data
-        if self.auto_zip:
-            zip_buffer = io.BytesIO()
-            with zipfile.ZipFile(
-                zip_buffer, "a", zipfile.ZIP_DEFLATED, False
-            ) as zip_file:
-                zip_file.writestr(
-                    "information_package", io.BytesIO(binary_data).getvalue()
-                )
-            binary_data = zip_buffer.getvalue()
-            del zip_buffer
-        # mask data
-        binary_data = self.mask_bytes(binary_data)
-        binary_data = bytesutils.split_bytes_in_four(binary_data)
+    def compute_layout(self, n_bases):
+        """Computes outer code parameters and the layout of blocks for a package of n_bases
+        DNA bases (i.e. 4 times its size in bytes once zipped): dk, dnecso, necso,
+        numblocks, dblocksize and dn. Raises ValueError if max_blocksize is below the
+        size of the smallest block (dmo data columns and their ecc columns)."""
 
         # representation way
-        self.dk = len(binary_data) // (self.dK - self.dI)
-        if len(binary_data) % (self.dK - self.dI) != 0:  # if last segment is not full
+        self.dk = n_bases // (self.dK - self.dI)
+        if n_bases % (self.dK - self.dI) != 0:  # if last segment is not full
             self.dk += 1
 
+        # block aligned package: blocks are the ones its members were aligned on
+        if self.block_aligned and self.dblocksize is not None:
+            per_block = self.dblocksize - self.dnecso
+            self.numblocks = int(math.ceil(self.dk / per_block))
+            self.dn = self.dk + self.dnecso * self.numblocks
+            self.package_size = n_bases // 4
+            return
+
         # use target_redundancy to compute necso (over all)
         dmo = self.mo // 2
         dnk = min([self.dk, self.n * dmo])
@@ -504,13 +601,80 @@ class Container:
         # to avoid a last block that may be small, segments are distributed equally in all blocs
         # number of segments mus be a multiple of dmo
         per_block = self.dk // self.numblocks
+        if self.dk % self.numblocks != 0:
+            per_block += 1
         per_block_symbols = per_block // self.dmo
         if per_block % self.dmo != 0:
             per_block_symbols += 1
         self.dblocksize = per_block_symbols * dmo + self.dnecso
 
+        # more, smaller blocks if requested (e.g. to decode blocks in parallel)
+        numblocks = self.numblocks
+        if self.blocks is not None:
+            numblocks = max([numblocks, self.blocks])
+        if self.max_blocksize is not None:
+            data_size = self.max_blocksize * (1 - self.target_redundancy)
+            numblocks = max([numblocks, int(math.ceil(self.dk / data_size))])
+            while True:
+                per_block, dnecso = self.split_blocks(numblocks)
+                if per_block + dnecso <= self.max_blocksize:
+                    break
+                if per_block <= dmo:  # smallest block: one symbol of data columns
+                    raise ValueError(
+                        "max_blocksize {m} is below the minimal block size {s}".format(
+                            m=self.max_blocksize, s=per_block + dnecso
+                        )
+                    )
+                numblocks += 1
+        if numblocks > self.numblocks:
+            per_block, dnecso = self.split_blocks(numblocks)
+            self.numblocks = int(math.ceil(self.dk / per_block))  # no empty block
+            self.dnecso = dnecso
+            self.necso = dnecso // dmo
+            self.dblocksize = per_block + dnecso
+
         # set total number of columns
         self.dn = self.dk + self.dnecso * self.numblocks
+        self.package_size = n_bases // 4
+
+    def split_blocks(self, numblocks):
+        """Returns the number of data segments per block (a multiple of dmo) and the number
+        of ecc segments per block (dnecso, for target_redundancy) if data is split in
+        numblocks blocks."""
+        per_block = int(math.ceil(self.dk / numblocks))
+        per_block = int(math.ceil(per_block / self.dmo)) * self.dmo
+        dnecso = int(self.target_redundancy / (1 - self.target_redundancy) * per_block)
+        dnecso = (dnecso // self.dmo + 1) * self.dmo
+        return per_block, dnecso
+
+    def load_binary(self, binary_data):
+        """Reads a binary file, applies random mask, reshapes to table.
+        Binary data is stored by columns: first column 1 is filled,
+        then column 2, and so on."""
+        logging.info("start : load binary")
+        self.binary_size = len(binary_data)
+        self.set_checkpoint_id(binary_data)
+        # zip data
+        if self.block_aligned:
+            package_file = io.BytesIO()
+            self.align_package(io.BytesIO(binary_data), package_file)
+            binary_data = package_file.getvalue()
+        elif self.auto_zip:
+            zip_buffer = io.BytesIO()
+            with zipfile.ZipFile(
+                zip_buffer, "a", self.zip_compression, False
+            ) as zip_file:
+                zip_file.writestr(
+                    "information_package", io.BytesIO(binary_data).getvalue()
+                )
+            binary_data = zip_buffer.getvalue()
+            del zip_buffer
+        # mask data
+        binary_data = self.mask_bytes(binary_data)
+        binary_data = bytesutils.split_bytes_in_four(binary_data)
+
+        self.compute_layout(len(binary_data))
+        self.checksums = None  # computed from data if a manifest is requested
 
         # load data
         if self.representation_type == "sql":
@@ -553,42 +717,155 @@ class Container:
             self.necso, nsize=self.n
         )  # Using n-k = necs error correcting codes
 
+        # For each block (not already coded if resumed from a checkpoint)
+        start = self.restore_checkpoint("add_outer_code") or 0
+        blocks = range(start, self.numblocks)
+        pool = self.process_pool()
+        try:
+            for blk in self.checkpointed("add_outer_code", blocks):
+                self.add_outer_code_block(self.data, blk, outerCoder, pool)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+    def process_pool(self):
+        """Returns a pool of worker processes if workers > 1, else None."""
+        if self.workers > 1:
+            return concurrent.futures.ProcessPoolExecutor(max_workers=self.workers)
+        return None
+
+    def add_outer_code_block(self, data, blk, outerCoder, pool=None):
+        """Computes outer code error correcing symbols of block blk in representation data,
+        which may contain only the columns of this block.
+        If a process pool is given, lines are coded by worker processes (see parallel).
+        """
+
         n_lines = self.dK - self.dI
-        n_columns = self.dk
         line_offset_ori = self.dN - n_lines
 
-        # For each block
-        for blk in range(self.numblocks):
-
-            # Create error outer correcting code symbols line by line
-            for i in range(self.dK - self.dI):
+        # Read lines in DNA representation
+        block_start = blk * self.dblocksize
+        block_stop = min([(blk + 1) * self.dblocksize, self.dn])
+        block_slice = slice(block_start, block_stop)
+        if pool is not None:
+            # lines are coded in place in the block columns, ecc columns are copied back
+            matrix = self.shared_block(
+                data,
+                block_start,
+                block_stop,
+                line_offset_ori,
+                line_offset_ori + n_lines,
+            )
+            params = (self.necso, self.n, self.mo, self.dnecso)
+            try:
+                parallel.map_rows(
+                    pool, self.workers, parallel.outer_encode_rows, matrix, *params
+                )
+                for k in range(self.dnecso):
+                    data.setcolumn(
+                        block_start + k, matrix.column(k), start_at=line_offset_ori
+                    )
+            finally:
+                matrix.close(unlink=True)
+            return
+        dlines = data.getlines(
+            line_offset_ori, line_offset_ori + n_lines, s=block_slice
+        )
 
-                # Read line in DNA representation
-                block_start = blk * self.dblocksize
-                block_stop = min([(blk + 1) * self.dblocksize, self.data.size[1]])
-                dline = self.data.getline(
-                    i + line_offset_ori, s=slice(block_start, block_stop)
-                )[self.dnecso :]
-                dline = [x for x in dline if x != None]
-                line_array = array.array("i", list(dline))
-                line_array_mo = dna.merge_bases(line_array, block_size=self.dmo)
-
-                # Run Reed Solomon to compute error correctig symblos
-                if self.mo == 8:
-                    line_array_mo = bytearray(list(line_array_mo))
-                    line2 = outerCoder.encode(line_array_mo)
-                    ecc = array.array("i", list(line2[-self.necso :]))
-                else:
-                    line2 = outerCoder.encode(line_array_mo)
-                    ecc = line2[-self.necso :]
+        lines_mo = dna.merge_bases_2d(
+            [dline[self.dnecso :] for dline in dlines], block_size=self.dmo
+        )
 
-                ecc_bases = dna.split_bases(ecc, block_size=self.dmo)
+        # Run Reed Solomon to compute error correctig symblos line by line
+        eccs = []
+        for line_array_mo in lines_mo:
+            if len(line_array_mo) == 0:
+                # line past the short last column of a block of one data column:
+                # the ecc of an empty message is zero
+                eccs.append([0] * self.necso)
+                continue
+            if self.mo == 8:
+                line_array_mo = bytearray(line_array_mo)
+            line2 = outerCoder.encode(line_array_mo)
+            eccs.append(line2[-self.necso :])
+        ecc_bases = dna.split_bases_2d(eccs, block_size=self.dmo)
+
+        # Store coded_message (= message + ecc) in data
+        line_offset = self.dnecsi + self.dI
+        out = [ecc_bases[i] + dlines[i][self.dnecso :] for i in range(n_lines)]
+        data.setlines(line_offset, out, s=block_slice)
+
+    def shared_block(self, data, block_start, block_stop, start, stop):
+        """Returns columns block_start to block_stop (excluded) of representation data,
+        restricted to lines start to stop, in a shared matrix stored by columns (see
+        parallel): its rows are the lines of the block. Columns are copied once, into
+        shared memory."""
+        return parallel.SharedMatrix.from_columns(
+            [
+                parallel.bases_view(data.getcolumn(i))[start:stop]
+                for i in range(block_start, block_stop)
+            ],
+            stop - start,
+        )
 
-                # Store coded_message (= message + ecc) in data
-                line_offset = self.dnecsi + self.dI
-                out = list(ecc_bases) + list(line_array)
-                for b in range(len(out)):
-                    self.data.setpos(i + line_offset, blk * self.dblocksize + b, out[b])
+    def copy_back_messages(self, matrix, block_start, start):
+        """Copies message columns of a block decoded in shared matrix (see shared_block)
+        back to the representation, from line start."""
+        for k in range(self.dnecso, len(matrix.columns)):
+            self.data.setcolumn(block_start + k, matrix.column(k), start_at=start)
+
+    def block_length(self, blk):
+        """Returns the number of columns (i.e. of DNA segments) of outer code block blk."""
+        if blk < self.numblocks - 1:
+            return self.dblocksize
+        if self.dn > blk * self.dblocksize:
+            return self.dn - blk * self.dblocksize
+        return self.dn
+
+    def count_downs(self, start, stop):
+        """Returns countdowns of index section I2 for columns start to stop (excluded).
+        In each block, countdowns end at 0 on the last ecc column and on the last column.
+        They start at most at 4**dI2-1 (the largest value fitting in I2), before they are 0.
+        """
+        cap = 4**self.dI2
+
+        def count_down(length):
+            k = min([length, cap])
+            return [0] * (length - k) + list(range(k - 1, -1, -1))
+
+        out = []
+        for blk in range(start // self.dblocksize, (stop - 1) // self.dblocksize + 1):
+            block_start = blk * self.dblocksize
+            blocklen = self.block_length(blk)
+            cd = count_down(self.dnecso) + count_down(blocklen - self.dnecso)
+            out += cd[max([start - block_start, 0]) : stop - block_start]
+        return out
+
+    def mask_index(self, index):
+        """Masks (or unmasks) index bases using random numbers. The index of consecutive
+        columns (dI bases each) is masked at once using a XOR."""
+        mask = bytes([self.rand_ints[j % len(self.rand_ints)] for j in range(self.dI)])
+        return bytearray(self.xor_bytes(index, mask * (len(index) // self.dI + 1)))
+
+    def make_index(self, start, stop):
+        """Returns masked index of columns start to stop (excluded) as bases (one byte each),
+        column after column: dI1 bases of segment number and dI2 bases of countdown."""
+        if stop > 4**self.dI1:
+            raise ValueError(
+                "Too many segments ({n}) for index positions".format(n=stop)
+            )
+        numbers = array.array(dna.symbols_typecode(self.dI1), range(start, stop))
+        count_downs = array.array(
+            dna.symbols_typecode(self.dI2), self.count_downs(start, stop)
+        )
+        numbers_bases = dna.split_bases_2d([numbers], block_size=self.dI1)[0]
+        count_downs_bases = dna.split_bases_2d([count_downs], block_size=self.dI2)[0]
+        index = bytearray((stop - start) * self.dI)
+        for j in range(self.dI1):
+            index[j :: self.dI] = numbers_bases[j :: self.dI1]
+        for j in range(self.dI2):
+            index[self.dI1 + j :: self.dI] = count_downs_bases[j :: self.dI2]
+        return self.mask_index(index)
 
     def add_index(self):
         """Adds index i.e. the identification of DNA segments (1 segment = 1 column):
@@ -596,59 +873,21 @@ class Container:
         2) Sction I2: adds partial countdowns to end of error corecting symbols and end of block.
            countdowns ent at 1, i.e. 1 is the last ecc and the last symbol of block.
            Goal: auto detect parameters when reading back DNA, namely dn and dnecso.
+        Index of all columns is computed at once (see make_index), then masked using random numbers.
         """
-        # TODO: hardocoded for mi=8, to be generalized
 
         logging.info("start : add index")
 
-        # Numerus currens of segments, starts at 0 (in index block I1)
-        for i in range(self.data.size[1]):
-            b = dna.int2bytes(i, n=self.index_positions // 8)
-            for j in range(self.index_positions // 8):
-                x = b[j].to_bytes(1, "big")
-                x4 = bytesutils.split_bytes_in_four(x)
-                for l in range(len(x4)):
-                    self.data.setpos(self.dnecsi + 4 * j + l, i, x4[l])
-
-        # Count down for end of segment, ends at 0 (in index section I2)
-        for blk in range(self.numblocks):
-            if blk < self.numblocks - 1:
-                blocklen = self.dblocksize
-            else:
-                if self.data.size[1] > blk * self.dblocksize:
-                    blocklen = self.data.size[1] - blk * self.dblocksize
-                else:
-                    blocklen = self.data.size[1]
-
-            # Count down for end of segment, ends at 0 (in index section I2)
-            for i in range(blocklen):
-                if i < blocklen - 256:  # no count down, set to 0
-                    b = dna.int2bytes(0, n=1)
-                else:  # starting count down
-                    b = dna.int2bytes(blocklen - i - 1, n=1)
-                x4 = bytesutils.split_bytes_in_four(b)
-                for l in range(len(x4)):
-                    self.data.setpos(
-                        self.dnecsi + l + self.dI1, blk * self.dblocksize + i, x4[l]
-                    )
+        self.add_index_columns(self.data, 0, self.dn)
 
-            # Count down for end of outer code ecc, ends at 0 (in index block I2)
-            for i in range(self.dnecso):
-                if i >= self.dnecso - 256:  # do count down
-                    b = dna.int2bytes(self.dnecso - i - 1, n=1)
-                    x4 = bytesutils.split_bytes_in_four(b)
-                    for l in range(len(x4)):
-                        self.data.setpos(
-                            self.dnecsi + l + self.dI1, blk * self.dblocksize + i, x4[l]
-                        )
-                # else already set to 0 by code just above
-
-        # Mask index using random numbers
-        for i in range(self.data.size[1]):
-            for j in range(self.dI):
-                value = self.data.getpos(self.dnecsi + j, i)
-                masked_value = (value ^ self.rand_ints[j % len(self.rand_ints)]) % 4
-                self.data.setpos(self.dnecsi + j, i, masked_value)
+    def add_index_columns(self, data, start, stop):
+        """Adds index of columns start to stop (excluded) in representation data."""
+        index = self.make_index(start, stop)
+        for i in range(start, stop):
+            j = i - start
+            data.setcolumn(
+                i, index[j * self.dI : (j + 1) * self.dI], start_at=self.dnecsi
+            )
 
     def add_inner_code(self):
         """Adds inner code, i.e. the correcting code of each DNA segment.
@@ -659,30 +898,33 @@ class Container:
         # Initialize inner coder
         innerCoder = RSCodec(self.necsi, c_exp=self.mi)
 
-        for i in range(self.dn):
-            dcol = self.data.getcolumn(i)[self.dnecsi :]
-            dcol = [x for x in dcol if x != None]  # FIXME: ugly fix, solve at source?
-            darray = array.array("i", list(dcol))
+        self.add_inner_code_columns(self.data, 0, self.dn, innerCoder)
 
-            # merging bases
-            darray_mi = dna.merge_bases(darray, block_size=self.dmi)
-            darray_mi_ba = bytearray(list(darray_mi))
+    def add_inner_code_columns(self, data, start, stop, innerCoder):
+        """Adds inner code of columns start to stop (excluded) in representation data."""
 
-            # encode from bytes, which are enough for mi<=8
-            # will return type bytearray even if input is array anyway !
-            msg_coded = innerCoder.encode(bytes(darray_mi_ba))
+        # merging bases of all columns
+        dcols = [data.getcolumn(i)[self.dnecsi :] for i in range(start, stop)]
+        dcols_mi = dna.merge_bases_2d(dcols, block_size=self.dmi)
 
-            # store error correcting code symbols
-            ecc = msg_coded[-self.necsi :]
-            ecc_bases = dna.split_bases(ecc, block_size=self.dmi)
-            for j in range(len(ecc_bases)):
-                self.data.setpos(j, i, ecc_bases[j])
+        # encode from bytes, which are enough for mi<=8
+        # will return type bytearray even if input is array anyway !
+        eccs = []
+        for darray_mi in dcols_mi:
+            msg_coded = innerCoder.encode(bytes(darray_mi))
+            eccs.append(msg_coded[-self.necsi :])
+
+        # store error correcting code symbols
+        ecc_bases = dna.split_bases_2d(eccs, block_size=self.dmi)
+        for i in range(start, stop):
+            data.setcolumn(i, ecc_bases[i - start])
 
     def create_logical_redundancy(self):
         """Adds outer code, index, innercode"""
         self.add_outer_code()
         self.add_index()
         self.add_inner_code()
+        self.clear_checkpoint()
 
     ######################
     ### Convert to DNA ###
@@ -693,66 +935,404 @@ class Container:
 
         logging.info("start : convert representation to DNA segement")
 
-        self.dna = []
-        for i in sorted(self.data.column_indexes()):
-            col = self.data.getcolumn(i)
-            col = [x for x in col if x != None]
-            # col = [x if x else 0 != None for x in col]
-            DNA_segment = ""
-            for j in range(len(col)):
-                DNA_segment += dna.bits2dna(col[j])
-            self.dna.append(DNA_segment)
+        self.dna = dna.bits2segments(
+            [self.data.getcolumn(i) for i in sorted(self.data.column_indexes())]
+        )
 
     def add_primers(self):
         """Adds primer and its complements around each DNA segment."""
 
         logging.info("start : add primers")
 
-        if self.primer is not None:
-            comp_primer = dna.complement_primer(self.primer)
-            self.dna = [
-                dna.add_primers(x, primer1=self.primer, primer2=comp_primer)
-                for x in self.dna
-            ]
+        self.dna = self.with_primers(self.dna)
+
+    def with_primers(self, segments):
+        """Returns DNA segments with primer and its complement around each of them."""
+        if self.primer is None:
+            return segments
+        comp_primer = dna.complement_primer(self.primer)
+        return [
+            dna.add_primers(x, primer1=self.primer, primer2=comp_primer)
+            for x in segments
+        ]
 
     def remove_primers(self):
         """Removes primer and its complements around each DNA segment."""
 
         logging.info("start : remove primers")
 
-        if self.primer is not None:
-            comp_primer = dna.complement_primer(self.primer)
-            self.dna = [
-                dna.remove_primers(x, primer1=self.primer, primer2=comp_primer)
-                for x in self.dna
-            ]
+        self.dna = self.without_primers(self.dna)
+
+    def without_primers(self, segments):
+        """Returns DNA segments without primer and its complement around each of them."""
+        if self.primer is None:
+            return segments
+        comp_primer = dna.complement_primer(self.primer)
+        return [
+            dna.remove_primers(x, primer1=self.primer, primer2=comp_primer)
+            for x in segments
+        ]
 
     def convert_to_dna(self):
         """Converts data to DNA segments and adds primers around each segment."""
         self.to_dna()
         self.add_primers()
 
+    ##########################
+    ### Streaming encoding ###
+    ##########################
+
+    def zip_package(self, infile, outfile, chunk_size=2**20):
+        """Zips binary file object infile into file object outfile, chunk by chunk.
+        The zip is the same as the one built by load_binary. Returns the size of infile.
+        """
+        if not infile.seekable():  # size is required to write zip headers (e.g. stdin)
+            spool = tempfile.TemporaryFile()
+            shutil.copyfileobj(infile, spool, chunk_size)
+            infile = spool
+        size = infile.seek(0, io.SEEK_END)
+        infile.seek(0)
+        with zipfile.ZipFile(outfile, "w", self.zip_compression) as zip_file:
+            # same member attributes as zip_file.writestr()
+            zip_info = zipfile.ZipInfo(
+                "information_package", date_time=time.localtime(time.time())[:6]
+            )
+            zip_info.compress_type = zip_file.compression
+            zip_info.external_attr = 0o600 << 16
+            zip_info.file_size = size
+            with zip_file.open(zip_info, "w") as member:
+                shutil.copyfileobj(infile, member, chunk_size)
+        return size
+
+    def load_block(self, package_file, package_size, blk):
+        """Reads data columns of outer code block blk from the package file (zipped if auto_zip),
+        applies random mask and reshapes them to a representation containing only this block.
+        Columns keep their index in the whole data (e.g. as loaded by load_binary)."""
+        from . import representation
+
+        n_lines = self.dK - self.dI
+        per_block = self.dblocksize - self.dnecso
+        k0 = blk * per_block
+        k1 = min([k0 + per_block, self.dk])
+
+        # bases of block data columns and bytes containing them
+        b0 = k0 * n_lines
+        b1 = min([k1 * n_lines, 4 * package_size])
+        package_file.seek(b0 // 4)
+        chunk = package_file.read((b1 + 3) // 4 - b0 // 4)
+        if self.checksums is not None:  # same bytes as block_checksums
+            self.checksums[blk] = bytesutils.sha256(chunk)
+        chunk = self.mask_bytes(chunk, offset=b0 // 4)
+        bases = bytesutils.split_bytes_in_four(chunk)[b0 % 4 : b0 % 4 + b1 - b0]
+
+        data = representation.Representation(
+            data_bytes=bases,
+            dN=self.dN,
+            numblocks=1,
+            dblocksize=self.dblocksize,
+            dnecso=self.dnecso,
+            n_lines=n_lines,
+            n_columns=k1 - k0,
+        )
+        for i in range(len(data.data)):
+            data.updateindex(i, data.data[i]["index"] + blk * self.dblocksize)
+        data.reindex_columns()
+        return data
+
+    def code_block(self, data, blk, outerCoder, innerCoder, pool=None):
+        """Adds outer code, index and inner code to block blk (see load_block)."""
+        block_start = blk * self.dblocksize
+        block_stop = min([(blk + 1) * self.dblocksize, self.dn])
+        self.add_outer_code_block(data, blk, outerCoder, pool)
+        self.add_index_columns(data, block_start, block_stop)
+        self.add_inner_code_columns(data, block_start, block_stop, innerCoder)
+
+    def block_segments(self, data, blk):
+        """Returns the DNA segments of block blk, with primers."""
+        block_start = blk * self.dblocksize
+        block_stop = min([(blk + 1) * self.dblocksize, self.dn])
+        segments = dna.bits2segments(
+            [data.getcolumn(i) for i in range(block_start, block_stop)]
+        )
+        return self.with_primers(segments)
+
+    def encode_block(self, data, blk, outerCoder, innerCoder):
+        """Adds outer code, index and inner code to block blk (see load_block).
+        Returns the DNA segments of the block, with primers."""
+        self.code_block(data, blk, outerCoder, innerCoder)
+        return self.block_segments(data, blk)
+
+    def write_package_file(self, infile, package_file):
+        """Writes binary file object infile into file object package_file, zipped if auto_zip
+        (aligned if block_aligned). Sets binary_size and returns the size of the package file.
+        """
+        if self.block_aligned:
+            self.binary_size = self.align_package(infile, package_file)
+        elif self.auto_zip:
+            self.binary_size = self.zip_package(infile, package_file)
+        else:
+            shutil.copyfileobj(infile, package_file)
+            self.binary_size = package_file.tell()
+        return package_file.tell()
+
+    def encoded_blocks(self, package_file, package_size, blocks):
+        """Encodes outer code blocks (iterable of block numbers) of a package file (see
+        write_package_file), layout must be computed. Generator: yields the DNA segments
+        (with primers) of each block, in order.
+        If pipeline_depth > 0, loading, coding and conversion to DNA of consecutive blocks
+        overlap on worker threads (see pipeline)."""
+        outerCoder = RSCodec(self.necso, nsize=self.n)
+        innerCoder = RSCodec(self.necsi, c_exp=self.mi)
+
+        def load(blk):
+            logging.info("start : encode block {blk}".format(blk=blk))
+            return blk, self.load_block(package_file, package_size, blk)
+
+        def code(item):
+            blk, data = item
+            self.code_block(data, blk, outerCoder, innerCoder, pool)
+            return item
+
+        def to_dna(item):
+            blk, data = item
+            return self.block_segments(data, blk)
+
+        pool = self.process_pool()
+        try:
+            yield from pipeline.run(blocks, [load, code, to_dna], self.pipeline_depth)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+    def encode_stream(self, infile):
+        """Encodes binary file object infile into DNA segments, one outer code block at a time.
+        Generator: DNA segments (with primers) are yielded as soon as their block is encoded,
+        so that memory usage is bounded by the size of a block. The package (zipped if
+        auto_zip) is buffered in a temporary file. Segments are the same as those returned
+        by load_binary, create_logical_redundancy and convert_to_dna (see encoded_blocks).
+        """
+
+        logging.info("start : encode stream")
+
+        with tempfile.TemporaryFile() as package_file:
+            package_size = self.write_package_file(infile, package_file)
+            self.compute_layout(4 * package_size)
+            self.checksums = [None] * self.numblocks  # set as blocks are loaded
+
+            sizes = Counter()
+            for segments in self.encoded_blocks(
+                package_file, package_size, range(self.numblocks)
+            ):
+                sizes.update([len(x) for x in segments])
+                yield from segments
+
+        self.set_segments_sizes(sizes)
+
+    ###############################
+    ### Block aligned revisions ###
+    ###############################
+
+    def block_bases(self):
+        """Returns the number of package bases of a full block (its data columns)."""
+        return (self.dblocksize - self.dnecso) * (self.dK - self.dI)
+
+    def align_package(self, infile, package_file, chunk_size=2**20):
+        """Copies the information package infile (a zip, binary file object) into
+        file object package_file, with its members and central directory starting on block
+        boundaries of the package (see zipalign). If blocks do not end on a byte, the byte
+        holding bases of two blocks is left zero, so that blocks of a member do not hold
+        bases of the previous one. slack_blocks spare blocks are left after each member.
+        The layout is the one of the loaded manifest (see encode_revision), else the one of
+        the information package split in a block per member and its spare blocks at least.
+        Members of the loaded manifest keep their offset unless the previous member grew
+        beyond it. Returns the size of infile."""
+        if not infile.seekable():  # members are located from the end of the zip
+            spool = tempfile.TemporaryFile()
+            shutil.copyfileobj(infile, spool, chunk_size)
+            infile = spool
+        size = infile.seek(0, io.SEEK_END)
+        previous = {}
+        if self.manifest is not None:
+            for name in ["dnecso", "necso", "dblocksize"]:
+                setattr(self, name, self.manifest["layout"][name])
+            previous = self.manifest.get("members") or {}
+        else:
+            members = zipalign.read_end_record(infile)[0]
+            blocks = self.blocks
+            self.blocks = max([blocks or 1, members * (1 + self.slack_blocks) + 1])
+            self.compute_layout(4 * size)
+            self.blocks = blocks
+        block_bases = self.block_bases()
+
+        def align(position, name):
+            offset = previous.get(name)
+            if offset is not None and offset >= position:  # grown within its slack
+                return offset
+            # first block starting at position or after, spare blocks after a member
+            blk = -(-4 * position // block_bases)
+            if position > 0:
+                blk += self.slack_blocks
+            return -(-blk * block_bases // 4)
+
+        self.members = zipalign.align_zip(infile, package_file, align)
+        return size
+
+    def encode_revision(self, infile):
+        """Encodes a revision of the block aligned package of the loaded manifest (see
+        from_manifest), with the same parameters and blocks: binary file object infile is
+        the revised information package. Generator: yields DNA segments (with primers) of
+        the blocks whose package bytes changed (revised_blocks), in order. They replace the
+        segments of these blocks in the pool, segments numbered dn or more are removed.
+        The manifest of the revision is returned by layout_manifest."""
+
+        logging.info("start : encode revision")
+
+        if not self.block_aligned or self.manifest is None:
+            raise ValueError(
+                "Revisions require the manifest of a block aligned package"
+            )
+        previous = self.manifest["checksums"]
+
+        with tempfile.TemporaryFile() as package_file:
+            package_size = self.write_package_file(infile, package_file)
+            self.compute_layout(4 * package_size)
+            self.checksums = self.block_checksums(package_file)
+            self.revised_blocks = [
+                blk
+                for blk in range(self.numblocks)
+                if blk >= len(previous) or self.checksums[blk] != previous[blk]
+            ]
+            logging.info("revised blocks : {blocks}".format(blocks=self.revised_blocks))
+            # a member growing beyond its spare blocks moves the following ones, whose
+            # blocks are encoded again
+            members = self.manifest.get("members") or {}
+            moved = [
+                name
+                for name, offset in self.members.items()
+                if members.get(name, offset) != offset
+            ]
+            if len(moved) > 0:
+                logging.warning(
+                    "members moved, their blocks are encoded again : {names}".format(
+                        names=moved
+                    )
+                )
+
+            sizes = Counter()
+            for segments in self.encoded_blocks(
+                package_file, package_size, self.revised_blocks
+            ):
+                sizes.update([len(x) for x in segments])
+                yield from segments
+
+        if len(sizes) > 0:
+            self.set_segments_sizes(sizes)
+
     #########################
     ### Data output : DNA ###
     #########################
 
-    def write_dna(self):
-        """Returns a DNA string, with one line per DNA segment (e.g. to be written in a text file)."""
+    def write_dna(self, outfile=None, dna_format="text", compress=False, segments=None):
+        """Writes DNA segments (self.dna by default, or any iterable of segments e.g. from
+        encode_stream) in one of the formats:
+            - text: one line per DNA segment
+            - fasta: FASTA records, with segment number as header (>segment_0, ...)
+            - binary: 2 bits per base, with random access to segments (see dnafile)
+        Output is gzip compressed if compress. Segments are written one by one into file
+        object outfile if given, else the output (string, or bytes if compressed or binary)
+        is returned. Compressed or binary output to a text file object is written to its
+        binary buffer: raises ValueError if it has none (e.g. io.StringIO).
+        All formats can be read back by load_dna."""
 
         logging.info("start : write DNA")
 
-        return "\n".join(self.dna)
+        if segments is None:
+            segments = self.dna
+        if outfile is None:
+            if dna_format == "text" and not compress:
+                return "\n".join(segments)
+            if compress or dna_format == "binary":
+                buffer = io.BytesIO()
+            else:
+                buffer = io.StringIO()
+            self.write_dna(buffer, dna_format, compress, segments)
+            return buffer.getvalue()
+
+        if dna_format not in ["text", "fasta", "binary"]:
+            raise ValueError("Unknown DNA format: {f}".format(f=dna_format))
+        if (compress or dna_format == "binary") and isinstance(outfile, io.TextIOBase):
+            if not hasattr(outfile, "buffer"):  # e.g. io.StringIO
+                raise ValueError("compressed/binary DNA needs a binary file object")
+            outfile.flush()
+            outfile = outfile.buffer
+        if compress:
+            stream = gzip.GzipFile(fileobj=outfile, mode="wb")
+        else:
+            stream = outfile
+
+        if dna_format == "binary":
+            dnafile.write_segments(stream, segments, header=self.dna_file_header())
+        else:
+            if not isinstance(stream, io.TextIOBase):
+                stream = io.TextIOWrapper(stream, encoding="ascii", newline="")
+            for i, segment in enumerate(segments):
+                if dna_format == "fasta":
+                    stream.write(">segment_{i}\n{s}\n".format(i=i, s=segment))
+                elif i > 0:
+                    stream.write("\n" + segment)
+                else:
+                    stream.write(segment)
+            if isinstance(stream, io.TextIOWrapper) and stream is not outfile:
+                stream.flush()
+                stream = stream.detach()
+
+        if compress:
+            stream.close()  # writes gzip trailer, does not close outfile
+
+    def dna_file_header(self):
+        """Returns parameters saved in the header of binary DNA files (see dnafile)."""
+        return {
+            "package_id": self.package_id,
+            "primer": self.primer,
+            "mi": self.mi,
+            "mo": self.mo,
+            "N": self.N,
+            "K": self.K,
+            "index_length": self.index_length,
+            "index_positions": self.index_positions,
+        }
 
     ########################
     ### Data input : DNA ###
     ########################
 
     def read_dna(self, text):
-        """Reads DNA strings from a text file: one line per DNA segment"""
-        self.dna = text.split("\n")
-        self.dna = [dna.stripDna(s) for s in self.dna]
-        if "" in self.dna:
-            self.dna.remove("")
+        """Reads DNA strings from a text file: one line per DNA segment.
+        Text may also be FASTA (headers are skipped), gzip compressed bytes,
+        or a file object (as written by write_dna). Binary DNA files are read using mmap.
+        """
+        if hasattr(text, "read"):
+            try:
+                dna_file = dnafile.DnaFile.open(text)
+            except (OSError, ValueError):  # e.g. not a binary DNA file, or a pipe
+                dna_file = None
+            if dna_file is not None:
+                self.dna = dna_file.segments()
+                dna_file.close()
+                return
+            text = text.read()
+        if isinstance(text, (bytes, bytearray)):
+            if text[:2] == b"\x1f\x8b":  # gzip magic number
+                text = gzip.decompress(text)
+            if dnafile.is_dna_file(text):
+                self.dna = dnafile.DnaFile(text).segments()
+                return
+            text = text.decode("ascii")
+        if text.lstrip().startswith(">"):  # FASTA: sequences may span several lines
+            records = text.split(">")[1:]
+            text = "\n".join(["".join(r.splitlines()[1:]) for r in records])
+        self.dna = [dna.stripDna(s) for s in text.split("\n")]
+        self.dna = [s for s in self.dna if s != ""]
 
     def compute_segments_sizes(self):
         """Compute DNA segments sizes, as well as max, median and average length"""
@@ -765,6 +1345,25 @@ class Container:
         self.segments_average_size = mean(ss)
         self.segments_median_size = int(median(ss))
 
+    def set_segments_sizes(self, sizes):
+        """Sets DNA segments count and max, median and average length from a Counter of
+        segments sizes (e.g. when segments are streamed and not kept in memory)."""
+        self.segments_count = sum(sizes.values())
+        self.segments_max_size = max(sizes)
+        self.segments_min_size = min(sizes)
+        self.segments_average_size = (
+            sum([k * v for k, v in sizes.items()]) / self.segments_count
+        )
+        # median: mean of the middle sizes (sorted positions (count-1)//2 and count//2)
+        middle = []
+        seen = 0
+        for k in sorted(sizes):
+            seen += sizes[k]
+            for p in [(self.segments_count - 1) // 2, self.segments_count // 2]:
+                if seen - sizes[k] <= p < seen:
+                    middle.append(k)
+        self.segments_median_size = int(mean(middle))
+
     def dna_to_array(self):
         """Reformats DNA segments strings into array"""
 
@@ -785,6 +1384,8 @@ class Container:
     def load_dna(self, text):
         """Reads DNA text, remove primers around each segment, compute segments size-statistics, converts to 2D data array."""
         self.read_dna(text)
+        if self.checkpoint_dir is not None:
+            self.set_checkpoint_id("\n".join(self.dna).encode("ascii"))
         self.remove_primers()
         self.compute_segments_sizes()
         self.dna_to_array()
@@ -794,38 +1395,39 @@ class Container:
     #############################################
 
     def decode_inner_code(self):
-        """Decode inner code"""
+        """Decode inner code.
+        If workers > 1, segments are decoded by worker processes (see parallel)."""
 
         logging.info("start : decode inner code")
 
+        if self.workers > 1:
+            self.decode_inner_code_parallel()
+            return
+
         # Load Reed Solomon codec
         innerCoder = RSCodec(self.necsi, c_exp=self.mi)
 
+        # Read inner code of all segments : message and ecc
+        dcols = [self.data.getcolumn(i) for i in range(self.data.size[1])]
+        dcols_mi = dna.merge_bases_2d(
+            [dcol[self.dnecsi :] for dcol in dcols], block_size=self.dmi
+        )
+        eccs_mi = dna.merge_bases_2d(
+            [dcol[: self.dnecsi] for dcol in dcols], block_size=self.dmi
+        )
+
         segments_to_destroy = []
+        corrected = []
+        decoded_msgs = []
         for i in range(self.data.size[1]):
 
-            # Read inner code : message
-            dcol = self.data.getcolumn(i)[self.dnecsi :]
-            dcol = [x for x in dcol if x != None]  # FIXME: ugly fix, solve at source?
-            darray = array.array("i", list(dcol))
-            darray_mi = dna.merge_bases(darray, block_size=self.dmi)
-
-            # Read inner code : ecc
-            ecc = self.data.getcolumn(i)[: self.dnecsi]
-            ecc2 = array.array("i", list(ecc))
-            ecc_mi = dna.merge_bases(ecc2, block_size=self.dmi)
-
             # Compute coded message to decode
-            darray_ba = bytearray(list(darray_mi))
-            ecc_ba = bytearray(list(ecc_mi))
-            coded_msg_ba = darray_ba + ecc_ba
+            coded_msg = bytes(dcols_mi[i]) + bytes(eccs_mi[i])
 
             # Perform reed solomon inner code errer check and correctio
             n_corrections = 0
             try:
-                decoded_msg, decoded_msgecc, errata_pos = innerCoder.decode(
-                    bytes(coded_msg_ba)
-                )
+                decoded_msg, decoded_msgecc, errata_pos = innerCoder.decode(coded_msg)
                 n_corrections = len(errata_pos)
             except Exception as e:
                 logging.debug(
@@ -836,99 +1438,245 @@ class Container:
                     i
                 )  # segment cannot be repaired and flagged for deletion
             if n_corrections > 0:
-                # Convert decoded message to bases to apply corrections
-                decoded_bases = dna.split_bases(decoded_msg, block_size=self.dmi)
-                decoded_ecc = dna.split_bases(decoded_msgecc, block_size=self.dmi)[
-                    -self.dnecsi :
-                ]
-                for j in range(len(decoded_bases)):
-                    if self.data.getpos(self.dnecsi + j, i) != decoded_bases[j]:
-                        self.inner_corrections += 1
-                        self.data.setpos(self.dnecsi + j, i, decoded_bases[j])
+                corrected.append(i)
+                decoded_msgs.append(decoded_msg)
+
+        # Convert decoded messages to bases to apply corrections
+        decoded_bases = dna.split_bases_2d(decoded_msgs, block_size=self.dmi)
+        for i, bases in zip(corrected, decoded_bases):
+            dcol = dcols[i][self.dnecsi :]
+            bases = bases[: len(dcol)]
+            self.inner_corrections += sum([x != y for x, y in zip(dcol, bases)])
+            self.data.setcolumn(i, bases, start_at=self.dnecsi)
+
+        # Deleting corrupted segments that could not be repaired (flagged for deletion)
+        for i in reversed(sorted(segments_to_destroy)):
+            col = self.data.popcolumn(i)
+
+    def decode_inner_code_parallel(self):
+        """Decodes inner code of segments on a pool of worker processes, with the same
+        corrections and segments beyond repair as decode_inner_code."""
+        matrix = parallel.SharedMatrix(
+            [self.data.getcolumn(i) for i in range(self.data.size[1])]
+        )
+        params = (self.necsi, self.mi, self.dnecsi)
+        pool = self.process_pool()
+        try:
+            results = parallel.map_rows(
+                pool, self.workers, parallel.inner_decode_rows, matrix, *params
+            )
+            # only corrected segments are copied back
+            for n_corrections, corrected, beyond_repair in results:
+                for i in corrected:
+                    self.data.setcolumn(
+                        i, matrix.row(i, self.dnecsi), start_at=self.dnecsi
+                    )
+        finally:
+            matrix.close(unlink=True)
+            pool.shutdown()
+
+        segments_to_destroy = []
+        for n_corrections, corrected, beyond_repair in results:
+            self.inner_corrections += n_corrections
+            for i in beyond_repair:
+                logging.debug(
+                    "decode inner code : unable to recover segement {i}".format(i=i)
+                )
+                self.segments_beyond_repair += 1
+                segments_to_destroy.append(i)
 
         # Deleting corrupted segments that could not be repaired (flagged for deletion)
         for i in reversed(sorted(segments_to_destroy)):
             col = self.data.popcolumn(i)
 
+    def read_index(self, masked_index):
+        """Reads masked index bases of consecutive columns (dI bases each, as returned by
+        make_index). Returns lists of segments numbers and of countdowns."""
+        index = self.mask_index(masked_index)
+        n = len(index) // self.dI
+        numbers_bases = bytearray(n * self.dI1)
+        count_downs_bases = bytearray(n * self.dI2)
+        for j in range(self.dI1):
+            numbers_bases[j :: self.dI1] = index[j :: self.dI]
+        for j in range(self.dI2):
+            count_downs_bases[j :: self.dI2] = index[self.dI1 + j :: self.dI]
+        numbers = dna.merge_bases_2d([numbers_bases], block_size=self.dI1)[0]
+        count_downs = dna.merge_bases_2d([count_downs_bases], block_size=self.dI2)[0]
+        return list(numbers), list(count_downs)
+
+    def read_indexes(self):
+        """Reads the index of all columns of the representation, in position order.
+        Returns lists of segments numbers and of countdowns (see read_index)."""
+        logging.debug("start : read index")
+        masked_index = bytearray(self.data.size[1] * self.dI)
+        for i in range(self.data.size[1]):  # len(self.data.data)
+            col = self.data.data[i]["column"][self.dnecsi : self.dnecsi + self.dI]
+            masked_index[i * self.dI : i * self.dI + len(col)] = col
+        return self.read_index(masked_index)
+
+    def read_layout(self, count_downs, n_segments):
+        """Reads dnecso, necso, dblocksize and numblocks from countdowns: count_downs is
+        the list of (position, segment number, countdown) of segments with a non null
+        countdown (n_segments segments read). Returns the number of the last segment.
+        Countdowns end on the last ecc column and on the last column of each block: each
+        countdown votes for its end column (segment number + countdown), in one pass.
+        Layouts (dnecso, dblocksize) are taken from the first ends, each layout gets the
+        votes of the ends it explains, the layout with most votes is kept. Votes, votes
+        of the kept layout and margin over the next layout are kept for statistics.
+        If a manifest is loaded (see from_manifest), its layout is used instead."""
+
+        if self.manifest is not None:
+            for name, value in self.manifest["layout"].items():
+                setattr(self, name, value)
+            return self.manifest["segments"] - 1
+
+        logging.debug("start : read layout from countdowns")
+        votes = Counter()
+        for position, index, count_down in count_downs:
+            votes[index + count_down] += 1
+        return self.vote_layout(votes)
+
+    def vote_layout(self, votes):
+        """Reads the layout from votes (Counter: end column -> number of countdowns ending
+        on it), see read_layout. Returns the number of the last segment, or None if no
+        layout is found."""
+        ends = sorted(votes)
+
+        def score(dnecso, dblocksize):
+            """Returns votes of the ends explained by a layout, and the last segment
+            number. The end of a short last block (the most voted end after the last ecc
+            end, in its block) is explained too."""
+            explained = 0
+            last_index = None
+            for end in ends:
+                if end % dblocksize in (dnecso - 1, dblocksize - 1):
+                    explained += votes[end]
+                    last_index = end
+            if last_index % dblocksize == dnecso - 1:
+                short = [
+                    end
+                    for end in ends
+                    if end > last_index
+                    and end // dblocksize == last_index // dblocksize
+                ]
+                if len(short) > 0:
+                    last_index = max(short, key=lambda end: votes[end])
+                    explained += votes[last_index]
+            return explained, last_index
+
+        def candidates(ends):
+            """Returns layouts from the first ends of ecc columns (symbols of dmo columns)
+            and the next ends of blocks (any column for a single short block), a few in
+            case of ends voted by corrupted segments."""
+            n = 4
+            layouts = []
+            for dnecso in [x + 1 for x in ends if (x + 1) % self.dmo == 0][:n]:
+                for dblocksize in itertools.islice(
+                    (x + 1 for x in ends if x >= dnecso), n
+                ):
+                    layouts.append((score(dnecso, dblocksize), dnecso, dblocksize))
+            return layouts
+
+        # layouts are taken from ends voted by a run of countdowns (at least 1/16 of the
+        # votes of the most voted end), so that a few corrupted countdowns ending before
+        # the first ecc column do not hide it, else from all ends
+        top = max(votes.values(), default=0)
+        layouts = candidates([x for x in ends if 16 * votes[x] >= top])
+        if len(layouts) == 0:
+            layouts = candidates(ends)
+        if len(layouts) == 0:
+            logging.error("no layout found in countdowns")
+            return None
+        layouts.sort(key=lambda x: x[0][0], reverse=True)
+        (support, last_index), self.dnecso, self.dblocksize = layouts[0]
+        self.necso = self.dnecso // self.dmo
+        self.numblocks = int(math.ceil((last_index + 1) / self.dblocksize))
+
+        self.layout_votes = sum(votes.values())
+        self.layout_support = support
+        self.layout_margin = support - max([x[0][0] for x in layouts[1:]] + [0])
+        if support < self.layout_votes:
+            logging.warning(
+                "{n} COUNTDOWNS DISAGREE WITH LAYOUT".format(
+                    n=self.layout_votes - support
+                )
+            )
+        logging.debug("necso = {necso}".format(necso=self.necso))
+        logging.debug("dblocksize = {dblocksize}".format(dblocksize=self.dblocksize))
+        logging.debug("numblocks = {numblocks}".format(numblocks=self.numblocks))
+        logging.debug("last_index = {last_index}".format(last_index=last_index))
+        return last_index
+
+    def layout_supported(self):
+        """Returns True if the layout read from countdowns (see read_layout) explains at
+        least layout_min_support of the votes, and layout_min_margin votes more than the
+        next layout. A layout read from a manifest is always supported."""
+        if self.manifest is not None:
+            return True
+        return (
+            self.layout_support >= self.layout_min_support * self.layout_votes
+            and self.layout_margin >= self.layout_min_margin
+        )
+
+    def check_layout(self):
+        """Returns True if the layout read from countdowns is supported by their votes (see
+        layout_supported), else records an error: decoding must stop before the outer
+        code, as it would fail with a wrong layout."""
+        if self.layout_supported():
+            return True
+        logging.error(
+            "LAYOUT NOT SUPPORTED BY COUNTDOWNS: {support} of {votes} votes, margin {margin}".format(
+                support=self.layout_support,
+                votes=self.layout_votes,
+                margin=self.layout_margin,
+            )
+        )
+        self.error = True
+        self.error_message += (
+            "Layout not supported by countdowns: "
+            + str(self.layout_support)
+            + " of "
+            + str(self.layout_votes)
+            + " votes, margin "
+            + str(self.layout_margin)
+            + ".\n"
+        )
+        return False
+
     def sort_segments(self):
         """Sorts segments by their index. If a segment is not there its columns is empty: it
         will be used later to restore the segment using the Reed Solomon outer code.
         In order to determine the number of the last segment even if it was lost the
-        countdown in I2 is used. The same principle is applied for necso."""
+        countdown in I2 is used. The same principle is applied for necso.
+        Returns the number of the last segment, or None if no layout is found in countdowns
+        or if their votes do not support it (an error is recorded, see check_layout)."""
 
         logging.info("start : read index and sort segments")
 
-        # Get position of a segment
-        def get_index(a):
-            """Computes integer value of DNA segment"""
-            bytes_index = bytearray()
-            for i in range(len(a)):
-                bytes_index.append(a[i])
-            bytes_index2 = bytesutils.merge_four_bytes_in_one(bytes_index)
-            idx = int.from_bytes(bytes_index2, byteorder="big")
-            return idx
-
         # Get position of each segment
-
-        indices = []
-        count_down = []
-
-        logging.debug("start : read index")
-        for i in range(self.data.size[1]):  # len(self.data.data)
-            masked_index = self.data.data[i]["column"][
-                self.dnecsi : self.dnecsi + self.dI
-            ]
-            # masked_index = self.data.getcolumn(i)[self.dnecsi:self.dnecsi+self.dI]
-            index_col = []
-            for j in range(len(masked_index)):
-                index_col.append(
-                    (masked_index[j] ^ self.rand_ints[j % len(self.rand_ints)]) % 4
-                )
-            indices.append(get_index(index_col[: self.dI1]))
-            count_down.append(get_index(index_col[self.dI1 :]))
+        indices, count_down = self.read_indexes()
+        for i in range(self.data.size[1]):
             # self.data.updateindex(i, indices[i])
             self.data.data[i]["index"] = indices[i]
 
-        # Get necso (using first countdown in I2)
-        # TODO: make more robust, i.e. combine countdown for from all blocks
-        logging.debug("start : compute necso")
-        for i in range(len(count_down)):
-            if count_down[i] != 0:
-                self.dnecso = indices[i] + count_down[i] + 1
-                self.necso = self.dnecso // self.dmo
-                break
-        logging.debug("necso = {necso}".format(necso=self.necso))
-
-        # Get number of blocks and their sizes
-        # TODO: make more robust, use countdowns for from all blocks
-        #       espetially if a lot of segments are lost we should still
-        #       find the right number of blocks
-        # In theory, 2 approachea are possible:
-        #   1. recompute using number of segments and necso (as done at encoding)
-        #   2. detect form countdonw
-        # Here, they are combined.
-
-        # find blocksize (i.e. first block end)
-        logging.debug("start : compute blocksize")
-        start_at = self.dnecso + 1
-        for i in range(start_at, len(count_down)):
-            if count_down[i] != 0:
-                self.dblocksize = indices[i] + count_down[i] + 1
-                break
-        logging.debug("dblocksize = {dblocksize}".format(dblocksize=self.dblocksize))
-
-        # compute number of blocks and their size
-        logging.debug("start : compute number of blocks")
-        dk_approx = self.data.size[1]
-        self.numblocks = int(math.ceil(dk_approx / self.dblocksize))
-        logging.debug("numblocks = {numblocks}".format(numblocks=self.numblocks))
-
-        last_index = None
-        for i in range(len(count_down)):
-            if count_down[-i] != 0:  # take fisrt index for non null countdowns
-                last_index = indices[-i] + count_down[-i]
-                break
-        logging.debug("last_index = {last_index}".format(last_index=last_index))
+        # Get layout from non null countdowns
+        count_downs = [
+            (i, indices[i], count_down[i])
+            for i in range(len(count_down))
+            if count_down[i] != 0
+        ]
+        last_index = self.read_layout(count_downs, self.data.size[1])
+        if last_index is None:
+            self.error = True
+            self.error_message += "Layout not found in countdowns.\n"
+            return None
+        if not self.check_layout():
+            return None
+
+        # Remove duplicated segments: the last one read of each index is kept
+        n_duplicates = self.data.popduplicates()
+        if n_duplicates > 0:
+            logging.info("{n} duplicated segments removed".format(n=n_duplicates))
 
         # Detect and remove index outliers
         # FIXME: there should not be outliers as index is protected by innercode
@@ -956,8 +1704,8 @@ class Container:
 
         def missing_indices(l):
             l2 = sorted(l)
-            start, end = l2[0], l2[-1]
-            return sorted(set(range(start, end + 1)).difference(l2))
+            end = l2[-1]
+            return sorted(set(range(end + 1)).difference(l2))
 
         missing_indx = missing_indices(indices)
         # logging.debug('start : missing indicies ' + str(missing_indx))
@@ -971,130 +1719,895 @@ class Container:
             missing_indx = missing_indx + missing_indx2
         for x in missing_indx:
             self.data.addcolumn(x)
+        self.lost_indexes = sorted(self.lost_indexes + missing_indx)
 
         logging.debug("start : sort data array (reindex)")
         # Sort data array according to index
         self.data.reindex_columns()
+        return last_index
 
-    def decode_outer_code(self):
-        """Decodes Reed Solomon outer code: restore and correct segments"""
+    def decode_outer_code(self, start=0):
+        """Decodes Reed Solomon outer code: restore and correct segments.
+        Blocks before block start are considered decoded (e.g. resumed from a checkpoint).
+        """
 
         logging.info("start : decode outer code")
 
         outerCoder = RSCodec(self.necso, nsize=self.n)
-        line_offset = self.dnecsi + self.dI
 
-        for blk in range(self.numblocks):
+        pool = self.process_pool()
+        try:
+            blocks = self.outer_decoded_blocks(outerCoder, pool, start)
+            for blk in self.checkpointed("decode_outer_code", blocks):
+                pass
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+    def outer_decoded_blocks(self, outerCoder, pool=None, start=0):
+        """Decodes outer code of blocks from block start, and yields block numbers in order as
+        blocks are decoded. With a process pool, blocks are decoded as independent tasks if there are
+        at least as many blocks as workers (see decode_blocks), else each block is decoded
+        in turn by all workers."""
+        if pool is not None and self.numblocks - start >= self.workers:
+            return self.decode_blocks(pool, start)
+
+        def decode(blk):
+            self.decode_outer_code_block(
+                blk, outerCoder, pool, self.block_erasures(blk)
+            )
+            return blk
+
+        return map(decode, range(start, self.numblocks))
 
-            for i in range(self.data.size[0] - line_offset):
+    def decode_blocks(self, pool, start=0):
+        """Decodes outer code of blocks as independent tasks on the process pool: each block
+        is copied in shared memory and decoded by one worker. At most 2 blocks per worker
+        are in progress. Generator: yields block numbers in order, as soon as a block and
+        all previous ones are decoded. Results (corrections, errors) are recorded in block
+        order. If a task fails, the block is left as is and the failure is recorded as an
+        error, other blocks are not affected."""
+
+        line_offset = self.dnecsi + self.dI
+        params = (self.necso, self.n, self.mo, self.dnecso)
+        blocks = iter(range(start, self.numblocks))
+        pending = {}  # future -> (block, shared matrix)
+        results = {}  # block -> (shared matrix, results) or exception
 
+        def submit():
+            for blk in blocks:
                 block_start = blk * self.dblocksize
                 block_stop = min([(blk + 1) * self.dblocksize, self.data.size[1]])
-
-                dline = self.data.getline(
-                    i + line_offset, s=slice(block_start, block_stop)
+                matrix = self.shared_block(
+                    self.data, block_start, block_stop, line_offset, self.data.size[0]
+                )
+                n_lines = len(matrix.lengths)
+                future = pool.submit(
+                    parallel.outer_decode_rows,
+                    matrix.spec(),
+                    0,
+                    n_lines,
+                    *params,
+                    self.block_erasures(blk),
+                )
+                pending[future] = (blk, matrix)
+                return
+
+        try:
+            for i in range(2 * self.workers):
+                submit()
+            next_blk = start
+            while len(pending) > 0:
+                finished, not_finished = concurrent.futures.wait(
+                    pending, return_when=concurrent.futures.FIRST_COMPLETED
                 )
-                dline = [x for x in dline if x != None]
+                for future in finished:
+                    blk, matrix = pending.pop(future)
+                    try:
+                        results[blk] = (matrix, future.result())
+                    except Exception as e:
+                        results[blk] = e
+                        matrix.close(unlink=True)
+                    submit()
+
+                # record results and yield blocks in order
+                while next_blk in results:
+                    result = results.pop(next_blk)
+                    if isinstance(result, Exception):
+                        logging.error(
+                            'OUTER CODE DECODE ERROR. Block {block} failed, error "{error}"'.format(
+                                block=next_blk, error=str(result)
+                            )
+                        )
+                        self.error = True
+                        self.error_message += (
+                            "Decode outer code error. Block:"
+                            + str(next_blk)
+                            + ". Error: "
+                            + str(result)
+                            + "\n"
+                        )
+                    else:
+                        matrix, (n_corrections, errors) = result
+                        self.outer_corrections += n_corrections
+                        for i, error in errors:
+                            self.outer_code_error(next_blk, i, error)
+                        if n_corrections > 0:
+                            block_start = next_blk * self.dblocksize
+                            self.copy_back_messages(matrix, block_start, line_offset)
+                        matrix.close(unlink=True)
+                    yield next_blk
+                    next_blk += 1
+        finally:
+            for future, (blk, matrix) in pending.items():
+                future.cancel()
+                concurrent.futures.wait([future])
+                matrix.close(unlink=True)
+            for result in results.values():
+                if not isinstance(result, Exception):
+                    result[0].close(unlink=True)
+
+    def outer_code_error(self, blk, i, error):
+        """Logs and records an outer code decode error on line i of block blk."""
+        logging.error(
+            'OUTER CODE DECODE ERROR. Block {block}, line {line}, error "{error}"'.format(
+                block=blk, line=i, error=error
+            )
+        )
+        self.error = True
+        self.error_message += (
+            "Decode outer code error on line "
+            + str(i)
+            + ". Block:"
+            + str(blk)
+            + ". Error: "
+            + error
+            + "\n"
+        )
 
-                ecc = dline[: (self.necso * self.dmo)]
-                msg = dline[(self.necso * self.dmo) :]
+    def block_erasures(self, blk):
+        """Returns the columns of block blk lost at decoding (see sort_segments), numbered
+        from the start of the block: erasures of its outer code (see
+        decode_outer_code_block)."""
+        block_start = blk * self.dblocksize
+        block_stop = block_start + self.dblocksize
+        start = bisect.bisect_left(self.lost_indexes, block_start)
+        stop = bisect.bisect_left(self.lost_indexes, block_stop)
+        return [i - block_start for i in self.lost_indexes[start:stop]]
+
+    def decode_outer_code_block(self, blk, outerCoder, pool=None, erasures=None):
+        """Decodes Reed Solomon outer code of block blk.
+        If a process pool is given, lines are decoded by worker processes (see parallel).
+        erasures are the columns of the block known to be missing (numbered from the start
+        of the block): their outer code symbols are decoded as erasures, so that up to
+        necso missing symbols are restored.
+        """
 
-                msga = array.array("i", list(msg))
-                ecca = array.array("i", list(ecc))
+        line_offset = self.dnecsi + self.dI
 
-                msgm = dna.merge_bases(msga, block_size=self.dmo)
-                eccm = dna.merge_bases(ecca, block_size=self.dmo)
+        block_start = blk * self.dblocksize
+        block_stop = min([(blk + 1) * self.dblocksize, self.data.size[1]])
+        block_slice = slice(block_start, block_stop)
 
-                if self.mo <= 8:
-                    msgm = bytearray(list(msgm))
-                    eccm = bytearray(list(eccm))
+        if pool is not None:
+            # lines are decoded in place in the block columns, message columns are copied
+            # back if corrected
+            matrix = self.shared_block(
+                self.data, block_start, block_stop, line_offset, self.data.size[0]
+            )
+            params = (self.necso, self.n, self.mo, self.dnecso, erasures)
+            try:
+                results = parallel.map_rows(
+                    pool, self.workers, parallel.outer_decode_rows, matrix, *params
+                )
+                if sum([n_corrections for n_corrections, errors in results]) > 0:
+                    self.copy_back_messages(matrix, block_start, line_offset)
+            finally:
+                matrix.close(unlink=True)
+            for n_corrections, errors in results:
+                self.outer_corrections += n_corrections
+                for i, error in errors:
+                    self.outer_code_error(blk, i, error)
+            return
+        dlines = self.data.getlines(line_offset, self.data.size[0], s=block_slice)
+
+        msgsm = dna.merge_bases_2d(
+            [dline[self.dnecso :] for dline in dlines], block_size=self.dmo
+        )
+        eccsm = dna.merge_bases_2d(
+            [dline[: self.dnecso] for dline in dlines], block_size=self.dmo
+        )
 
-                try:
-                    n_corrections = 0
-                    decoded_block, decoded_msgecc, errata_pos = outerCoder.decode(
-                        msgm + eccm
-                    )
-                    n_corrections = len(errata_pos)
+        corrected = []
+        decoded_blocks = []
+        for i in range(len(dlines)):
+
+            msgm = msgsm[i]
+            eccm = eccsm[i]
+            if self.mo <= 8:
+                msgm = bytearray(msgm)
+                eccm = bytearray(eccm)
+            erase_pos = None
+            if erasures:
+                erase_pos = parallel.erasure_positions(
+                    erasures, len(msgm), self.necso, self.dmo
+                )
 
-                except Exception as e:
-                    logging.error(
-                        'OUTER CODE DECODE ERROR. Block {block}, line {line}, error "{error}"'.format(
-                            block=blk, line=i, error=str(e)
-                        )
-                    )
-                    self.error = True
-                    self.error_message += (
-                        "Decode outer code error on line "
-                        + str(i)
-                        + ". Block:"
-                        + str(blk)
-                        + ". Error: "
-                        + str(e)
-                        + "\n"
-                    )
+            try:
+                n_corrections = 0
+                decoded_block, decoded_msgecc, errata_pos = outerCoder.decode(
+                    msgm + eccm, erase_pos=erase_pos
+                )
+                n_corrections = len(errata_pos)
 
-                if n_corrections > 0:
-                    self.outer_corrections += n_corrections
-                    decoded_bases = dna.split_bases(decoded_block, block_size=self.dmo)
-                    # TODO : should not be restricted to scope but full range of decodec bases
-                    line = self.data.getline(i + line_offset)
-                    scope = min(
-                        [
-                            len(decoded_bases),
-                            len(line[self.dnecso + blk * self.dblocksize :]),
-                        ]
-                    )
-                    for j in range(scope):
-                        self.data.setpos(
-                            i + line_offset,
-                            self.dnecso + j + blk * self.dblocksize,
-                            decoded_bases[j],
-                        )
+            except Exception as e:
+                self.outer_code_error(blk, i, str(e))
+
+            if n_corrections > 0:
+                self.outer_corrections += n_corrections
+                corrected.append(i)
+                decoded_blocks.append(decoded_block)
+
+        # Write corrected lines back (decoded bases beyond line are padding)
+        if len(corrected) > 0:
+            decoded_bases = dna.split_bases_2d(decoded_blocks, block_size=self.dmo)
+            for i, bases in zip(corrected, decoded_bases):
+                scope = len(dlines[i]) - self.dnecso
+                dlines[i] = dlines[i][: self.dnecso] + bases[:scope]
+            self.data.setlines(line_offset, dlines, s=block_slice)
 
     def check_and_correct_logical_redundancy(self):
         """Processes logical redundency: decode innercode, sort segments and decodes outer code."""
-        self.decode_inner_code()
-        self.sort_segments()
-        self.decode_outer_code()
+        start = self.sorted_segments()
+        if start is None:
+            return
+        self.decode_outer_code(start)
+        self.clear_checkpoint()
+
+    def sorted_segments(self):
+        """Decodes inner code and sorts segments, unless resumed from a checkpoint.
+        Returns the number of blocks whose outer code is already decoded, or None if no
+        layout is found (see sort_segments)."""
+        start = self.restore_checkpoint("decode_outer_code")
+        if start is None:
+            self.decode_inner_code()
+            if self.sort_segments() is None:
+                return None
+            start = 0
+            self.save_checkpoint("decode_outer_code", start)
+        return start
 
     ############################
     ### Data output : binary ###
     ############################
 
-    def write_binary(self):
-        """Writes 2D DNA data array to binary data."""
+    def package_chunker(self, columns=None, verify=True):
+        """Returns a function which returns the package bytes (zipped if auto_zip) of block blk:
+        message bases of the data columns of the block are merged and unmasked. Blocks must
+        be passed in order as bases that do not complete a byte are carried over to the next
+        block. Message bases of block blk are read from self.data, or returned by
+        columns(blk) if given (list of bytes-like objects, one per data column).
+        Blocks are verified against the loaded manifest, if any, unless verify is False.
+        """
+        line_offset = self.dnecsi + self.dI
+        state = {"offset": 0, "rest": b"", "pending": None}
 
-        logging.info("start : write binary")
+        if columns is None:
+            indexes = sorted(self.data.column_indexes())
 
-        line_offset = self.dnecsi + self.dI
+            def columns(blk):
+                block_start = blk * self.dblocksize + self.dnecso
+                block_stop = min([(blk + 1) * self.dblocksize, self.data.size[1]])
+                return [
+                    self.data.getcolumn(i)[line_offset : self.data.size[0]]
+                    for i in indexes[block_start:block_stop]
+                ]
 
-        self.binary_data = b""
+        def chunk(blk):
+            bases = b"".join([state["rest"]] + columns(blk))
+            n = len(bases) // 4
+            state["rest"] = bases[4 * n :]
 
-        for blk in range(self.numblocks):
+            out = self.mask_bytes(
+                bytesutils.merge_four_bytes_in_one(bases), offset=state["offset"]
+            )
+            if verify and self.manifest is not None:
+                # a byte holding bases of two blocks is checked with both of them
+                if state["pending"] is not None:
+                    pending_blk, pending_out, pending_offset = state["pending"]
+                    self.verify_block(
+                        pending_blk, pending_out + out[:1], pending_offset
+                    )
+                    state["pending"] = None
+                if len(state["rest"]) > 0 and blk < self.numblocks - 1:
+                    state["pending"] = (blk, out, state["offset"])
+                else:
+                    self.verify_block(blk, out, state["offset"])
+            state["offset"] += n
+            return out
 
-            block_start = blk * self.dblocksize + self.dnecso
-            block_stop = min([(blk + 1) * self.dblocksize, self.data.size[1]])
+        return chunk
 
-            for i in sorted(self.data.column_indexes())[block_start:block_stop]:
-                col = self.data.getcolumn(i)[line_offset : self.data.size[0]]
-                col = [x for x in col if x != None]
-                for b in col:
-                    self.binary_data += dna.int2bytes(b, n=1)
+    def package_chunks(self):
+        """Yields the package (zipped if auto_zip) block by block (see package_chunker)."""
+        return map(self.package_chunker(), range(self.numblocks))
 
-        self.binary_data = bytesutils.merge_four_bytes_in_one(self.binary_data)
+    def write_binary(self, outfile=None, chunk_size=2**20):
+        """Writes 2D DNA data array to binary data, which is returned.
+        If a binary file object outfile is given, data is streamed to it instead, block by
+        block (the zipped package is buffered in a temporary file and the information
+        package is extracted chunk by chunk): the size written is returned."""
+
+        logging.info("start : write binary")
 
-        self.binary_data = self.mask_bytes(self.binary_data)
+        return self.write_package(self.package_chunks(), outfile, chunk_size)
+
+    def write_package(self, chunks, outfile=None, chunk_size=2**20):
+        """Writes binary data from package chunks (see write_binary)."""
+
+        if outfile is None:
+            self.binary_data = b"".join(chunks)
+            if self.auto_zip:
+                zip_buffer2 = io.BytesIO(self.binary_data)
+                with zipfile.ZipFile(
+                    zip_buffer2, "a", zipfile.ZIP_DEFLATED, False
+                ) as zip_file:
+                    self.binary_data = zip_file.read("information_package")
+                del zip_buffer2
+            self.binary_size = len(self.binary_data)
+            return self.binary_data
 
         if self.auto_zip:
-            zip_buffer2 = io.BytesIO(self.binary_data)
-            with zipfile.ZipFile(
-                zip_buffer2, "a", zipfile.ZIP_DEFLATED, False
-            ) as zip_file:
-                self.binary_data = zip_file.read("information_package")
-            del zip_buffer2
+            with tempfile.TemporaryFile() as package_file:
+                for chunk in chunks:
+                    package_file.write(chunk)
+                with zipfile.ZipFile(package_file) as zip_file:
+                    with zip_file.open("information_package") as member:
+                        shutil.copyfileobj(member, outfile, chunk_size)
+                    self.binary_size = zip_file.getinfo("information_package").file_size
+        else:
+            self.binary_size = 0
+            for chunk in chunks:
+                outfile.write(chunk)
+                self.binary_size += len(chunk)
+        return self.binary_size
+
+    def decode_binary(self, outfile=None):
+        """Decodes loaded DNA to binary data, same as check_and_correct_logical_redundancy
+        followed by write_binary(outfile). Outer code is decoded and binary data written
+        block by block: if pipeline_depth > 0 both overlap on worker threads (see pipeline).
+        Returns None if no layout is found in countdowns (an error is recorded).
+        """
+        start = self.sorted_segments()
+        if start is None:
+            return None
+
+        logging.info("start : decode outer code and write binary")
+
+        outerCoder = RSCodec(self.necso, nsize=self.n)
+
+        pool = self.process_pool()
+
+        depth = self.pipeline_depth
+        if self.representation_type == "sql":  # SQL session is not shared by threads
+            depth = 0
+        try:
+            blocks = self.outer_decoded_blocks(outerCoder, pool, start)
+            blocks = self.checkpointed("decode_outer_code", blocks)
+            blocks = itertools.chain(range(start), blocks)
+            chunks = pipeline.run(blocks, [self.package_chunker()], depth)
+            size = self.write_package(chunks, outfile)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        self.clear_checkpoint()
+        return size
+
+    #####################################
+    ### Regeneration of lost segments ###
+    #####################################
+
+    def regenerate_segments(self, indexes=None):
+        """Returns the DNA segments (with primers) of columns indexes, by default of the
+        segments lost or beyond repair at decoding (see sort_segments), e.g. to synthesize
+        them again. DNA must be decoded in memory (see decode_binary): outer code decoding
+        restores the message of lost columns, ecc columns are computed again for blocks
+        with a lost ecc column, then index and inner code are added to lost columns only.
+        Raises ValueError if decoding failed."""
+        if self.error:
+            raise ValueError("Package not decoded: " + self.error_message.strip())
+        if indexes is None:
+            indexes = self.lost_indexes
+        indexes = sorted(set(indexes))
+        if len(indexes) > 0 and not 0 <= indexes[0] <= indexes[-1] < self.data.size[1]:
+            raise ValueError("Segment number out of range")
+
+        logging.info("start : regenerate {n} segments".format(n=len(indexes)))
+
+        self.dn = self.data.size[1]
+        outerCoder = RSCodec(self.necso, nsize=self.n)
+        innerCoder = RSCodec(self.necsi, c_exp=self.mi)
+        blocks = [
+            i // self.dblocksize for i in indexes if i % self.dblocksize < self.dnecso
+        ]
+        for blk in sorted(set(blocks)):
+            self.add_outer_code_block(self.data, blk, outerCoder)
+
+        # index and inner code of consecutive lost columns at once
+        for k, group in itertools.groupby(enumerate(indexes), lambda x: x[1] - x[0]):
+            group = [i for j, i in group]
+            self.add_index_columns(self.data, group[0], group[-1] + 1)
+            self.add_inner_code_columns(self.data, group[0], group[-1] + 1, innerCoder)
+
+        segments = dna.bits2segments([self.data.getcolumn(i) for i in indexes])
+        return self.with_primers(segments)
+
+    ################################
+    ### External memory decoding ###
+    ################################
+
+    def dna_input(self, infile, chunk_size=2**20):
+        """Returns a seekable binary file object with the uncompressed content of DNA file
+        object infile: infile itself, or a temporary copy if it is gzip compressed or not
+        seekable (e.g. stdin)."""
+        f = infile
+        if not f.seekable():
+            f = tempfile.TemporaryFile()
+            shutil.copyfileobj(infile, f, chunk_size)
+        f.seek(0)
+        if f.read(2) == b"\x1f\x8b":  # gzip magic number
+            f.seek(0)
+            spool = tempfile.TemporaryFile()
+            with gzip.GzipFile(fileobj=f, mode="rb") as stream:
+                shutil.copyfileobj(stream, spool, chunk_size)
+            if f is not infile:
+                f.close()
+            f = spool
+        f.seek(0)
+        return f
+
+    def iter_dna(self, f):
+        """Yields DNA segments of seekable binary file object f (see dna_input) one by one,
+        from any format read by read_dna."""
+        f.seek(0)
+        if dnafile.is_dna_file(f.read(len(dnafile.MAGIC))):
+            f.seek(0)
+            try:
+                dna_file = dnafile.DnaFile.open(f)
+            except OSError:  # e.g. an in memory file
+                dna_file = dnafile.DnaFile(f.read())
+            try:
+                for i in range(len(dna_file)):
+                    yield dna_file[i]
+            finally:
+                dna_file.close()
+            return
+
+        f.seek(0)
+        text = io.TextIOWrapper(f, encoding="ascii", newline="\n")
+        try:
+            record = None  # FASTA record, sequences may span several lines
+            for line in text:
+                if record is None and line.lstrip().startswith(">"):
+                    record = []
+                elif record is None:
+                    segment = dna.stripDna(line.rstrip("\n"))
+                    if segment != "":
+                        yield segment
+                elif line.startswith(">"):
+                    segment = dna.stripDna("".join(record))
+                    if segment != "":
+                        yield segment
+                    record = []
+                else:
+                    record.append(line.rstrip("\r\n"))
+            if record is not None:
+                segment = dna.stripDna("".join(record))
+                if segment != "":
+                    yield segment
+        finally:
+            text.detach()
+
+    def dna_chunks(self, f, chunk_size):
+        """Yields lists of at most chunk_size DNA segments of f, without primers."""
+        segments = self.iter_dna(f)
+        while True:
+            chunk = list(itertools.islice(segments, chunk_size))
+            if len(chunk) == 0:
+                return
+            yield self.without_primers(chunk)
+
+    def write_runs(self, f, chunk_size, tmp_dir=None):
+        """Decodes inner code of the DNA segments of f, chunk by chunk, and writes each
+        chunk to a sorted run file (see runs). Returns run files, the number of segments
+        left, countdowns (as used by read_layout) and the (position, segment) of segments
+        shorter than median size lost when padded (see rescue_last_segment). Countdowns
+        are in index order rather than in input order, so that the layout is read even if
+        segments are shuffled.
+        """
+        from . import representation
+
+        n_lines = self.segments_median_size
+        run_files = []
+        count_downs = []
+        short = []
+        position = 0
+        n_segments = 0
+        for chunk in self.dna_chunks(f, chunk_size):
+            # columns are padded to median size, except the last segment (see dna_to_array)
+            k = len(chunk) - (position + len(chunk) == self.segments_count)
+            columns = dna.segments2bits(chunk[:k], length=n_lines)
+            columns += dna.segments2bits(chunk[k:])
+            self.data = representation.Representation.from_columns(
+                columns, range(len(columns)), [n_lines, len(columns)]
+            )
+            padded = [j for j in range(k) if len(chunk[j]) < n_lines]
+            self.decode_inner_code()
+
+            indices, count_down = self.read_indexes()
+            records = []
+            kept = set()
+            for i, column in enumerate(self.data.data):
+                k = column["index"]  # position in chunk
+                kept.add(k)
+                records.append(
+                    (indices[i], position + k, len(chunk[k]), column["column"])
+                )
+                if count_down[i] != 0:
+                    count_downs.append((indices[i], indices[i], count_down[i]))
+            run_file = tempfile.TemporaryFile(dir=tmp_dir)
+            run_files.append(run_file)
+            runs.write_run(run_file, records)
+            n_segments += len(records)
+            short += [(position + j, chunk[j]) for j in padded if j not in kept]
+            position += len(chunk)
+        self.data = None
+        return run_files, n_segments, sorted(count_downs), short
+
+    def rescue_last_segment(self, short, last_index):
+        """Decodes inner code of short segments (see write_runs) without padding. Returns
+        the record (see runs) of the first one of index last_index, i.e. the last segment
+        read before the end of the input, or None. Other segments stay beyond repair."""
+        from . import representation
+
+        beyond_repair = self.segments_beyond_repair
+        corrections = self.inner_corrections
+        record = None
+        for position, segment in short:
+            columns = dna.segments2bits([segment])
+            self.data = representation.Representation.from_columns(
+                columns, [0], [self.segments_median_size, 1]
+            )
+            self.decode_inner_code()
+            if len(self.data.data) == 1 and self.read_indexes()[0][0] == last_index:
+                record = (last_index, position, len(segment), self.data.getcolumn(0))
+                self.segments_beyond_repair = beyond_repair - 1
+                break
+            self.segments_beyond_repair = beyond_repair
+            self.inner_corrections = corrections
+        self.data = None
+        return record
+
+    def decode_external(self, infile, outfile=None, chunk_size=2**16, tmp_dir=None):
+        """Decodes DNA of binary file object infile (in any format read by read_dna) to
+        binary data, like load_dna followed by decode_binary(outfile), in bounded memory:
+            - segments are read twice (to compute their median size, then to decode them)
+            - inner code is decoded by chunks of chunk_size segments, each chunk is sorted
+              by segment index into a run file (temporary file in tmp_dir)
+            - runs are merged block by block (k-way merge): only the outer code block
+              being decoded is in memory.
+        Index outliers are removed and missing segments restored as by sort_segments.
+        Segments may be in any order: the layout is read from countdowns in index order,
+        and the last segment (which may be shorter) is the one of the last index rather
+        than the last one read. Returns None if no layout is found in countdowns or if it
+        is not supported by their votes (an error is recorded, see check_layout)."""
+
+        from . import representation
+
+        logging.info("start : external memory decoding")
+
+        f = self.dna_input(infile)
+        run_files = []
+        pool = None
+        try:
+            # segments sizes
+            sizes = Counter()
+            for chunk in self.dna_chunks(f, chunk_size):
+                sizes.update([len(x) for x in chunk])
+            self.set_segments_sizes(sizes)
+
+            # inner code and sorted runs
+            logging.info("start : decode inner code and sort segments")
+            run_files, n_segments, count_downs, short = self.write_runs(
+                f, chunk_size, tmp_dir
+            )
+            last_index = self.read_layout(count_downs, n_segments)
+            if last_index is None:
+                self.error = True
+                self.error_message += "Layout not found in countdowns.\n"
+                return None
+            record = self.rescue_last_segment(short, last_index)
+            if record is not None:
+                run_files.append(tempfile.TemporaryFile(dir=tmp_dir))
+                n_segments += runs.write_run(run_files[-1], [record])
+                last_index = self.read_layout(count_downs, n_segments)
+            if not self.check_layout():
+                return None
+
+            # index outliers, missing and duplicated segments (see sort_segments)
+            threshold = n_segments + self.dnecso
+            n_valid = 0
+            n_unique = 0
+            previous = None
+            for index, position, size, bases in runs.merge_runs(run_files, bases=False):
+                if index > threshold:
+                    continue
+                n_valid += 1
+                if index != previous:
+                    n_unique += 1
+                previous = index
+            if n_valid < n_segments:
+                logging.warning(
+                    "{noutliers} INDEX OUTLIERS DETECTED".format(
+                        noutliers=n_segments - n_valid
+                    )
+                )
+            last_segment = previous
+            self.segments_lost += previous + 1 - n_unique
+            last_index = max([previous, last_index])
+            n_columns = last_index + 1
+
+            # outer code, block by block
+            logging.info("start : decode outer code and write binary")
+            n_lines = self.segments_median_size
+            line_offset = self.dnecsi + self.dI
+            outerCoder = RSCodec(self.necso, nsize=self.n)
+            pool = self.process_pool()
+            records = runs.merge_runs(run_files)
+            decoded = {}
+
+            def blocks():
+                record = next(records, None)
+                for blk in range(self.numblocks):
+                    block_start = blk * self.dblocksize
+                    block_stop = min([block_start + self.dblocksize, n_columns])
+                    columns = {}  # last segment of a given index is kept
+                    while record is not None and record[0] < block_stop:
+                        index, position, size, bases = record
+                        if index == last_segment:  # may be shorter, not padded
+                            bases = bases[:size]
+                        if index >= block_start and index <= threshold:
+                            columns[index] = bases
+                        record = next(records, None)
+                    indexes = range(block_start, block_stop)
+                    self.data = representation.Representation.from_columns(
+                        [columns.get(i, bytes(n_lines)) for i in indexes],
+                        indexes,
+                        [n_lines, n_columns],
+                    )
+                    erasures = [i - block_start for i in indexes if i not in columns]
+                    self.decode_outer_code_block(blk, outerCoder, pool, erasures)
+                    decoded[blk] = (self.data, block_start, block_stop)
+                    yield blk
+
+            def columns(blk):
+                data, block_start, block_stop = decoded.pop(blk)
+                return [
+                    data.getcolumn(i)[line_offset:n_lines]
+                    for i in range(block_start + self.dnecso, block_stop)
+                ]
 
-        self.binary_size = len(self.binary_data)
-        return self.binary_data
+            depth = self.pipeline_depth
+            chunks = pipeline.run(blocks(), [self.package_chunker(columns)], depth)
+            return self.write_package(chunks, outfile)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+            for run_file in run_files:
+                run_file.close()
+            if f is not infile:
+                f.close()
+
+    #######################
+    ### Layout manifest ###
+    #######################
+
+    # parameters and layout saved in manifests (see layout_manifest)
+    manifest_parameters = [
+        "package_id",
+        "primer_length",
+        "mi",
+        "mo",
+        "index_length",
+        "index_positions",
+        "N",
+        "K",
+        "target_redundancy",
+        "auto_zip",
+        "zip_stored",
+        "block_aligned",
+        "slack_blocks",
+        "blocks",
+        "max_blocksize",
+    ]
+    manifest_layout = ["dk", "dn", "dnecso", "necso", "numblocks", "dblocksize"]
+
+    def block_checksums(self, package_file):
+        """Returns the sha256 of the package bytes of each block, read from binary file
+        object package_file. If blocks do not end on a byte, the byte holding bases of two
+        blocks is hashed in both. Layout must be computed."""
+        n_lines = self.dK - self.dI
+        per_block = self.dblocksize - self.dnecso
+        checksums = []
+        for blk in range(self.numblocks):
+            start = blk * per_block * n_lines // 4
+            stop = -(-min([(blk + 1) * per_block, self.dk]) * n_lines // 4)
+            stop = min([stop, self.package_size])
+            package_file.seek(start)
+            checksums.append(bytesutils.sha256(package_file.read(stop - start)))
+        return checksums
+
+    def layout_manifest(self):
+        """Returns the layout manifest of an encoded package (JSON serializable): parameters,
+        layout, number of segments, primer, package size and sha256 of the package bytes of
+        each block, and offsets of members of a block aligned package. It may be kept
+        beside the DNA to decode it (see from_manifest). Checksums of a package loaded by
+        load_binary are computed from its data columns the first time."""
+        if self.checksums is None and self.data is not None:
+            chunker = self.package_chunker(verify=False)
+            package_data = b"".join(map(chunker, range(self.numblocks)))
+            self.checksums = self.block_checksums(io.BytesIO(package_data))
+        return {
+            "parameters": {p: getattr(self, p) for p in self.manifest_parameters},
+            "layout": {p: getattr(self, p) for p in self.manifest_layout},
+            "segments": self.dn,
+            "primer": self.primer,
+            "package_size": self.package_size,
+            "checksums": self.checksums,
+            "members": self.members,
+        }
+
+    @classmethod
+    def from_manifest(cls, manifest, **options):
+        """Returns a Container to decode the package of manifest (see layout_manifest), options
+        are other parameters (e.g. logging_file). The layout is not read from the index
+        countdowns and the package bytes of each block are verified as they are decoded.
+        """
+        container = cls(**manifest["parameters"], **options)
+        container.manifest = manifest
+        return container
+
+    def verify_block(self, blk, chunk, offset):
+        """Checks package bytes chunk of block blk, at offset in the package, against the
+        manifest checksum (bytes beyond the package size are padding). Records an error if
+        they do not match."""
+        chunk = chunk[: max([self.manifest["package_size"] - offset, 0])]
+        if bytesutils.sha256(chunk) == self.manifest["checksums"][blk]:
+            return
+        logging.error("BLOCK CHECKSUM ERROR. Block {block}".format(block=blk))
+        self.error = True
+        self.error_message += "Block checksum error. Block:" + str(blk) + "\n"
+
+    ###################
+    ### Checkpoints ###
+    ###################
+
+    # attributes saved with the representation in checkpoints
+    checkpoint_attributes = [
+        "dk",
+        "dn",
+        "dnecso",
+        "necso",
+        "numblocks",
+        "dblocksize",
+        "binary_size",
+        "package_size",
+        "checksums",
+        "inner_corrections",
+        "outer_corrections",
+        "segments_beyond_repair",
+        "segments_lost",
+        "lost_indexes",
+        "layout_votes",
+        "layout_support",
+        "layout_margin",
+        "segments_median_size",
+        "error",
+        "error_message",
+    ]
+
+    def set_checkpoint_id(self, input_data):
+        """Sets the job identifier saved in checkpoints: sha256 of input data (bytes) and
+        parameters, so that a checkpoint is only resumed by the same job."""
+        if self.checkpoint_dir is None:
+            return
+        parameters = [self.primer, self.mi, self.mo, self.index_length]
+        parameters += [self.index_positions, self.N, self.K, self.target_redundancy]
+        parameters += [self.auto_zip, self.blocks, self.max_blocksize, self.zip_stored]
+        parameters += [self.block_aligned, self.slack_blocks]
+        checksum = hashlib.sha256(input_data)
+        checksum.update(json.dumps(parameters).encode("utf-8"))
+        self.checkpoint_id = checksum.hexdigest()
+
+    def checkpoint_file(self):
+        return os.path.join(self.checkpoint_dir, "checkpoint.dna")
+
+    def save_checkpoint(self, stage, blocks):
+        """Saves the representation and the progress of stage (number of blocks done) in a
+        binary DNA file (see dnafile) of checkpoint_dir, if set. The previous checkpoint is
+        replaced atomically, so a job killed at any time can be resumed."""
+        if self.checkpoint_dir is None:
+            return
+        logging.info(
+            "checkpoint : {stage}, {blocks} blocks done".format(
+                stage=stage, blocks=blocks
+            )
+        )
+        header = {
+            "checkpoint_id": self.checkpoint_id,
+            "stage": stage,
+            "blocks": blocks,
+            "size": self.data.size,
+            "indexes": [x["index"] for x in self.data.data],
+            "attributes": {a: getattr(self, a) for a in self.checkpoint_attributes},
+        }
+        segments = dna.bits2segments([x["column"] for x in self.data.data])
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+        filename = self.checkpoint_file()
+        with open(filename + ".tmp", "wb") as f:
+            dnafile.write_segments(f, segments, header)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(filename + ".tmp", filename)
+        self.checkpoint_time = time.time()
+
+    def checkpointed(self, stage, blocks):
+        """Yields block numbers of blocks (iterable, in order). Once a block is processed by
+        the caller, a checkpoint is saved if checkpoint_interval elapsed since the previous
+        one, or if it is the last block."""
+        for blk in blocks:
+            yield blk
+            elapsed = time.time() - self.checkpoint_time
+            if elapsed >= self.checkpoint_interval or blk == self.numblocks - 1:
+                self.save_checkpoint(stage, blk + 1)
+
+    def restore_checkpoint(self, stage):
+        """Restores the representation and attributes from the checkpoint of stage of this
+        job (same input and parameters), if any. Returns the number of blocks done, or None
+        if there is no checkpoint to resume."""
+        if self.checkpoint_dir is None or not os.path.isfile(self.checkpoint_file()):
+            return None
+        with open(self.checkpoint_file(), "rb") as f:
+            dna_file = dnafile.DnaFile.open(f)
+            try:
+                header = dna_file.header
+                if header["checkpoint_id"] != self.checkpoint_id:
+                    logging.warning("checkpoint of another job ignored")
+                    return None
+                if header["stage"] != stage:
+                    return None
+                columns = dna.segments2bits(dna_file.segments())
+            finally:
+                dna_file.close()
+
+        from . import representation
+
+        self.data = representation.Representation.from_columns(
+            columns, header["indexes"], header["size"]
+        )
+        for name, value in header["attributes"].items():
+            setattr(self, name, value)
+        logging.info(
+            "resume : {stage} from checkpoint, {blocks} blocks done".format(
+                stage=stage, blocks=header["blocks"]
+            )
+        )
+        return header["blocks"]
+
+    def clear_checkpoint(self):
+        """Removes the checkpoint, once the job is done."""
+        if self.checkpoint_dir is not None and os.path.isfile(self.checkpoint_file()):
+            os.remove(self.checkpoint_file())
 
     ##################
     ### Statistics ###
@@ -1102,8 +2615,9 @@ class Container:
 
     def compute_stats(self):
         """Compute statistics"""
-        # segments
-        self.segments_count = len(self.dna)
+        # segments (if streamed, count is set by set_segments_sizes)
+        if self.dna is not None:
+            self.segments_count = len(self.dna)
         # redundancy
         self.inner_redundancy = (self.N - self.K) / self.N
         self.outer_redundancy = self.dnecso / self.segments_count
@@ -1155,6 +2669,11 @@ class Container:
                 "segments_beyond_repair": str(self.segments_beyond_repair),
                 "segments_lost": str(self.segments_lost),
             },
+            "layout": {
+                "votes": str(self.layout_votes),
+                "support": str(self.layout_support),
+                "margin": str(self.layout_margin),
+            },
             "errors": {"error": str(self.error), "message": str(self.error_message)},
             "id": {
                 "package_id": str(self.package_id),
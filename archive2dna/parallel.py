@@ -0,0 +1,279 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# This file is part of archive2dna.
+#
+# archive2dna is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+# Foobar is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with archive2dna. If not, see <https://www.gnu.org/licenses/>
+#
+# Author : Jan Krause-Bilvin
+# First release: 2022-02-02
+
+"""Reed Solomon coding on a pool of worker processes.
+
+Sequences of bases are copied once in a shared memory matrix, one sequence per row:
+segments are stored as rows, the columns of an outer code block are stored as they are
+(by columns) and its lines are read as strided rows. Each worker attaches to the
+matrix, codes a range of rows and writes the results in place: only row ranges and
+statistics are sent between processes, and only the columns changed by workers are
+copied back to the representation."""
+
+import array
+from multiprocessing import shared_memory
+
+from . import dna
+from . import reedsolo_local as reedsolo
+
+# Reed Solomon codecs of a worker process, by parameters
+_codecs = {}
+
+
+def _codec(nsym, **kwargs):
+    key = (nsym,) + tuple(sorted(kwargs.items()))
+    if key not in _codecs:
+        _codecs[key] = reedsolo.RSCodec(nsym, **kwargs)
+    return _codecs[key]
+
+
+def bases_view(bases):
+    """Returns bases (one byte each) as unsigned bytes, without a copy if bases support
+    the buffer protocol (e.g. columns of the python representation)."""
+    if isinstance(bases, (bytes, bytearray, memoryview, array.array)):
+        return memoryview(bases).cast("B")
+    return bytes(bases)
+
+
+class SharedMatrix:
+    """Rows of bases (one byte each) in shared memory, rows may have different lengths.
+    A matrix may be stored by columns (see from_columns): row i is then made of the bases
+    at position i of the columns, columns shorter than i + 1 bases are skipped. Rows are
+    read and written as strided slices of the whole matrix, the few short columns (e.g.
+    the last segment) are removed from or inserted in the slice."""
+
+    def __init__(self, rows=None, name=None, width=None, lengths=None, columns=None):
+        self.columns = columns  # lengths of columns if stored by columns
+        if name is None:
+            self.lengths = [len(row) for row in rows]
+            self.width = max(self.lengths + [1])
+            self.shm = shared_memory.SharedMemory(
+                create=True, size=self.width * max([len(rows), 1])
+            )
+            for i, row in enumerate(rows):
+                start = i * self.width
+                self.shm.buf[start : start + len(row)] = bases_view(row)
+        else:  # attach to an existing matrix
+            self.shm = shared_memory.SharedMemory(name=name)
+            self.width = width
+            self.lengths = lengths
+        self.short = None  # short columns (see short_columns)
+
+    @classmethod
+    def from_columns(cls, columns, height):
+        """Returns a matrix stored by columns (bytes-like objects of at most height bases,
+        e.g. the columns of an outer code block): its rows are the lines of the columns.
+        """
+        matrix = cls(columns)
+        matrix.columns = matrix.lengths
+        matrix.lengths = [sum([n > i for n in matrix.columns]) for i in range(height)]
+        return matrix
+
+    def spec(self):
+        """Returns arguments needed to attach to the matrix in another process."""
+        return {
+            "name": self.shm.name,
+            "width": self.width,
+            "lengths": self.lengths,
+            "columns": self.columns,
+        }
+
+    def short_columns(self, i):
+        """Returns the columns without a base in row i (matrix stored by columns), in
+        order. Columns shorter than the longest one are listed once per matrix."""
+        if self.short is None:
+            height = max(self.columns + [0])
+            self.short = [k for k, n in enumerate(self.columns) if n < height]
+        return [k for k in self.short if self.columns[k] <= i]
+
+    def row(self, i, start=0, stop=None):
+        if stop is None:
+            stop = self.lengths[i]
+        if self.columns is None:
+            return bytes(self.shm.buf[i * self.width + start : i * self.width + stop])
+        if self.lengths[i] == len(self.columns):  # no short column
+            return bytes(
+                self.shm.buf[
+                    i + start * self.width : i + stop * self.width : self.width
+                ]
+            )
+        row = bytearray(
+            self.shm.buf[i : i + len(self.columns) * self.width : self.width]
+        )
+        for k in reversed(self.short_columns(i)):
+            del row[k]
+        return bytes(row[start:stop])
+
+    def setrow(self, i, values, start=0):
+        if self.columns is None:
+            offset = i * self.width + start
+            self.shm.buf[offset : offset + len(values)] = bytes(values)
+        elif self.lengths[i] == len(self.columns):  # no short column
+            stop = start + len(values)
+            self.shm.buf[
+                i + start * self.width : i + stop * self.width : self.width
+            ] = bytes(values)
+        else:  # bases beyond the end of short columns are not read (see row, column)
+            row = bytearray(self.row(i))
+            row[start : start + len(values)] = bytes(values)
+            for k in self.short_columns(i):
+                row.insert(k, 0)
+            self.shm.buf[i : i + len(self.columns) * self.width : self.width] = row
+
+    def column(self, k):
+        """Returns column k of a matrix stored by columns."""
+        return bytes(self.shm.buf[k * self.width : k * self.width + self.columns[k]])
+
+    def rows(self):
+        return [array.array("b", self.row(i)) for i in range(len(self.lengths))]
+
+    def close(self, unlink=False):
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+def outer_encode_rows(spec, start, stop, necso, n, mo, dnecso):
+    """Worker: computes outer code ecc of rows start to stop of a shared matrix of lines
+    (ecc bases first, then message bases) and writes ecc bases in place."""
+    matrix = SharedMatrix(**spec)
+    try:
+        dmo = mo // 2
+        coder = _codec(necso, nsize=n)
+        msgs = dna.merge_bases_2d(
+            [matrix.row(i, dnecso) for i in range(start, stop)], block_size=dmo
+        )
+        eccs = []
+        for msg in msgs:
+            if len(msg) == 0:  # empty message (past a short last column): zero ecc
+                eccs.append([0] * necso)
+                continue
+            if mo == 8:
+                msg = bytearray(msg)
+            eccs.append(coder.encode(msg)[-necso:])
+        ecc_bases = dna.split_bases_2d(eccs, block_size=dmo)
+        for i, bases in zip(range(start, stop), ecc_bases):
+            matrix.setrow(i, bases)
+    finally:
+        matrix.close()
+
+
+def erasure_positions(erasures, n_message, necso, dmo):
+    """Returns the positions in an outer code codeword (n_message message symbols, then
+    ecc symbols) of the symbols of block columns erasures (missing columns, numbered from
+    the start of the block: ecc columns, then message columns)."""
+    symbols = sorted(set([k // dmo for k in erasures]))
+    return [s - necso if s >= necso else n_message + s for s in symbols]
+
+
+def outer_decode_rows(spec, start, stop, necso, n, mo, dnecso, erasures=None):
+    """Worker: decodes outer code of rows start to stop of a shared matrix of lines and
+    writes corrected message bases in place. Symbols of block columns erasures (see
+    erasure_positions) are decoded as erasures. Returns the number of corrections and the
+    list of (row, error message) of rows that could not be decoded."""
+    matrix = SharedMatrix(**spec)
+    try:
+        dmo = mo // 2
+        coder = _codec(necso, nsize=n)
+        rows = range(start, stop)
+        # ecc bases are necso whole symbols: rows are merged at once
+        symbols = dna.merge_bases_2d([matrix.row(i) for i in rows], dmo)
+        n_corrections = 0
+        errors = []
+        corrected = []
+        decoded_msgs = []
+        for i, row_symbols in zip(rows, symbols):
+            msg, ecc = row_symbols[necso:], row_symbols[:necso]
+            if mo <= 8:
+                msg = bytearray(msg)
+                ecc = bytearray(ecc)
+            erase_pos = None
+            if erasures:
+                erase_pos = erasure_positions(erasures, len(msg), necso, dmo)
+            try:
+                decoded_msg, decoded_msgecc, errata_pos = coder.decode(
+                    msg + ecc, erase_pos=erase_pos
+                )
+            except Exception as e:
+                errors.append((i, str(e)))
+                continue
+            if len(errata_pos) > 0:
+                n_corrections += len(errata_pos)
+                corrected.append(i)
+                decoded_msgs.append(decoded_msg)
+        decoded_bases = dna.split_bases_2d(decoded_msgs, block_size=dmo)
+        for i, bases in zip(corrected, decoded_bases):
+            scope = matrix.lengths[i] - dnecso
+            matrix.setrow(i, bases[:scope], start=dnecso)
+        return n_corrections, errors
+    finally:
+        matrix.close()
+
+
+def inner_decode_rows(spec, start, stop, necsi, mi, dnecsi):
+    """Worker: decodes inner code of rows start to stop of a shared matrix of segments
+    (ecc bases first, then message bases) and writes corrected message bases in place.
+    Returns the number of corrected bases, the list of corrected rows and the list of
+    rows that could not be decoded."""
+    matrix = SharedMatrix(**spec)
+    try:
+        dmi = mi // 2
+        coder = _codec(necsi, c_exp=mi)
+        rows = range(start, stop)
+        # ecc bases are necsi whole symbols: segments are merged at once
+        segments = [matrix.row(i) for i in rows]
+        symbols = dna.merge_bases_2d(segments, dmi)
+        beyond_repair = []
+        corrected = []
+        decoded_msgs = []
+        for i, row_symbols in zip(rows, symbols):
+            msg, ecc = row_symbols[necsi:], row_symbols[:necsi]
+            try:
+                decoded_msg, decoded_msgecc, errata_pos = coder.decode(
+                    bytes(msg) + bytes(ecc)
+                )
+            except Exception:
+                beyond_repair.append(i)
+                continue
+            if len(errata_pos) > 0:
+                corrected.append(i)
+                decoded_msgs.append(decoded_msg)
+        n_corrections = 0
+        decoded_bases = dna.split_bases_2d(decoded_msgs, block_size=dmi)
+        for i, bases in zip(corrected, decoded_bases):
+            dcol = segments[i - start][dnecsi:]
+            bases = bases[: len(dcol)]
+            n_corrections += sum([x != y for x, y in zip(dcol, bases)])
+            matrix.setrow(i, bases, start=dnecsi)
+        return n_corrections, corrected, beyond_repair
+    finally:
+        matrix.close()
+
+
+def row_ranges(n, parts):
+    """Splits range(n) in at most parts contiguous ranges of about the same size."""
+    parts = max([min([parts, n]), 1])
+    bounds = [n * k // parts for k in range(parts + 1)]
+    return [
+        (bounds[k], bounds[k + 1]) for k in range(parts) if bounds[k] < bounds[k + 1]
+    ]
+
+
+def map_rows(pool, workers, function, matrix, *args):
+    """Runs function(spec, start, stop, *args) over ranges of rows of shared matrix on the
+    process pool, workers write their results in the matrix. Returns the list of results
+    of each range, in order."""
+    futures = [
+        pool.submit(function, matrix.spec(), start, stop, *args)
+        for start, stop in row_ranges(len(matrix.lengths), workers)
+    ]
+    return [f.result() for f in futures]
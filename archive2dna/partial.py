@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# This file is part of archive2dna.
+#
+# archive2dna is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+# Foobar is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with archive2dna. If not, see <https://www.gnu.org/licenses/>
+#
+# Author : Jan Krause-Bilvin
+# First release: 2022-02-02
+
+"""Partial decoding: read a range of bytes, or a member of a ZIP information package,
+decoding only the outer code blocks which contain it.
+
+Package bytes (zipped if auto_zip) are the message bases of the data columns of all
+blocks, in order: a range of bytes maps to a range of data columns, hence of blocks.
+PackageFile is a read only file object over the package bytes which decodes blocks
+when they are first read. If the package is stored in the zip without compression
+(see Container zip_stored), the information package is a range of the package bytes
+and so is any member of it (ZIP central directory, member headers and data).
+A compressed package is read as a stream: all blocks up to the range are decoded.
+
+    c = package.Container()
+    c.load_dna(text)
+    binary = partial.open_binary(c)
+    data = partial.read_member(binary, "data/file.pdf")"""
+
+import io
+import zipfile
+
+from . import bytesutils
+from . import package
+
+
+class PackageFile(io.RawIOBase):
+    def __init__(self, container):
+        """Read only file object over the package bytes of container, whose segments are
+        sorted (see open_package). Decoded blocks are recorded in decoded."""
+        c = container
+        self.container = c
+        self.outerCoder = package.RSCodec(c.necso, nsize=c.n)
+        self.line_offset = c.dnecsi + c.dI
+        self.n_lines = c.data.size[0]
+        self.length = self.n_lines - self.line_offset  # bases per data column
+        self.per_block = c.dblocksize - c.dnecso  # data columns per full block
+        n_columns = c.data.size[1]
+        last_blk = (n_columns - 1) // c.dblocksize
+        self.n_data = last_blk * self.per_block + n_columns - self.column(last_blk, 0)
+        bases = (self.n_data - 1) * self.length + len(self.bases(self.n_data - 1))
+        self.size = bases // 4
+        self.position = 0
+        self.decoded = set()
+
+    def column(self, blk, j):
+        """Returns the index of data column j of block blk."""
+        return blk * self.container.dblocksize + self.container.dnecso + j
+
+    def bases(self, j):
+        """Returns message bases of data column number j (from 0, over all blocks)."""
+        blk, k = divmod(j, self.per_block)
+        column = self.container.data.getcolumn(self.column(blk, k))
+        return column[self.line_offset : self.n_lines]
+
+    def decode(self, blk):
+        if blk not in self.decoded:
+            c = self.container
+            c.decode_outer_code_block(
+                blk, self.outerCoder, erasures=c.block_erasures(blk)
+            )
+            self.decoded.add(blk)
+
+    def read_range(self, start, stop):
+        """Returns package bytes start to stop (excluded), after decoding their blocks."""
+        stop = min([stop, self.size])
+        if stop <= start:
+            return b""
+        first = 4 * start // self.length
+        last = (4 * stop - 1) // self.length
+        for blk in range(first // self.per_block, last // self.per_block + 1):
+            self.decode(blk)
+        bases = b"".join([self.bases(j) for j in range(first, last + 1)])
+        offset = 4 * start - first * self.length
+        bases = bases[offset : offset + 4 * (stop - start)]
+        data = bytesutils.merge_four_bytes_in_one(bases)
+        return self.container.mask_bytes(data, offset=start)
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence == io.SEEK_END:
+            offset += self.size
+        if offset < 0:
+            raise ValueError("Negative seek position {p}".format(p=offset))
+        self.position = offset
+        return self.position
+
+    def readinto(self, b):
+        data = self.read_range(self.position, self.position + len(b))
+        b[: len(data)] = data
+        self.position += len(data)
+        return len(data)
+
+
+class RangeFile(io.RawIOBase):
+    def __init__(self, f, offset, size):
+        """Read only file object over size bytes of seekable file object f from offset."""
+        self.f = f
+        self.offset = offset
+        self.size = size
+        self.position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence == io.SEEK_END:
+            offset += self.size
+        if offset < 0:
+            raise ValueError("Negative seek position {p}".format(p=offset))
+        self.position = offset
+        return self.position
+
+    def readinto(self, b):
+        n = max([min([len(b), self.size - self.position]), 0])
+        self.f.seek(self.offset + self.position)
+        data = self.f.read(n)
+        b[: len(data)] = data
+        self.position += len(data)
+        return len(data)
+
+
+def open_package(container):
+    """Decodes inner code and sorts the segments of container (DNA loaded, see
+    Container.load_dna), returns a PackageFile over its package bytes. Raises ValueError
+    if no layout is found in countdowns."""
+    container.decode_inner_code()
+    if container.sort_segments() is None:
+        raise ValueError(container.error_message.strip())
+    return PackageFile(container)
+
+
+def open_binary(container):
+    """Returns a read only file object over the information package of container (DNA
+    loaded): the package bytes, else the information_package member of the package zip,
+    as a range of the package bytes if it is not compressed (see zip_stored)."""
+    package_file = open_package(container)
+    if not container.auto_zip:
+        return package_file
+    zip_file = zipfile.ZipFile(package_file)
+    info = zip_file.getinfo("information_package")
+    if info.compress_type != zipfile.ZIP_STORED:
+        return zip_file.open(info)
+
+    # data starts after the member local header (file name and extra field lengths)
+    header = package_file.read_range(info.header_offset, info.header_offset + 30)
+    name_length = int.from_bytes(header[26:28], "little")
+    extra_length = int.from_bytes(header[28:30], "little")
+    offset = info.header_offset + 30 + name_length + extra_length
+    return RangeFile(package_file, offset, info.file_size)
+
+
+def read_range(binary, start, stop):
+    """Returns bytes start to stop (excluded) of binary (see open_binary)."""
+    binary.seek(start)
+    return binary.read(stop - start)
+
+
+def read_member(binary, name):
+    """Returns member name of the information package binary (see open_binary), which
+    must be a ZIP file."""
+    with zipfile.ZipFile(binary) as zip_file:
+        return zip_file.read(name)
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# This file is part of archive2dna.
+#
+# archive2dna is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+# Foobar is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with archive2dna. If not, see <https://www.gnu.org/licenses/>
+#
+# Author : Jan Krause-Bilvin
+# First release: 2022-02-02
+
+"""Pipeline executor: overlaps the processing stages of a sequence of items
+(e.g. outer code blocks) on worker threads.
+
+Each stage runs in its own thread and processes items in order, stages are
+connected by bounded queues. Stages may thus keep a state between items."""
+
+import queue
+import threading
+
+_done = object()  # end of items
+
+
+class _Failure:
+    """Exception raised in a stage, passed down to the consumer."""
+
+    def __init__(self, error):
+        self.error = error
+
+
+def run(items, stages, depth=2):
+    """Yields stages[-1](... stages[0](item)) for each item of items, in order.
+    At most depth items wait between two stages. An exception raised by a
+    stage (or by items) is re-raised here and stops all stages.
+    If depth is 0, stages are run sequentially in the calling thread."""
+    if not depth:
+        for item in items:
+            for stage in stages:
+                item = stage(item)
+            yield item
+        return
+
+    queues = [queue.Queue(maxsize=depth) for i in range(len(stages) + 1)]
+    stop = threading.Event()
+
+    def put(q, item):
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def get(q):
+        while not stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        return _done
+
+    def feed():
+        try:
+            for item in items:
+                if stop.is_set():
+                    return
+                put(queues[0], item)
+        except BaseException as e:
+            put(queues[0], _Failure(e))
+            return
+        put(queues[0], _done)
+
+    def work(stage, q_in, q_out):
+        while True:
+            item = get(q_in)
+            if item is _done or isinstance(item, _Failure):
+                put(q_out, item)
+                return
+            try:
+                result = stage(item)
+            except BaseException as e:
+                put(q_out, _Failure(e))
+                return
+            put(q_out, result)
+
+    threads = [threading.Thread(target=feed, daemon=True)]
+    for i, stage in enumerate(stages):
+        threads.append(
+            threading.Thread(
+                target=work, args=(stage, queues[i], queues[i + 1]), daemon=True
+            )
+        )
+    for t in threads:
+        t.start()
+    try:
+        while True:
+            item = queues[-1].get()
+            if item is _done:
+                break
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
+        for t in threads:
+            t.join()
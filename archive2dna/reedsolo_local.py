@@ -1066,6 +1066,7 @@ class RSCodec(object):
         self.gf_log, self.gf_exp, self.field_charac = init_tables(
             prim, generator, c_exp
         )
+        self._bytearray = _bytearray  # set by init_tables, depends on c_exp
         # Precompute the generator polynomials
         if single_gen:
             self.gen = {}
@@ -1083,8 +1084,9 @@ class RSCodec(object):
     def encode(self, data, nsym=None):
         """Encode a message (ie, add the ecc symbols) using Reed-Solomon, whatever the length of the message because we use chunking"""
         # Restore precomputed tables (allow to use multiple RSCodec in one script)
-        global gf_log, gf_exp, field_charac
+        global gf_log, gf_exp, field_charac, _bytearray
         gf_log, gf_exp, field_charac = self.gf_log, self.gf_exp, self.field_charac
+        _bytearray = self._bytearray
 
         if not nsym:
             nsym = self.nsym
@@ -1112,8 +1114,9 @@ class RSCodec(object):
         # erase_pos is a list of positions where you know (or greatly suspect at least) there is an erasure (ie, wrong character but you know it's at this position). Just input the list of all positions you know there are errors, and this method will automatically split the erasures positions to attach to the corresponding data chunk.
 
         # Restore precomputed tables (allow to use multiple RSCodec in one script)
-        global gf_log, gf_exp, field_charac
+        global gf_log, gf_exp, field_charac, _bytearray
         gf_log, gf_exp, field_charac = self.gf_log, self.gf_exp, self.field_charac
+        _bytearray = self._bytearray
 
         if not nsym:
             nsym = self.nsym
@@ -67,18 +67,29 @@ class Representation:
             # each column corresponds to a DNA segment
             # - if a column of median size, it is padded using zeros
             # - if a column is longer thant median size it is imported as is
-            self.data = []
-            for i in range(n_columns):
-                self.data.append({"index": i, "column": array.array("b")})
-                for j in range(len(data_dna[i])):
-                    self.data[-1]["column"].append(dna.dna2bits(data_dna[i][j]))
-                if len(data_dna[i]) < n_lines:  # padding with zeroes
-                    if i != n_columns - 1:  # not for last segement that is shorter
-                        delta = n_lines - len(data_dna[i])
-                        for j in range(delta):
-                            self.data[-1]["column"].append(0)
+            # (not for last segement that is shorter)
+            columns = dna.segments2bits(data_dna[: n_columns - 1], length=n_lines)
+            columns += dna.segments2bits(data_dna[n_columns - 1 : n_columns])
+            self.data = [
+                {"index": i, "column": array.array("b", columns[i])}
+                for i in range(n_columns)
+            ]
             self.index_columns_num_currens()
 
+    @classmethod
+    def from_columns(cls, columns, indexes, size):
+        """Returns a representation of columns (bytes-like, one byte per base) with the given
+        indexes. size is [lines, columns] of the whole data, which may contain more columns
+        than given (e.g. when only some blocks are loaded)."""
+        representation = cls(n_lines=size[0], n_columns=0)
+        representation.data = [
+            {"index": index, "column": array.array("b", column)}
+            for index, column in zip(indexes, columns)
+        ]
+        representation.size = list(size)
+        representation.reindex_columns()
+        return representation
+
     def index_columns_num_currens(self):
         """Indexes columns starting at 0 with increments of 1."""
         # This method is used for initial indexing
@@ -113,9 +124,10 @@ class Representation:
         """Returns value at specific position in representation at specified line and column."""
         return self.data[self.column_index[column]]["column"][line]
 
-    # def setcolumn(self, n, column, start_at=0):
-    #    for i in range(len(column)):
-    #        self.data[ self.column_index[n]]['column'][i+start_at] = column[i]
+    def setcolumn(self, n, column, start_at=0):
+        """Sets values of column of index n, starting at line start_at."""
+        col = self.data[self.column_index[n]]["column"]
+        col[start_at : start_at + len(column)] = array.array("b", column)
 
     def getline(self, n, s=None):
         """Returns whole line n by default.
@@ -135,9 +147,55 @@ class Representation:
                     line.append(col[n])
         return line
 
-    # def setline(self, n, line, start_at=1):
-    #    for i in range(len(line)):
-    #        self.data[self.column_index[i+start_at]]['column'][n] = line[i]
+    def _columns_block(self, start, stop, s=None):
+        """Returns columns (in index order) of slice s, restricted to lines start to stop,
+        concatenated in a bytearray: line i is then the strided slice [i-start::stop-start].
+        Also returns for each column the number of lines it actually contains."""
+        if s == None:
+            indexes = sorted(self.column_indexes())
+        else:
+            indexes = range(s.start, s.stop)
+        n = stop - start
+        block = bytearray(n * len(indexes))
+        lengths = []
+        for k, i in enumerate(indexes):
+            col = self.getcolumn(i)[start:stop]
+            block[k * n : k * n + len(col)] = col
+            lengths.append(len(col))
+        return indexes, block, lengths
+
+    def getlines(self, start, stop, s=None):
+        """Returns lines start to stop (excluded), each line as returned by getline:
+        columns shorter than a line are skipped. Much faster than calling getline
+        for each line, as lines are read from columns concatenated together.
+        An optional slice s may be specified to restrict returned range."""
+        indexes, block, lengths = self._columns_block(start, stop, s)
+        n = stop - start
+        short = [k for k in range(len(lengths)) if lengths[k] < n]
+        lines = []
+        for i in range(n):
+            line = block[i::n]
+            for k in reversed(short):
+                if lengths[k] <= i:
+                    del line[k]
+            lines.append(array.array("b", line))
+        return lines
+
+    def setlines(self, start, lines, s=None):
+        """Sets lines starting at line start, lines are of the form returned by getlines
+        (i.e. without positions of columns shorter than a line).
+        An optional slice s may be specified to restrict the range."""
+        n = len(lines)
+        indexes, block, lengths = self._columns_block(start, start + n, s)
+        short = [k for k in range(len(lengths)) if lengths[k] < n]
+        for i in range(n):
+            line = bytearray(lines[i])
+            for k in short:
+                if lengths[k] <= i:
+                    line.insert(k, 0)
+            block[i::n] = line
+        for k, i in enumerate(indexes):
+            self.setcolumn(i, block[k * n : k * n + lengths[k]], start_at=start)
 
     def setpos(self, line, column, value):
         """Sets value at specific position in representation at specified line and column."""
@@ -185,6 +243,18 @@ class Representation:
         self.reindex_columns()
         return col
 
+    def popduplicates(self):
+        """Removes columns whose index is also the index of a later column, i.e. keeps
+        the last column of each index. Returns the number of columns removed."""
+        self.reindex_columns()
+        kept = set(self.column_index.values())
+        n = len(self.data) - len(kept)
+        if n > 0:
+            self.data = [col for i, col in enumerate(self.data) if i in kept]
+            self.size[1] -= n
+            self.reindex_columns()
+        return n
+
     def tonumpy(self):
         """
         Converts representation to numpy nd array.
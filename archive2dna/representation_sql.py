@@ -108,13 +108,12 @@ class Representation:
             # - if a column of median size, it is padded using zeros
             # - if a column is longer thant median size it is imported as is
 
+            columns = dna.segments2bits(data_dna[:n_columns])
             idx = -1
             for i in range(n_columns):
                 idx += 1
                 args = {"index": idx}
-                for ix, x in enumerate(
-                    [dna.dna2bits(data_dna[i][j]) for j in range(len(data_dna[i]))]
-                ):
+                for ix, x in enumerate(columns[i]):
                     args["c" + str(ix)] = x
 
                 if len(data_dna[i]) < n_lines:  # padding with zeroes
@@ -230,6 +229,27 @@ class Representation:
             connection.execute(stmt)
         # self.data[ self.column_index[column]]['column'][line]=value
 
+    def setcolumn(self, n, column, start_at=0):
+        """Sets values of column of index n, starting at line start_at."""
+        for i in range(len(column)):
+            self.setpos(i + start_at, n, column[i])
+
+    def getlines(self, start, stop, s=None):
+        """Returns lines start to stop (excluded).
+        An optional slice s may be specified to restrict returned range."""
+        return [self.getline(i, s=s) for i in range(start, stop)]
+
+    def setlines(self, start, lines, s=None):
+        """Sets lines starting at line start.
+        An optional slice s may be specified to restrict the range."""
+        if s == None:
+            indexes = self.column_indexes()
+        else:
+            indexes = range(s.start, s.stop)
+        for i in range(len(lines)):
+            for j in range(len(lines[i])):
+                self.setpos(start + i, indexes[j], lines[i][j])
+
     # def insertcolumns(self, index, n=1):
     #    """Inserts n columns at specified index.
     #    If any, exising indexes are shiftes"""
@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# This file is part of archive2dna.
+#
+# archive2dna is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+# Foobar is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with archive2dna. If not, see <https://www.gnu.org/licenses/>
+#
+# Author : Jan Krause-Bilvin
+# First release: 2022-02-02
+
+"""Sorted run files for external memory sorting of segments.
+
+A run is a sequence of records (index, position, size, bases) sorted by index then
+position: index is the segment number read from its index, position its order in the
+input, size its length as read and bases the column of the segment (one byte per base).
+Bases are packed 4 per byte.
+Runs are written to temporary files and merged (k-way merge), so that only one record
+per run is in memory."""
+
+import heapq
+import struct
+
+from . import bytesutils
+
+record_struct = struct.Struct("<QQII")
+
+
+def write_run(f, records):
+    """Sorts records (index, position, size, bases) and writes them to binary file object f.
+    Returns the number of records."""
+    records = sorted(records, key=lambda r: (r[0], r[1]))
+    for index, position, size, bases in records:
+        padding = -len(bases) % 4
+        packed = bytesutils.merge_four_bytes_in_one(bytes(bases) + bytes(padding))
+        f.write(record_struct.pack(index, position, size, len(bases)))
+        f.write(packed)
+    return len(records)
+
+
+def read_run(f, bases=True):
+    """Yields records (index, position, size, bases) of a run from binary file object f, from
+    the start of the file. If bases is False, bases are skipped and returned as None."""
+    f.seek(0)
+    while True:
+        header = f.read(record_struct.size)
+        if len(header) < record_struct.size:
+            return
+        index, position, segment_size, length = record_struct.unpack(header)
+        size = (length + 3) // 4
+        if bases:
+            column = bytesutils.split_bytes_in_four(f.read(size))[:length]
+        else:
+            f.seek(size, 1)
+            column = None
+        yield index, position, segment_size, column
+
+
+def merge_runs(files, bases=True):
+    """Yields records of all runs (binary file objects) sorted by index then position."""
+    return heapq.merge(*[read_run(f, bases) for f in files], key=lambda r: (r[0], r[1]))
@@ -0,0 +1,335 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# This file is part of archive2dna.
+#
+# archive2dna is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+# Foobar is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with archive2dna. If not, see <https://www.gnu.org/licenses/>
+#
+# Author : Jan Krause-Bilvin
+# First release: 2022-02-02
+
+"""Sharded encoding and decoding: a job is split in shards, i.e. ranges of outer code
+blocks, which are processed by independent invocations (e.g. on several machines)
+sharing a job directory.
+
+Files of a job directory:
+    - job.json: job manifest (parameters, layout, blocks of each shard), written by
+      prepare_encode or prepare_decode
+    - package.bin (encode): the package to encode, zipped if auto_zip
+    - shard_<k>.in.dna (decode): sorted segments of the blocks of shard k, after
+      inner code decoding (binary DNA file, see dnafile)
+    - shard_<k>.dna: output of shard k (see run_shard), binary DNA file with the DNA
+      segments of its blocks (encode) or the decoded message bases of their data
+      columns (decode)
+    - shard_<k>.json: shard manifest, written once the shard output is complete
+
+merge checks that all shards are complete and assembles the DNA segments (encode) or
+the binary package (decode). Output is the same as without shards.
+
+At decoding, only the outer code is decoded by shards: prepare_decode reads the whole
+pool and decodes the inner code of all reads (with the container's worker processes),
+as the segment number of a read, hence its shard, is only known once its inner code is
+decoded."""
+
+import os
+import json
+import uuid
+import logging
+from collections import Counter
+
+from . import dna
+from . import dnafile
+from . import bytesutils
+from . import package
+from . import parallel
+from . import representation
+
+JOB_FILE = "job.json"
+PACKAGE_FILE = "package.bin"
+
+# Container parameters and layout saved in the job manifest
+parameters = package.Container.manifest_parameters
+layout = package.Container.manifest_layout
+
+
+def shard_file(directory, shard, suffix):
+    return os.path.join(directory, "shard_{k}{s}".format(k=shard, s=suffix))
+
+
+def write_json(filename, content):
+    """Writes a JSON file atomically: a file is either complete or missing."""
+    with open(filename + ".tmp", "w") as f:
+        json.dump(content, f, indent=1)
+    os.replace(filename + ".tmp", filename)
+
+
+def read_json(filename):
+    with open(filename, "r") as f:
+        return json.load(f)
+
+
+def new_job(container, mode, shards):
+    """Returns a job manifest with blocks split in shards (contiguous ranges of blocks)."""
+    ranges = parallel.row_ranges(container.numblocks, shards)
+    return {
+        "job": uuid.uuid4().hex,
+        "mode": mode,
+        "parameters": {p: getattr(container, p) for p in parameters},
+        "layout": {p: getattr(container, p) for p in layout},
+        "shards": [list(range(start, stop)) for start, stop in ranges],
+    }
+
+
+def prepare_encode(container, infile, directory, shards):
+    """Prepares a sharded encoding of binary file object infile into directory: the package
+    is written (zipped if auto_zip) and its blocks are split in at most shards shards.
+    Returns the job manifest."""
+    logging.info("start : prepare sharded encoding")
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, PACKAGE_FILE), "wb") as package_file:
+        package_size = container.write_package_file(infile, package_file)
+    container.compute_layout(4 * package_size)
+    job = new_job(container, "encode", shards)
+    job["package_size"] = package_size
+    job["binary_size"] = container.binary_size
+    write_json(os.path.join(directory, JOB_FILE), job)
+    return job
+
+
+def prepare_decode(container, infile, directory, shards):
+    """Prepares a sharded decoding of DNA infile (see Container.load_dna) into directory:
+    inner code is decoded and segments are sorted, then segments of each shard's blocks
+    are written to the shard input file. Returns the job manifest. Raises ValueError if
+    no layout is found in countdowns."""
+    logging.info("start : prepare sharded decoding")
+    os.makedirs(directory, exist_ok=True)
+    container.load_dna(infile)
+    container.decode_inner_code()
+    if container.sort_segments() is None:
+        raise ValueError(container.error_message.strip())
+    data = container.data
+    job = new_job(container, "decode", shards)
+    job["size"] = list(data.size)
+    job["lost_indexes"] = container.lost_indexes
+    job["statistics"] = {
+        "inner_corrections": container.inner_corrections,
+        "segments_beyond_repair": container.segments_beyond_repair,
+        "segments_lost": container.segments_lost,
+        "layout_votes": container.layout_votes,
+        "layout_support": container.layout_support,
+        "layout_margin": container.layout_margin,
+        "segments_count": len(container.dna),
+        "segments_median_size": container.segments_median_size,
+        "segments_min_size": container.segments_min_size,
+    }
+    for k, blocks in enumerate(job["shards"]):
+        columns = []
+        for blk in blocks:
+            block_start, block_stop = block_range(container, blk, data.size[1])
+            columns += [data.getcolumn(i) for i in range(block_start, block_stop)]
+        with open(shard_file(directory, k, ".in.dna"), "wb") as f:
+            dnafile.write_segments(f, dna.bits2segments(columns))
+    write_json(os.path.join(directory, JOB_FILE), job)
+    return job
+
+
+def block_range(container, blk, n_columns):
+    """Returns first and last (excluded) column indexes of block blk."""
+    block_start = blk * container.dblocksize
+    return block_start, min([block_start + container.dblocksize, n_columns])
+
+
+def load_job(directory, **options):
+    """Reads the job manifest of directory. Returns the manifest and a Container with its
+    parameters and layout, options are other Container parameters (e.g. logging_file).
+    """
+    job = read_json(os.path.join(directory, JOB_FILE))
+    container = package.Container(**job["parameters"], **options)
+    for name, value in job["layout"].items():
+        setattr(container, name, value)
+    return job, container
+
+
+def run_shard(directory, shard, **options):
+    """Encodes or decodes the blocks of shard number shard of the job prepared in directory,
+    writes the shard output and manifest. options are Container parameters (e.g. workers).
+    Returns the shard manifest."""
+    job, container = load_job(directory, **options)
+    blocks = job["shards"][shard]
+    logging.info(
+        "start : {mode} shard {k}, blocks {blocks}".format(
+            mode=job["mode"], k=shard, blocks=blocks
+        )
+    )
+    manifest = {"job": job["job"], "shard": shard, "blocks": blocks}
+    output = shard_file(directory, shard, ".dna")
+    with open(output + ".tmp", "wb") as f:
+        if job["mode"] == "encode":
+            manifest.update(encode_shard(job, container, directory, blocks, f))
+        else:
+            manifest.update(decode_shard(job, container, directory, shard, f))
+    os.replace(output + ".tmp", output)
+    manifest["sha256"] = bytesutils.sha256(output)
+    write_json(shard_file(directory, shard, ".json"), manifest)
+    return manifest
+
+
+def encode_shard(job, container, directory, blocks, outfile):
+    """Writes DNA segments of blocks into outfile, returns manifest entries."""
+    counts = []
+    sizes = Counter()
+
+    def segments(package_file):
+        for block_segments in container.encoded_blocks(
+            package_file, job["package_size"], blocks
+        ):
+            counts.append(len(block_segments))
+            sizes.update([len(x) for x in block_segments])
+            yield from block_segments
+
+    with open(os.path.join(directory, PACKAGE_FILE), "rb") as package_file:
+        dnafile.write_segments(outfile, segments(package_file))
+    return {"segments": counts, "sizes": sorted(sizes.items())}
+
+
+def decode_shard(job, container, directory, shard, outfile):
+    """Decodes outer code of the blocks of shard and writes message bases of their data
+    columns into outfile, returns manifest entries."""
+    n_lines, n_columns = job["size"]
+    line_offset = container.dnecsi + container.dI
+    blocks = job["shards"][shard]
+
+    # representation of the shard's columns, with their index in the whole data
+    with open(shard_file(directory, shard, ".in.dna"), "rb") as f:
+        dna_file = dnafile.DnaFile.open(f)
+        columns = dna.segments2bits(dna_file.segments())
+        dna_file.close()
+    start = block_range(container, blocks[0], n_columns)[0]
+    indexes = range(start, start + len(columns))
+    data = representation.Representation.from_columns(
+        columns, indexes, [n_lines, n_columns]
+    )
+    container.data = data
+    container.lost_indexes = job["lost_indexes"]
+
+    outerCoder = package.RSCodec(container.necso, nsize=container.n)
+    pool = container.process_pool()
+    try:
+        for blk in blocks:
+            erasures = container.block_erasures(blk)
+            container.decode_outer_code_block(blk, outerCoder, pool, erasures)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    counts = []
+    messages = []
+    for blk in blocks:
+        block_start, block_stop = block_range(container, blk, n_columns)
+        indexes = range(block_start + container.dnecso, block_stop)
+        messages += [data.getcolumn(i)[line_offset:n_lines] for i in indexes]
+        counts.append(len(indexes))
+    dnafile.write_segments(outfile, dna.bits2segments(messages))
+    return {
+        "segments": counts,
+        "outer_corrections": container.outer_corrections,
+        "error": container.error,
+        "error_message": container.error_message,
+    }
+
+
+def missing_shards(directory):
+    """Returns the list of shards of the job prepared in directory which are not complete:
+    manifest missing or of another job, blocks or output not matching."""
+    job = read_json(os.path.join(directory, JOB_FILE))
+    missing = []
+    for k, blocks in enumerate(job["shards"]):
+        filename = shard_file(directory, k, ".json")
+        if not os.path.isfile(filename):
+            missing.append(k)
+            continue
+        manifest = read_json(filename)
+        output = shard_file(directory, k, ".dna")
+        if (
+            manifest["job"] != job["job"]
+            or manifest["blocks"] != blocks
+            or not os.path.isfile(output)
+            or bytesutils.sha256(output) != manifest["sha256"]
+        ):
+            missing.append(k)
+    return missing
+
+
+def merge(directory, outfile=None, dna_format="text", compress=False, **options):
+    """Merges the outputs of all shards of the job prepared in directory into outfile:
+    DNA segments in one of the formats of write_dna (encode), or binary data (decode).
+    If outfile is None, the output is returned, else the Container (e.g. for statistics).
+    Raises ValueError if a shard is not complete (see missing_shards)."""
+    missing = missing_shards(directory)
+    if len(missing) > 0:
+        raise ValueError(
+            "Incomplete job, missing shards: {m}".format(
+                m=", ".join([str(k) for k in missing])
+            )
+        )
+    job, container = load_job(directory, **options)
+    logging.info("start : merge {n} shards".format(n=len(job["shards"])))
+    manifests = [
+        read_json(shard_file(directory, k, ".json")) for k in range(len(job["shards"]))
+    ]
+    dna_files = []
+    for k in range(len(job["shards"])):
+        with open(shard_file(directory, k, ".dna"), "rb") as f:
+            dna_files.append(dnafile.DnaFile.open(f))
+    try:
+        if job["mode"] == "encode":
+            output = merge_encode(job, container, dna_files, manifests)
+            output = container.write_dna(outfile, dna_format, compress, output)
+        else:
+            output = merge_decode(job, container, dna_files, manifests, outfile)
+    finally:
+        for dna_file in dna_files:
+            dna_file.close()
+    if outfile is None:
+        return output
+    return container
+
+
+def merge_encode(job, container, dna_files, manifests):
+    """Returns DNA segments of all shards (generator), in order."""
+    container.binary_size = job["binary_size"]
+    sizes = Counter()
+    for manifest in manifests:
+        sizes.update(dict([tuple(x) for x in manifest["sizes"]]))
+    container.set_segments_sizes(sizes)
+
+    for dna_file in dna_files:
+        for i in range(len(dna_file)):
+            yield dna_file[i]
+
+
+def merge_decode(job, container, dna_files, manifests, outfile):
+    """Writes binary data from decoded data columns of all shards (see write_package)."""
+    for name, value in job["statistics"].items():
+        setattr(container, name, value)
+    for manifest in manifests:
+        container.outer_corrections += manifest["outer_corrections"]
+        container.error = container.error or manifest["error"]
+        container.error_message += manifest["error_message"]
+
+    # data columns of each block: position of the block in its shard output
+    blocks = {}
+    for dna_file, manifest in zip(dna_files, manifests):
+        start = 0
+        for blk, count in zip(manifest["blocks"], manifest["segments"]):
+            blocks[blk] = (dna_file, start, start + count)
+            start += count
+
+    def columns(blk):
+        dna_file, start, stop = blocks[blk]
+        return dna.segments2bits([dna_file[i] for i in range(start, stop)])
+
+    chunks = map(container.package_chunker(columns), range(container.numblocks))
+    return container.write_package(chunks, outfile)
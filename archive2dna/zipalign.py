@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# This file is part of archive2dna.
+#
+# archive2dna is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+# Foobar is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with archive2dna. If not, see <https://www.gnu.org/licenses/>
+#
+# Author : Jan Krause-Bilvin
+# First release: 2022-02-02
+
+"""Aligned ZIP files: members of a ZIP file are moved to given offsets (e.g. outer code
+block boundaries, with spare space after each member), so that a change in a member does
+not move the following members.
+
+Members (local header, data and data descriptor) are copied as they are, without
+decompression, and gaps between them are filled with zero bytes. The central directory
+is copied with the new offsets of members. ZIP readers locate members from the central
+directory, so the aligned file holds the same members as the original one.
+ZIP64 files are not supported."""
+
+import struct
+
+central_struct = struct.Struct("<4s6H3L5H2L")  # central directory file header
+end_struct = struct.Struct("<4s4H2LH")  # end of central directory record
+central_signature = b"PK\x01\x02"
+end_signature = b"PK\x05\x06"
+
+
+def read_end_record(f):
+    """Returns the end of central directory record of ZIP binary file object f: number of
+    members, size and offset of the central directory and comment."""
+    size = f.seek(0, 2)
+    tail_size = min([size, end_struct.size + 2**16 - 1])
+    f.seek(size - tail_size)
+    tail = f.read(tail_size)
+    position = tail.rfind(end_signature)
+    if position < 0 or tail_size - position < end_struct.size:
+        raise ValueError("Not a ZIP file")
+    record = end_struct.unpack(tail[position : position + end_struct.size])
+    signature, disk, cd_disk, disk_entries, entries, cd_size, cd_offset, length = record
+    if entries == 0xFFFF or cd_size == 0xFFFFFFFF or cd_offset == 0xFFFFFFFF:
+        raise ValueError("ZIP64 files can not be aligned")
+    if disk != 0 or cd_disk != 0 or disk_entries != entries:
+        raise ValueError("Multi disk ZIP files can not be aligned")
+    comment = tail[position + end_struct.size : position + end_struct.size + length]
+    return entries, cd_size, cd_offset, comment
+
+
+def read_central_directory(f, entries, cd_size, cd_offset):
+    """Returns the central directory file headers (bytes) of ZIP binary file object f."""
+    f.seek(cd_offset)
+    directory = f.read(cd_size)
+    headers = []
+    position = 0
+    for i in range(entries):
+        fields = central_struct.unpack_from(directory, position)
+        if fields[0] != central_signature:
+            raise ValueError("Bad ZIP central directory")
+        size = central_struct.size + sum(fields[10:13])  # name, extra field, comment
+        headers.append(directory[position : position + size])
+        position += size
+    return headers
+
+
+def member_name(header):
+    """Returns the member name of central directory file header (bytes)."""
+    fields = central_struct.unpack(header[: central_struct.size])
+    name = header[central_struct.size : central_struct.size + fields[10]]
+    if fields[3] & 0x800:  # UTF-8 flag
+        return name.decode("utf-8")
+    return name.decode("cp437")
+
+
+def align_zip(infile, outfile, align, chunk_size=2**20):
+    """Copies ZIP file infile (seekable binary file object) into binary file object outfile,
+    written from its start: each member and the central directory start at offset
+    align(position, name), an offset at or after position (the end of the previous
+    member) for member name (None for the central directory). Returns the offsets of
+    members in outfile, by name. Raises ValueError if infile is not a ZIP file or is a
+    ZIP64 file."""
+    entries, cd_size, cd_offset, comment = read_end_record(infile)
+    headers = read_central_directory(infile, entries, cd_size, cd_offset)
+    offsets = [central_struct.unpack(h[: central_struct.size])[-1] for h in headers]
+    names = {}
+    for header, offset in zip(headers, offsets):
+        names.setdefault(offset, member_name(header))
+
+    # member extents: from its local header to the next member or central directory
+    starts = sorted(set(offsets))
+    stops = starts[1:] + [cd_offset]
+    if len(starts) > 0 and stops[-1] < starts[-1]:
+        raise ValueError("Bad ZIP member offsets")
+
+    def copy(start, stop):
+        infile.seek(start)
+        remaining = stop - start
+        while remaining > 0:
+            chunk = infile.read(min([remaining, chunk_size]))
+            if len(chunk) == 0:
+                raise ValueError("Truncated ZIP file")
+            outfile.write(chunk)
+            remaining -= len(chunk)
+
+    def pad(position, name=None):
+        aligned = align(position, name)
+        if aligned < position:
+            raise ValueError("Aligned offset before the end of the previous member")
+        outfile.write(bytes(aligned - position))
+        return aligned
+
+    # data before the first member (if any) is kept at the start
+    position = starts[0] if len(starts) > 0 else 0
+    copy(0, position)
+    moved = {}
+    for start, stop in zip(starts, stops):
+        position = pad(position, names[start])
+        moved[start] = position
+        copy(start, stop)
+        position += stop - start
+
+    position = pad(position)
+    directory_offset = position
+    members = {}
+    for header, offset in zip(headers, offsets):
+        members[member_name(header)] = moved[offset]
+        header = bytearray(header)
+        struct.pack_into("<L", header, central_struct.size - 4, moved[offset])
+        outfile.write(header)
+        position += len(header)
+    outfile.write(
+        end_struct.pack(
+            end_signature,
+            0,
+            0,
+            entries,
+            entries,
+            position - directory_offset,
+            directory_offset,
+            len(comment),
+        )
+    )
+    outfile.write(comment)
+    return members
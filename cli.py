@@ -12,34 +12,144 @@
 
 import pprint
 import configparser
+import json
 import argparse
 import sys
+import os
 
 from archive2dna import package
+from archive2dna import shards
+from archive2dna import incremental
+from archive2dna import partial
+from archive2dna import inventory
 from archive2dna import dna as dna_module
 
 pp = pprint.PrettyPrinter(depth=6, stream=sys.stderr)
 
 
 def encode(args):
-    binary_data = args.infile.read()
+    if args.revision is not None:
+        manifest = json.load(args.revision)
+        container = package.Container.from_manifest(manifest, **technicalOptions(args))
+        segments = container.encode_revision(args.infile)
+        container.write_dna(args.outfile, args.dna_format, args.gzip, segments)
+        print("Blocks encoded :", *container.revised_blocks, file=sys.stderr)
+        if args.manifest is not None:
+            json.dump(container.layout_manifest(), args.manifest, indent=1)
+        return
     container = createContainer(args)
-    container.load_binary(binary_data)
-    container.create_logical_redundancy()
-    container.convert_to_dna()
-    container.compute_segments_sizes()
-    text = container.write_dna()
-    args.outfile.write(text)
+    if args.stream:
+        segments = container.encode_stream(args.infile)
+        container.write_dna(args.outfile, args.dna_format, args.gzip, segments)
+    else:
+        binary_data = args.infile.read()
+        container.load_binary(binary_data)
+        container.create_logical_redundancy()
+        container.convert_to_dna()
+        container.compute_segments_sizes()
+        container.write_dna(args.outfile, args.dna_format, args.gzip)
+    if args.manifest is not None:
+        json.dump(container.layout_manifest(), args.manifest, indent=1)
     pp.pprint(container.compute_stats())
 
 
 def decode(args):
-    dna_data = args.infile.read()
+    if args.manifest is not None:
+        manifest = json.load(args.manifest)
+        container = package.Container.from_manifest(manifest, **technicalOptions(args))
+    else:
+        container = createContainer(args)
+    if args.external:
+        size = container.decode_external(args.infile, args.outfile, args.chunk_size)
+        if size is None:
+            print("Package not decoded :", container.error_message, file=sys.stderr)
+            sys.exit(1)
+        pp.pprint(container.compute_stats())
+        return
+    if args.member is not None or args.range is not None:
+        container.load_dna(args.infile)
+        binary = partial.open_binary(container)
+        if args.member is not None:
+            args.outfile.write(partial.read_member(binary, args.member))
+        else:
+            args.outfile.write(partial.read_range(binary, *args.range))
+        pp.pprint(container.compute_stats())
+        return
+    container.load_dna(args.infile)
+    if container.decode_binary(args.outfile) is None:
+        print("Package not decoded :", container.error_message, file=sys.stderr)
+        sys.exit(1)
+    pp.pprint(container.compute_stats())
+
+
+def regenerate(args):
+    if args.manifest is not None:
+        manifest = json.load(args.manifest)
+        container = package.Container.from_manifest(manifest, **technicalOptions(args))
+    else:
+        container = createContainer(args)
+    container.load_dna(args.infile)
+    container.decode_binary()
+    if container.error:
+        print("Package not decoded :", container.error_message, file=sys.stderr)
+        sys.exit(1)
+    segments = container.regenerate_segments()
+    container.write_dna(args.outfile, args.dna_format, args.gzip, segments)
+    print("Segments regenerated :", *container.lost_indexes, file=sys.stderr)
+    pp.pprint(container.compute_stats())
+
+
+def decode_reads(args):
     container = createContainer(args)
-    container.load_dna(dna_data)
-    container.check_and_correct_logical_redundancy()
-    binary_data = container.write_binary()
-    args.outfile.write(binary_data)
+    if os.path.isfile(args.state):
+        decoder = incremental.IncrementalDecoder.load(args.state, container)
+    else:
+        decoder = incremental.IncrementalDecoder(container, args.segments)
+    f = container.dna_input(args.infile)
+    decoder.add(container.iter_dna(f))
+    decoder.save(args.state)
+    print("Blocks decoded :", *sorted(decoder.decoded), file=sys.stderr)
+    if not decoder.recoverable():
+        print("Package not recoverable yet", file=sys.stderr)
+        sys.exit(1)
+    with open(args.outfile, "wb") as outfile:
+        decoder.write_binary(outfile)
+    pp.pprint(container.compute_stats())
+
+
+def inventory_reads(args):
+    container = createContainer(args)
+    f = container.dna_input(args.infile)
+    out = inventory.inventory(container, container.iter_dna(f), args.primer_length)
+    out["primers"] = {str(k): v for k, v in out["primers"].items()}
+    json.dump(out, sys.stdout, indent=1)
+
+
+def shard_prepare(args):
+    container = createContainer(args)
+    if args.mode == "encode":
+        job = shards.prepare_encode(container, args.infile, args.directory, args.shards)
+    else:
+        job = shards.prepare_decode(container, args.infile, args.directory, args.shards)
+    print("Shards :", len(job["shards"]), file=sys.stderr)
+
+
+def shard_run(args):
+    shards.run_shard(args.directory, args.shard, **technicalOptions(args))
+
+
+def merge(args):
+    missing = shards.missing_shards(args.directory)
+    if len(missing) > 0:
+        print("Missing shards :", *missing, file=sys.stderr)
+        sys.exit(1)
+    container = shards.merge(
+        args.directory,
+        args.outfile,
+        args.dna_format,
+        args.gzip,
+        **technicalOptions(args),
+    )
     pp.pprint(container.compute_stats())
 
 
@@ -73,14 +183,7 @@ def createContainer(args):
     N = int(section["N"])
     K = int(section["K"])
     target_redundancy = float(section["target_redundancy"])
-
-    # read technical config
-    technical = config["TECHNICAL"]
-    auto_zip = not (technical["auto_zip"] == "False")
-    representation_type = technical["representation_type"]
-    representation_url = technical["representation_url"]
-    logging_file = technical["logging_file"]
-    logging_level = technical["logging_level"]
+    auto_zip = not (config["TECHNICAL"]["auto_zip"] == "False")
 
     if args.package_id == None:
         primer_length = 0
@@ -95,14 +198,40 @@ def createContainer(args):
         N=N,
         K=K,
         target_redundancy=target_redundancy,
-        representation_type=representation_type,
-        representation_url=representation_url,
-        logging_file=logging_file,
-        logging_level=logging_level,
         auto_zip=auto_zip,
+        zip_stored=getattr(args, "zip_stored", False),
+        block_aligned=getattr(args, "block_aligned", False),
+        slack_blocks=getattr(args, "slack_blocks", 1),
+        blocks=getattr(args, "blocks", None),
+        max_blocksize=getattr(args, "max_blocksize", None),
+        **technicalOptions(args),
     )
 
 
+def technicalOptions(args):
+    """Returns Container options which do not change the DNA representation."""
+    config = configparser.ConfigParser()
+    config.read("config.ini")
+    technical = config["TECHNICAL"]
+    return {
+        "representation_type": technical["representation_type"],
+        "representation_url": technical["representation_url"],
+        "logging_file": technical["logging_file"],
+        "logging_level": technical["logging_level"],
+        "pipeline_depth": args.pipeline_depth,
+        "workers": args.workers,
+        "checkpoint_dir": args.checkpoint_dir,
+    }
+
+
+def byte_range(arg):
+    try:
+        start, stop = [int(x) for x in arg.split(":")]
+    except ValueError:
+        raise argparse.ArgumentTypeError("Byte range must be START:STOP")
+    return start, stop
+
+
 def ranged_float(min, max):
     """Returns an argument type function for ArgumentParser checking a float
     with a range between min and max."""
@@ -130,6 +259,26 @@ parser.add_argument(
     default="DEFAULT",
     help="Config set to be used, e.g. DEFAULT or BIG (see config.ini)",
 )
+parser.add_argument(
+    "--pipeline-depth",
+    dest="pipeline_depth",
+    default=0,
+    type=int,
+    help="Process stages of consecutive blocks concurrently on threads, with at most"
+    " this number of blocks waiting between stages (0: sequential)",
+)
+parser.add_argument(
+    "--workers",
+    default=1,
+    type=int,
+    help="Number of processes used for Reed Solomon outer coding",
+)
+parser.add_argument(
+    "--checkpoint-dir",
+    dest="checkpoint_dir",
+    help="Save progress of outer coding in this directory, and resume from it if the"
+    " same job is run again",
+)
 subparsers = parser.add_subparsers(required=True)
 
 # Encode parser.
@@ -140,6 +289,66 @@ encode_parser.add_argument(
     dest="package_id",
     help="Information package ID, used to generate the primer",
 )
+encode_parser.add_argument(
+    "--stream",
+    action="store_true",
+    help="Encode one outer code block at a time (bounded memory usage)",
+)
+encode_parser.add_argument(
+    "--blocks",
+    type=int,
+    help="Minimal number of outer code blocks, e.g. to decode blocks in parallel",
+)
+encode_parser.add_argument(
+    "--max-blocksize",
+    dest="max_blocksize",
+    type=int,
+    help="Maximal number of DNA segments per outer code block",
+)
+encode_parser.add_argument(
+    "--zip-stored",
+    dest="zip_stored",
+    action="store_true",
+    help="Zip the package without compression, so that parts of it can be decoded alone",
+)
+encode_parser.add_argument(
+    "--block-aligned",
+    dest="block_aligned",
+    action="store_true",
+    help="Start each member of the package (a ZIP file) on an outer code block, so that"
+    " revisions only encode the blocks of changed members (see --revision)",
+)
+encode_parser.add_argument(
+    "--slack-blocks",
+    dest="slack_blocks",
+    type=int,
+    default=1,
+    help="Spare blocks left after each member of a block aligned package, so that a"
+    " member may grow in a revision without moving the following ones",
+)
+encode_parser.add_argument(
+    "--revision",
+    type=argparse.FileType("r"),
+    help="Layout manifest of the previous version of a block aligned package: encode only"
+    " the blocks which changed (write the new manifest with --manifest)",
+)
+encode_parser.add_argument(
+    "--manifest",
+    type=argparse.FileType("w"),
+    help="Write the layout manifest (parameters, layout and block checksums) to this file",
+)
+encode_parser.add_argument(
+    "--format",
+    dest="dna_format",
+    default="text",
+    choices=["text", "fasta", "binary"],
+    help="DNA output format: one segment per line (text), FASTA or binary (2 bits per base)",
+)
+encode_parser.add_argument(
+    "--gzip",
+    action="store_true",
+    help="Compress DNA output using gzip",
+)
 encode_parser.add_argument(
     "infile",
     nargs="?",
@@ -165,12 +374,40 @@ decoder_parser.add_argument(
     dest="package_id",
     help="Information package ID, used to generate the primer",
 )
+decoder_parser.add_argument(
+    "--manifest",
+    type=argparse.FileType("r"),
+    help="Layout manifest written at encoding: parameters and layout are not inferred,"
+    " decoded blocks are verified",
+)
+partial_group = decoder_parser.add_mutually_exclusive_group()
+partial_group.add_argument(
+    "--member",
+    help="Decode only this member of the information package (ZIP file)",
+)
+partial_group.add_argument(
+    "--range",
+    type=byte_range,
+    help="Decode only bytes START:STOP (excluded) of the information package",
+)
+decoder_parser.add_argument(
+    "--external",
+    action="store_true",
+    help="Sort segments in temporary files (bounded memory usage, for large read sets)",
+)
+decoder_parser.add_argument(
+    "--chunk-size",
+    dest="chunk_size",
+    default=2**16,
+    type=int,
+    help="Number of segments sorted in memory with --external",
+)
 decoder_parser.add_argument(
     "infile",
     nargs="?",
-    type=argparse.FileType("r"),
-    default=sys.stdin,
-    help="input dna formatted file",
+    type=argparse.FileType("rb"),
+    default=sys.stdin.buffer,
+    help="input dna formatted file (text, FASTA or binary, may be gzip compressed)",
 )
 decoder_parser.add_argument(
     "outfile",
@@ -180,6 +417,168 @@ decoder_parser.add_argument(
     help="output binary file",
 )
 
+# Regeneration parser.
+regenerate_parser = subparsers.add_parser(
+    "regenerate",
+    help="decode dna and write only the segments lost or beyond repair, for synthesis",
+)
+regenerate_parser.set_defaults(func=regenerate)
+regenerate_parser.add_argument(
+    "--id",
+    dest="package_id",
+    help="Information package ID, used to generate the primer",
+)
+regenerate_parser.add_argument(
+    "--manifest",
+    type=argparse.FileType("r"),
+    help="Layout manifest written at encoding (see decode)",
+)
+regenerate_parser.add_argument(
+    "--format",
+    dest="dna_format",
+    default="text",
+    choices=["text", "fasta", "binary"],
+    help="DNA output format: one segment per line (text), FASTA or binary (2 bits per base)",
+)
+regenerate_parser.add_argument(
+    "--gzip",
+    action="store_true",
+    help="Compress DNA output using gzip",
+)
+regenerate_parser.add_argument(
+    "infile",
+    nargs="?",
+    type=argparse.FileType("rb"),
+    default=sys.stdin.buffer,
+    help="input dna formatted file (text, FASTA or binary, may be gzip compressed)",
+)
+regenerate_parser.add_argument(
+    "outfile",
+    nargs="?",
+    type=argparse.FileType("w"),
+    default=sys.stdout,
+    help="output dna formatted file, with the regenerated segments only",
+)
+
+# Incremental decoding parser.
+decode_reads_parser = subparsers.add_parser(
+    "decode-reads",
+    help="add reads to an incremental decoding state, and decode once recoverable",
+)
+decode_reads_parser.set_defaults(func=decode_reads)
+decode_reads_parser.add_argument(
+    "--id",
+    dest="package_id",
+    help="Information package ID, used to generate the primer",
+)
+decode_reads_parser.add_argument(
+    "--segments",
+    type=int,
+    help="Number of DNA segments of the package, if known",
+)
+decode_reads_parser.add_argument(
+    "state", help="decoder state file, created if it does not exist"
+)
+decode_reads_parser.add_argument(
+    "infile",
+    type=argparse.FileType("rb"),
+    help="input dna formatted file (text, FASTA or binary, may be gzip compressed)",
+)
+decode_reads_parser.add_argument(
+    "outfile", help="output binary file, written once the package is recoverable"
+)
+
+# Inventory parser.
+inventory_parser = subparsers.add_parser(
+    "inventory",
+    help="count reads per primer and per block from their index only (no decoding)",
+)
+inventory_parser.set_defaults(func=inventory_reads, package_id=None)
+inventory_parser.add_argument(
+    "--primer-length",
+    dest="primer_length",
+    type=int,
+    help="Length of primers in bases (default: from the length of reads)",
+)
+inventory_parser.add_argument(
+    "infile",
+    nargs="?",
+    type=argparse.FileType("rb"),
+    default=sys.stdin.buffer,
+    help="input dna formatted file (text, FASTA or binary, may be gzip compressed)",
+)
+
+# Sharded encoding/decoding parsers.
+shard_prepare_parser = subparsers.add_parser(
+    "shard-prepare",
+    help="prepare a sharded encoding or decoding job in a directory shared by workers",
+    description="Prepare a sharded encoding or decoding job in a directory shared by"
+    " workers. Decoding: inner code of all reads is decoded here (use --workers to run"
+    " it on several processes), only outer code decoding is split in shards.",
+)
+shard_prepare_parser.set_defaults(func=shard_prepare)
+shard_prepare_parser.add_argument("mode", choices=["encode", "decode"])
+shard_prepare_parser.add_argument(
+    "--id",
+    dest="package_id",
+    help="Information package ID, used to generate the primer",
+)
+shard_prepare_parser.add_argument(
+    "--shards",
+    default=1,
+    type=int,
+    help="Number of shards, i.e. of independent work units (at most one per block)",
+)
+shard_prepare_parser.add_argument(
+    "--blocks",
+    type=int,
+    help="Minimal number of outer code blocks (encode)",
+)
+shard_prepare_parser.add_argument(
+    "--max-blocksize",
+    dest="max_blocksize",
+    type=int,
+    help="Maximal number of DNA segments per outer code block (encode)",
+)
+shard_prepare_parser.add_argument(
+    "infile",
+    type=argparse.FileType("rb"),
+    help="input binary file (encode) or dna formatted file (decode)",
+)
+shard_prepare_parser.add_argument("directory", help="job directory")
+
+shard_run_parser = subparsers.add_parser(
+    "shard-run", help="encode or decode one shard of a prepared job"
+)
+shard_run_parser.set_defaults(func=shard_run)
+shard_run_parser.add_argument("directory", help="job directory")
+shard_run_parser.add_argument("shard", type=int, help="shard number (from 0)")
+
+merge_parser = subparsers.add_parser(
+    "merge", help="check all shards of a job are done and merge their outputs"
+)
+merge_parser.set_defaults(func=merge)
+merge_parser.add_argument(
+    "--format",
+    dest="dna_format",
+    default="text",
+    choices=["text", "fasta", "binary"],
+    help="DNA output format (encode)",
+)
+merge_parser.add_argument(
+    "--gzip",
+    action="store_true",
+    help="Compress DNA output using gzip (encode)",
+)
+merge_parser.add_argument("directory", help="job directory")
+merge_parser.add_argument(
+    "outfile",
+    nargs="?",
+    type=argparse.FileType("wb"),
+    default=sys.stdout.buffer,
+    help="output dna formatted file (encode) or binary file (decode)",
+)
+
 # Corrupt parser.
 corrupt_parser = subparsers.add_parser(
     "corrupt", help="corrupt dna for testing purposes"
@@ -0,0 +1,29 @@
+from unittest import TestCase
+import os
+
+from archive2dna import bytesutils
+
+
+class BytesutilsModule(TestCase):
+    def test_split_bytes_in_four(self):
+        b = bytes([0x1B, 0xFF, 0x00])
+        self.assertTrue(
+            bytesutils.split_bytes_in_four(b)
+            == b"\x00\x01\x02\x03\x03\x03\x03\x03\x00\x00\x00\x00"
+        )
+
+    def test_split_and_merge_identity(self):
+        """Splitting then merging all bytes values must result in identity"""
+        b = bytes(range(256)) + os.urandom(10000)
+        self.assertTrue(
+            bytesutils.merge_four_bytes_in_one(bytesutils.split_bytes_in_four(b)) == b
+        )
+
+    def test_preallocated_output(self):
+        b = os.urandom(100)
+        out = bytearray(500)
+        bytesutils.split_bytes_in_four(b, out=memoryview(out)[100:])
+        self.assertTrue(out[100:] == bytesutils.split_bytes_in_four(b))
+        merged = bytearray(100)
+        bytesutils.merge_four_bytes_in_one(out[100:], out=merged)
+        self.assertTrue(merged == b)
@@ -0,0 +1,141 @@
+from unittest import TestCase, mock
+import os
+import io
+import shutil
+import time
+
+from archive2dna import package
+
+# directories setup
+test_package = "tests/data/aip_olos.zip"
+test_package = test_package.replace("/", os.sep)
+test_tmp_dir = "tests/tmp/"
+test_tmp_dir = test_tmp_dir.replace("/", os.sep)
+test_checkpoint_dir = test_tmp_dir + "checkpoint"
+logging_file = test_tmp_dir + "tests.log"
+
+if not os.path.isdir(test_tmp_dir):
+    os.mkdir(test_tmp_dir)
+
+
+class Interrupted(Exception):
+    pass
+
+
+def interrupt_at(method, block):
+    """Returns a replacement of Container method raising Interrupted at block."""
+    original = getattr(package.Container, method)
+
+    def interrupted(self, *args):
+        blk = args[1] if method == "add_outer_code_block" else args[0]
+        if blk == block:
+            raise Interrupted()
+        return original(self, *args)
+
+    return mock.patch.object(package.Container, method, interrupted)
+
+
+def encode(binary_data, **kwargs):
+    c = package.Container(logging_file=logging_file, **kwargs)
+    c.load_binary(binary_data)
+    c.create_logical_redundancy()
+    c.convert_to_dna()
+    return c.dna
+
+
+class Checkpoint(TestCase):
+    def setUp(self):
+        shutil.rmtree(test_checkpoint_dir, ignore_errors=True)
+        with open(test_package, "rb") as f:
+            self.binary_data = f.read()
+
+    def tearDown(self):
+        shutil.rmtree(test_checkpoint_dir, ignore_errors=True)
+
+    def test_encode_resume(self):
+        """Test encoding killed during outer coding resumes with the same output"""
+        parameters = {
+            "mo": 8,
+            "auto_zip": False,
+            "checkpoint_dir": test_checkpoint_dir,
+            "checkpoint_interval": 0,
+        }
+        segments = encode(self.binary_data, mo=8, auto_zip=False)
+        with interrupt_at("add_outer_code_block", 2):
+            with self.assertRaises(Interrupted):
+                encode(self.binary_data, **parameters)
+        self.assertTrue(os.path.isfile(test_checkpoint_dir + os.sep + "checkpoint.dna"))
+
+        # blocks 0 and 1 are not coded again
+        with interrupt_at("add_outer_code_block", 1):
+            self.assertEqual(encode(self.binary_data, **parameters), segments)
+        self.assertEqual(os.listdir(test_checkpoint_dir), [])
+
+    def test_encode_resume_manifest(self):
+        """Test the manifest of a resumed encoding matches the checkpointed zip"""
+        parameters = {
+            "mo": 8,
+            "checkpoint_dir": test_checkpoint_dir,
+            "checkpoint_interval": 0,
+        }
+        with interrupt_at("add_outer_code_block", 2):
+            with self.assertRaises(Interrupted):
+                encode(self.binary_data, **parameters)
+
+        # zip of the resumed encoding is dated later than the checkpointed one
+        with mock.patch("time.time", return_value=time.time() + 3600):
+            c = package.Container(logging_file=logging_file, **parameters)
+            c.load_binary(self.binary_data)
+            c.create_logical_redundancy()
+            c.convert_to_dna()
+        d = package.Container.from_manifest(
+            c.layout_manifest(), logging_file=logging_file
+        )
+        d.load_dna("\n".join(c.dna))
+        self.assertEqual(d.decode_binary(), self.binary_data)
+        self.assertFalse(d.error)
+
+    def test_decode_resume(self):
+        """Test decoding killed during outer decoding resumes with the same output"""
+        segments = encode(self.binary_data, mo=8)
+        segments = segments[:100] + segments[101:]
+        segments[1500] = segments[1500][:10] + "A" + segments[1500][11:]
+        text = "\n".join(segments)
+
+        c = package.Container(mo=8, logging_file=logging_file)
+        c.load_dna(text)
+        self.assertEqual(c.decode_binary(), self.binary_data)
+        stats = c.compute_stats()
+
+        parameters = {
+            "mo": 8,
+            "logging_file": logging_file,
+            "checkpoint_dir": test_checkpoint_dir,
+            "checkpoint_interval": 0,
+        }
+        with interrupt_at("decode_outer_code_block", 1):
+            c = package.Container(**parameters)
+            c.load_dna(text)
+            with self.assertRaises(Interrupted):
+                c.check_and_correct_logical_redundancy()
+
+        # inner code and block 0 are not decoded again
+        with interrupt_at("decode_outer_code_block", 0):
+            with mock.patch.object(package.Container, "decode_inner_code") as inner:
+                c = package.Container(**parameters)
+                c.load_dna(text)
+                out = io.BytesIO()
+                c.decode_binary(out)
+                inner.assert_not_called()
+        self.assertEqual(out.getvalue(), self.binary_data)
+        self.assertEqual(c.compute_stats(), stats)
+
+        # a checkpoint is not resumed for other input
+        with interrupt_at("decode_outer_code_block", 1):
+            c = package.Container(**parameters)
+            c.load_dna(text)
+            with self.assertRaises(Interrupted):
+                c.decode_binary()
+        c = package.Container(**parameters)
+        c.load_dna("\n".join(segments[:200] + segments[201:]))
+        self.assertEqual(c.decode_binary(), self.binary_data)
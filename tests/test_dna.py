@@ -1,4 +1,7 @@
 from unittest import TestCase
+import os
+import array
+import random
 
 from archive2dna import dna
 
@@ -10,6 +13,40 @@ class DnaModule(TestCase):
     def test_valid_dna_2(self):
         self.assertFalse(dna.isValidDna("ATGCXTGC"))
 
+    def test_segments_to_bits_and_back(self):
+        """Converts DNA segments of various lengths to bits (with padding) and back"""
+        segments = ["ATGCATGC", "TTGA", "", "CCCCCCCCCA"]
+        bits = dna.segments2bits(segments, length=8)
+        self.assertTrue(bits[1] == b"\x01\x01\x02\x00\x00\x00\x00\x00")
+        self.assertTrue([len(b) for b in bits] == [8, 8, 8, 10])
+        segments2 = dna.bits2segments(bits)
+        self.assertTrue(segments2[0] == segments[0])
+        self.assertTrue(segments2[1] == "TTGAAAAA")
+        self.assertTrue(segments2[3] == segments[3])
+        # rows of the SQL representation are tuples padded with None
+        rows = [tuple(b) + (None, None) for b in bits]
+        self.assertTrue(dna.bits2segments(rows) == segments2)
+        with self.assertRaises(ValueError):
+            dna.segments2bits(["ATGC", "ATGX"])
+
+    def test_merge_split_bases_2d(self):
+        """Checks batched merge and split of bases against a direct computation,
+        for several symbol widths and sequences not multiple of the symbol width"""
+        for block_size in [4, 7, 12]:
+            a = [[random.randint(0, 3) for i in range(n)] for n in [0, 5, 28, 31]]
+            merged = dna.merge_bases_2d(a, block_size=block_size)
+            for x, m in zip(a, merged):
+                x = x + [0] * (-len(x) % block_size)
+                expected = [
+                    sum(x[i + j] << 2 * (block_size - j - 1) for j in range(block_size))
+                    for i in range(0, len(x), block_size)
+                ]
+                self.assertTrue(list(m) == expected)
+            split = dna.split_bases_2d(merged, block_size=block_size)
+            for x, b in zip(a, split):
+                self.assertTrue(list(b[: len(x)]) == x)
+                self.assertTrue(len(b) % block_size == 0)
+
     def test_primer_complement(self):
         self.assertTrue(dna.complement_primer("ATGC") == "GCAT")
 
@@ -22,6 +59,18 @@ class DnaModule(TestCase):
         d = dna.bytes2dna(b)
         self.assertTrue(dna.dna2bytes(d) == b)
 
+    def test_bytes_to_dna_table(self):
+        """Checks bulk conversion against the byte to 4-mer lookup table"""
+        b = os.urandom(10000)
+        d = dna.bytes2dna(b)
+        self.assertTrue(d == "".join([dna.byte2dna_table[x] for x in b]))
+        self.assertTrue(dna.dna2bytes(d) == b)
+        self.assertTrue(dna.dna2bytes(d + "ATG") == b)
+
+    def test_dna_to_bytes_invalid(self):
+        with self.assertRaises(ValueError):
+            dna.dna2bytes("ATGCXTGC")
+
     def test_add_remove_primer(self):
         sequence = "ATGC"
         primer1 = "AAAAAA"
@@ -0,0 +1,61 @@
+from unittest import TestCase
+import os
+import io
+import random
+
+from archive2dna import dnafile
+from archive2dna import package
+
+# directories setup
+test_package = "tests/data/aip_olos.zip"
+test_package = test_package.replace("/", os.sep)
+test_tmp_dir = "tests/tmp/"
+test_tmp_dir = test_tmp_dir.replace("/", os.sep)
+test_dna_tmp = test_tmp_dir + "dna.bin"
+logging_file = test_tmp_dir + "tests.log"
+
+if not os.path.isdir(test_tmp_dir):
+    os.mkdir(test_tmp_dir)
+
+
+class DnaFileModule(TestCase):
+    def test_write_read_segments(self):
+        """Test binary DNA file roundtrip and random access to segments"""
+        segments = [
+            "".join(random.choices("ATGC", k=random.randint(0, 30))) for i in range(100)
+        ]
+        out = io.BytesIO()
+        count = dnafile.write_segments(out, segments, header={"mi": 8})
+        self.assertEqual(count, len(segments))
+        f = dnafile.DnaFile(out.getvalue())
+        self.assertEqual(f.header, {"mi": 8})
+        self.assertEqual(len(f), len(segments))
+        self.assertEqual(f.segments(), segments)
+        for i in [0, 17, 99, -1]:
+            self.assertEqual(f[i], segments[i])
+        with self.assertRaises(IndexError):
+            f[100]
+        with self.assertRaises(ValueError):
+            dnafile.DnaFile(b"ATGC\nATGC")
+
+    def test_package_binary_dna(self):
+        """Test package written as binary DNA file, then loaded using mmap"""
+        with open(test_package, "rb") as f:
+            binary_data = f.read()
+        c = package.Container(package_id="olos:1", logging_file=logging_file)
+        c.load_binary(binary_data)
+        c.create_logical_redundancy()
+        c.convert_to_dna()
+        with open(test_dna_tmp, "wb") as f:
+            c.write_dna(f, dna_format="binary")
+        with open(test_dna_tmp, "rb") as f:
+            dna_file = dnafile.DnaFile.open(f)
+            self.assertEqual(dna_file[10], c.dna[10])
+            self.assertEqual(dna_file.header["primer"], c.primer)
+            dna_file.close()
+        self.assertLess(os.path.getsize(test_dna_tmp), len(c.write_dna()) / 3)
+        c2 = package.Container(package_id="olos:1", logging_file=logging_file)
+        with open(test_dna_tmp, "rb") as f:
+            c2.load_dna(f)
+        c2.check_and_correct_logical_redundancy()
+        self.assertEqual(c2.write_binary(), binary_data)
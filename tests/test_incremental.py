@@ -0,0 +1,94 @@
+from unittest import TestCase
+import os
+import random
+
+from archive2dna import package
+from archive2dna import incremental
+
+# directories setup
+test_package = "tests/data/aip_olos.zip"
+test_package = test_package.replace("/", os.sep)
+test_tmp_dir = "tests/tmp/"
+test_tmp_dir = test_tmp_dir.replace("/", os.sep)
+test_state = test_tmp_dir + "state.dna"
+logging_file = test_tmp_dir + "tests.log"
+
+if not os.path.isdir(test_tmp_dir):
+    os.mkdir(test_tmp_dir)
+
+
+def reads(binary_data, coverage, **kwargs):
+    """Returns segments of binary data drawn at random (coverage reads per segment)."""
+    c = package.Container(logging_file=logging_file, **kwargs)
+    c.load_binary(binary_data)
+    c.create_logical_redundancy()
+    c.convert_to_dna()
+    rnd = random.Random(2)
+    return [rnd.choice(c.dna) for i in range(coverage * len(c.dna))]
+
+
+class IncrementalDecoding(TestCase):
+    def setUp(self):
+        with open(test_package, "rb") as f:
+            self.binary_data = f.read()
+
+    def tearDown(self):
+        if os.path.isfile(test_state):
+            os.remove(test_state)
+
+    def test_decode(self):
+        """Test blocks are decoded as reads arrive, with the decoder state saved and
+        resumed, until the package is recoverable"""
+        segments = reads(self.binary_data, 4, mo=8, package_id="olos:1")
+        segments[100] = segments[100][:30] + "A" + segments[100][31:]
+        decoder = incremental.IncrementalDecoder(
+            package.Container(mo=8, package_id="olos:1", logging_file=logging_file)
+        )
+        decoded = []
+        for start in range(0, len(segments), 500):
+            decoded += decoder.add(segments[start : start + 500])
+            decoder.save(test_state)
+            decoder = incremental.IncrementalDecoder.load(
+                test_state,
+                package.Container(mo=8, package_id="olos:1", logging_file=logging_file),
+            )
+            if decoder.recoverable():
+                break
+        self.assertEqual(decoded, [0, 1, 2])
+        self.assertLess(start + 500, len(segments))
+        # each read votes for the end of its countdown
+        c = decoder.container
+        self.assertEqual(c.layout_votes, sum(decoder.ends.values()))
+        self.assertGreater(c.layout_votes, len(decoder.ends))
+        self.assertEqual(decoder.write_binary(), self.binary_data)
+
+    def test_single_block(self):
+        """Test the end of a package of a single full block is found from its zip"""
+        segments = reads(self.binary_data, 6)
+        decoder = incremental.IncrementalDecoder(
+            package.Container(logging_file=logging_file)
+        )
+        decoder.add(segments[:1000])
+        self.assertFalse(decoder.recoverable())
+        with self.assertRaises(ValueError):
+            decoder.write_binary()
+        decoder.add(segments[1000:])
+        self.assertTrue(decoder.recoverable())
+        self.assertEqual(decoder.write_binary(), self.binary_data)
+
+    def test_erasures(self):
+        """Test a block missing more than necso/2 outer code symbols is decoded, missing
+        segments being erasures"""
+        c = package.Container(mo=8, package_id="olos:1", logging_file=logging_file)
+        c.load_binary(self.binary_data)
+        c.create_logical_redundancy()
+        c.convert_to_dna()
+        # ecc and message columns of block 0 (countdowns of its last ecc and message
+        # columns are kept)
+        missing = list(range(200)) + list(range(c.dnecso, c.dnecso + 256))
+        segments = [s for i, s in enumerate(c.dna) if i not in missing]
+        decoder = incremental.IncrementalDecoder(
+            package.Container(mo=8, package_id="olos:1", logging_file=logging_file)
+        )
+        self.assertEqual(decoder.add(segments), [0, 1, 2])
+        self.assertEqual(decoder.write_binary(), self.binary_data)
@@ -0,0 +1,86 @@
+from unittest import TestCase
+import os
+import random
+
+from archive2dna import package
+from archive2dna import inventory
+
+# directories setup
+test_tmp_dir = "tests/tmp/"
+test_tmp_dir = test_tmp_dir.replace("/", os.sep)
+logging_file = test_tmp_dir + "tests.log"
+
+if not os.path.isdir(test_tmp_dir):
+    os.mkdir(test_tmp_dir)
+
+
+def encode(filename, package_id):
+    c = package.Container(package_id=package_id, mo=8, logging_file=logging_file)
+    with open(filename.replace("/", os.sep), "rb") as f:
+        c.load_binary(f.read())
+    c.create_logical_redundancy()
+    c.convert_to_dna()
+    return c
+
+
+class Inventory(TestCase):
+    def test_inventory(self):
+        """Test reads of a pool of two packages are counted per primer and per block"""
+        c1 = encode("tests/data/aip_olos.zip", "olos:1")
+        c2 = encode("tests/data/aip_olos2.zip", "olos:2")
+
+        # block 0 of package 1 misses more than necso/2 outer code symbols, which are
+        # erasures, block 1 misses too many segments, package 2 is read twice
+        block_start = c1.dblocksize
+        reads = c1.dna[400:block_start] + c1.dna[block_start + 700 :] + c2.dna + c2.dna
+        reads[10] = "G" + reads[10][1:]  # primer does not match complement primer
+        reads[20] = reads[20][:50] + "N" + reads[20][51:]
+        random.Random(1).shuffle(reads)
+
+        out = inventory.inventory(
+            package.Container(mo=8, logging_file=logging_file), reads
+        )
+        self.assertEqual(out["unassigned"], 1)
+        p1 = out["primers"][c1.primer]
+        p2 = out["primers"][c2.primer]
+        self.assertEqual((p1["reads"], p1["invalid"]), (len(c1.dna) - 1102, 1))
+        self.assertEqual(p2["reads"], 2 * len(c2.dna))
+        self.assertEqual(p2["segments"], len(c2.dna))
+        self.assertGreater(p1["layout"].pop("margin"), 0)
+        self.assertGreater(p1["layout"].pop("votes"), 0)
+        self.assertEqual(
+            p1["layout"],
+            {
+                "dnecso": c1.dnecso,
+                "necso": c1.necso,
+                "dblocksize": c1.dblocksize,
+                "numblocks": c1.numblocks,
+                "last_segment": len(c1.dna) - 1,
+            },
+        )
+        self.assertEqual([b["missing"] for b in p1["blocks"]], [402, 700, 0])
+        self.assertEqual([b["decodable"] for b in p1["blocks"]], [True, False, True])
+        self.assertFalse(p1["decodable"])
+        self.assertTrue(p2["decodable"])
+
+    def test_decodable(self):
+        """Test a block estimated decodable, missing more than necso/2 outer code symbols,
+        is decoded (missing segments are erasures)"""
+        c = encode("tests/data/aip_olos.zip", "olos:1")
+        reads = c.dna[400:]
+        out = inventory.inventory(
+            package.Container(mo=8, logging_file=logging_file), reads
+        )
+        block = out["primers"][c.primer]["blocks"][0]
+        self.assertGreater(block["missing_symbols"], c.necso // 2)
+        self.assertTrue(block["decodable"])
+
+        with open("tests/data/aip_olos.zip".replace("/", os.sep), "rb") as f:
+            binary_data = f.read()
+        for workers in [1, 2, 3]:
+            d = package.Container(
+                mo=8, package_id="olos:1", workers=workers, logging_file=logging_file
+            )
+            d.load_dna("\n".join(reads))
+            self.assertEqual(d.decode_binary(), binary_data)
+            self.assertFalse(d.error)
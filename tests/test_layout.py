@@ -0,0 +1,114 @@
+from unittest import TestCase
+import os
+import io
+import random
+
+from archive2dna import package
+
+# directories setup
+test_package = "tests/data/aip_olos.zip"
+test_package = test_package.replace("/", os.sep)
+test_tmp_dir = "tests/tmp/"
+test_tmp_dir = test_tmp_dir.replace("/", os.sep)
+logging_file = test_tmp_dir + "tests.log"
+
+if not os.path.isdir(test_tmp_dir):
+    os.mkdir(test_tmp_dir)
+
+
+class LayoutVotes(TestCase):
+    def setUp(self):
+        with open(test_package, "rb") as f:
+            self.binary_data = f.read()
+        c = package.Container(mo=8, logging_file=logging_file)
+        c.load_binary(self.binary_data)
+        c.create_logical_redundancy()
+        c.convert_to_dna()
+        self.container = c
+
+    def count_downs(self):
+        c = package.Container(mo=8, logging_file=logging_file)
+        c.load_dna("\n".join(self.container.dna))
+        c.decode_inner_code()
+        indices, count_down = c.read_indexes()
+        count_downs = [
+            (i, indices[i], count_down[i])
+            for i in range(len(count_down))
+            if count_down[i] != 0
+        ]
+        return c, count_downs, len(indices)
+
+    def test_decode(self):
+        """Test the layout read from countdowns and its votes in statistics"""
+        c = package.Container(mo=8, logging_file=logging_file)
+        c.load_dna("\n".join(self.container.dna))
+        self.assertEqual(c.decode_binary(), self.binary_data)
+        for name in ["dnecso", "necso", "dblocksize", "numblocks"]:
+            self.assertEqual(getattr(c, name), getattr(self.container, name))
+        layout = c.compute_stats()["layout"]
+        self.assertEqual(layout["votes"], layout["support"])
+        self.assertGreater(int(layout["margin"]), 0)
+
+    def test_corrupted_countdowns(self):
+        """Test countdowns of corrupted segments are outvoted"""
+        c, count_downs, n_segments = self.count_downs()
+        # first countdown ends on column 7, another one after the last column
+        count_downs = [(0, 3, 4)] + count_downs + [(n_segments, n_segments + 8, 3)]
+        last_index = c.read_layout(count_downs, n_segments)
+        self.assertEqual(last_index, self.container.dn - 1)
+        for name in ["dnecso", "necso", "dblocksize", "numblocks"]:
+            self.assertEqual(getattr(c, name), getattr(self.container, name))
+        self.assertEqual(c.layout_support, c.layout_votes - 2)
+        self.assertGreater(c.layout_margin, 0)
+
+    def test_no_layout(self):
+        """Test a pool without the countdowns of a layout is reported as an error"""
+        c = self.container
+        text = "\n".join(c.dna[c.dnecso : c.dblocksize])  # data segments of block 0
+        d = package.Container(mo=8, logging_file=logging_file)
+        d.load_dna(text)
+        self.assertIsNone(d.decode_binary())
+        self.assertTrue(d.error)
+        self.assertIn("Layout not found", d.error_message)
+
+        d = package.Container(mo=8, logging_file=logging_file)
+        self.assertIsNone(d.decode_external(io.BytesIO(text.encode("ascii"))))
+        self.assertTrue(d.error)
+        self.assertIn("Layout not found", d.error_message)
+
+    def replaced(self, n):
+        """Returns segments with n of them replaced by the segment of the same number of
+        the package encoded with another layout: their countdowns are corrupted."""
+        c = package.Container(mo=8, max_blocksize=300, logging_file=logging_file)
+        c.load_binary(self.binary_data)
+        c.create_logical_redundancy()
+        c.convert_to_dna()
+        segments = list(self.container.dna)
+        for i in random.Random(1).sample(range(len(c.dna)), n):
+            segments[i] = c.dna[i]
+        return "\n".join(segments)
+
+    def test_minority_of_corrupted_countdowns(self):
+        """Test a minority of corrupted countdowns is outvoted, their segments are
+        corrected by the outer code"""
+        d = package.Container(mo=8, logging_file=logging_file)
+        d.load_dna(self.replaced(100))
+        self.assertEqual(d.decode_binary(), self.binary_data)
+        self.assertLess(d.layout_support, d.layout_votes)
+        self.assertGreaterEqual(d.layout_support, 0.9 * d.layout_votes)
+
+    def test_unsupported_layout(self):
+        """Test decoding stops before the outer code if too many countdowns disagree with
+        the layout"""
+        text = self.replaced(400)
+        d = package.Container(mo=8, logging_file=logging_file)
+        d.load_dna(text)
+        self.assertIsNone(d.decode_binary())
+        self.assertTrue(d.error)
+        self.assertIn("Layout not supported", d.error_message)
+        self.assertLess(d.layout_support, 0.9 * d.layout_votes)
+        self.assertEqual(d.outer_corrections, 0)
+
+        d = package.Container(mo=8, logging_file=logging_file)
+        self.assertIsNone(d.decode_external(io.BytesIO(text.encode("ascii"))))
+        self.assertIn("Layout not supported", d.error_message)
@@ -0,0 +1,69 @@
+from unittest import TestCase
+import os
+import io
+import json
+
+from archive2dna import package
+
+# directories setup
+test_package = "tests/data/aip_olos.zip"
+test_package = test_package.replace("/", os.sep)
+test_tmp_dir = "tests/tmp/"
+test_tmp_dir = test_tmp_dir.replace("/", os.sep)
+logging_file = test_tmp_dir + "tests.log"
+
+if not os.path.isdir(test_tmp_dir):
+    os.mkdir(test_tmp_dir)
+
+
+class LayoutManifest(TestCase):
+    def setUp(self):
+        with open(test_package, "rb") as f:
+            self.binary_data = f.read()
+        c = package.Container(mo=8, package_id="olos:1", logging_file=logging_file)
+        c.load_binary(self.binary_data)
+        c.create_logical_redundancy()
+        c.convert_to_dna()
+        self.segments = c.dna
+        self.manifest = json.loads(json.dumps(c.layout_manifest()))
+
+    def decode(self, segments, manifest):
+        c = package.Container.from_manifest(manifest, logging_file=logging_file)
+        c.load_dna("\n".join(segments))
+        return c.decode_binary(), c
+
+    def test_manifest(self):
+        """Test the manifest of streamed and in memory encoding, and its content"""
+        parameters = {"mo": 8, "auto_zip": False, "logging_file": logging_file}
+        c = package.Container(**parameters)
+        c.load_binary(self.binary_data)
+        self.assertIsNone(c.checksums)  # computed when the manifest is requested
+        manifest = c.layout_manifest()
+        c = package.Container(**parameters)
+        list(c.encode_stream(io.BytesIO(self.binary_data)))
+        self.assertEqual(c.layout_manifest(), manifest)
+        self.assertEqual(self.manifest["segments"], len(self.segments))
+        self.assertEqual(len(self.manifest["checksums"]), 3)
+        self.assertEqual(self.manifest["parameters"]["mo"], 8)
+
+    def test_decode(self):
+        """Test decoding with the manifest, when countdowns giving necso are lost"""
+        dnecso = self.manifest["layout"]["dnecso"]
+        segments = self.segments[: dnecso - 256] + self.segments[dnecso - 1 :]
+        binary_data, c = self.decode(segments, self.manifest)
+        self.assertEqual(binary_data, self.binary_data)
+        self.assertFalse(c.error)
+        self.assertEqual(c.segments_lost, 255)
+
+        c = package.Container(mo=8, package_id="olos:1", logging_file=logging_file)
+        c.load_dna("\n".join(segments))
+        c.decode_inner_code()
+        c.sort_segments()
+        self.assertNotEqual(c.dnecso, dnecso)
+
+    def test_verify(self):
+        """Test a block not matching its checksum is reported"""
+        self.manifest["checksums"][1] = self.manifest["checksums"][0]
+        binary_data, c = self.decode(self.segments, self.manifest)
+        self.assertTrue(c.error)
+        self.assertEqual(c.error_message, "Block checksum error. Block:1\n")
@@ -33,6 +33,31 @@ class PackageModudle(TestCase):
             b += dna.int2bytes(i, n=1)
         self.assertTrue(b == c.mask_bytes(c.mask_bytes(b)))
 
+    def test_rand_mask_chunks(self):
+        """Masking chunk by chunk using offsets must be the same as masking at once"""
+        c = package.Container(logging_file=logging_file)
+        b = os.urandom(3000)
+        chunks = [c.mask_bytes(b[i : i + 700], offset=i) for i in range(0, 3000, 700)]
+        self.assertTrue(b"".join(chunks) == c.mask_bytes(b))
+        self.assertTrue(c.mask_bytes(c.mask_bytes(b[:100])) == b[:100])
+        # masked in place, by chunks smaller than the data
+        out = bytearray(2900)
+        c.mask_bytes(memoryview(b)[100:], offset=100, out=out, chunk_size=500)
+        self.assertTrue(out == c.mask_bytes(b)[100:])
+
+    def test_index_make_and_read(self):
+        """Reading back the index must give segments numbers and countdowns"""
+        c = package.Container(logging_file=logging_file)
+        c.numblocks, c.dblocksize, c.dnecso, c.dn = 2, 400, 70, 750
+        index = c.make_index(0, c.dn)
+        indices, count_downs = c.read_index(index)
+        self.assertTrue(indices == list(range(c.dn)))
+        self.assertTrue(count_downs[:70] == list(range(69, -1, -1)))
+        self.assertTrue(count_downs[70:144] == [0] * 74)
+        self.assertTrue(count_downs[144:400] == list(range(255, -1, -1)))
+        self.assertTrue(count_downs[749] == 0 and count_downs[748] == 1)
+        self.assertTrue(c.make_index(300, 500) == index[300 * c.dI : 500 * c.dI])
+
     def test_primers_management(self):
         """Tests identity after adding and removing primers"""
         sequence = "A"
@@ -0,0 +1,86 @@
+from unittest import TestCase
+import os
+import io
+import random
+
+from archive2dna import package
+
+# directories setup
+test_package = "tests/data/aip_olos.zip"
+test_package = test_package.replace("/", os.sep)
+test_tmp_dir = "tests/tmp/"
+test_tmp_dir = test_tmp_dir.replace("/", os.sep)
+logging_file = test_tmp_dir + "tests.log"
+
+if not os.path.isdir(test_tmp_dir):
+    os.mkdir(test_tmp_dir)
+
+
+def decode_external(dna_bytes, **kwargs):
+    c = package.Container(mo=8, logging_file=logging_file)
+    out = io.BytesIO()
+    c.decode_external(io.BytesIO(dna_bytes), out, tmp_dir=test_tmp_dir, **kwargs)
+    return out.getvalue(), c.compute_stats()
+
+
+class ExternalDecoding(TestCase):
+    def setUp(self):
+        with open(test_package, "rb") as f:
+            self.binary_data = f.read()
+        c = package.Container(mo=8, logging_file=logging_file)
+        c.load_binary(self.binary_data)
+        c.create_logical_redundancy()
+        c.convert_to_dna()
+        self.container = c
+        self.segments = c.dna
+
+    def test_decode(self):
+        """Test external decoding returns the same data and statistics as in memory"""
+        segments = self.segments[:100] + self.segments[101:]
+        segments[1500] = segments[1500][:10] + "A" + segments[1500][11:]
+        segments[2000] = segments[2000][:10] + segments[2000][11:]
+        text = "\n".join(segments)
+
+        c = package.Container(mo=8, logging_file=logging_file)
+        c.load_dna(text)
+        self.assertEqual(c.decode_binary(), self.binary_data)
+        stats = c.compute_stats()
+
+        for chunk_size in [300, 2**16]:
+            binary_data, external_stats = decode_external(
+                text.encode(), chunk_size=chunk_size
+            )
+            self.assertEqual(binary_data, self.binary_data)
+            self.assertEqual(external_stats, stats)
+
+    def test_shuffled(self):
+        """Test external decoding of segments in random order"""
+        segments = random.Random(1).sample(self.segments, len(self.segments))
+        segments = segments[:50] + segments[51:]
+        binary_data, stats = decode_external(
+            "\n".join(segments).encode(), chunk_size=500
+        )
+        self.assertEqual(binary_data, self.binary_data)
+        self.assertEqual(stats["corrections"]["segments_lost"], "1")
+
+    def test_formats(self):
+        """Test external decoding of gzip compressed FASTA and binary DNA files"""
+        for dna_format, compress in [("fasta", True), ("binary", False)]:
+            dna_bytes = self.container.write_dna(None, dna_format, compress)
+            binary_data, stats = decode_external(dna_bytes, chunk_size=1000)
+            self.assertEqual(binary_data, self.binary_data)
+
+    def test_duplicates(self):
+        """Test segments read several times are decoded once, in memory and externally"""
+        segments = self.segments[:1000] + self.segments[10:12] + self.segments[1000:]
+        text = "\n".join(segments)
+
+        c = package.Container(mo=8, logging_file=logging_file)
+        c.load_dna(text)
+        self.assertEqual(c.decode_binary(), self.binary_data)
+        stats = c.compute_stats()
+        self.assertEqual(stats["corrections"]["segments_lost"], "0")
+
+        binary_data, external_stats = decode_external(text.encode(), chunk_size=500)
+        self.assertEqual(binary_data, self.binary_data)
+        self.assertEqual(external_stats, stats)
@@ -107,3 +107,94 @@ class PackageModudle(TestCase):
         h1 = bytesutils.sha256(test_package)
         h2 = bytesutils.sha256(test_aip_tmp)
         self.assertTrue(h1 == h2)
+
+    def test_mi6(self):
+        """Test inner symbols of 6 bits (index not aligned on bytes)"""
+
+        test_package = "tests/data/aip_olos2.zip"
+        test_package = test_package.replace("/", os.sep)
+        parameters = {"mi": 6, "index_length": 30, "index_positions": 24}
+
+        # from bytes to DNA
+        with open(test_package, "rb") as f:
+            binary_data = f.read()
+        c = package.Container(package_id=None, logging_file=logging_file, **parameters)
+        c.load_binary(binary_data)
+        c.create_logical_redundancy()
+        c.convert_to_dna()
+        text = c.write_dna()
+
+        # from DNA to bytes
+        c = package.Container(logging_file=logging_file, **parameters)
+        c.load_dna(text)
+        c.check_and_correct_logical_redundancy()
+        binary_data = c.write_binary()
+        with open(test_aip_tmp, "wb") as f:
+            f.write(binary_data)
+
+        # check if input and output are the sha256 the same
+        h1 = bytesutils.sha256(test_package)
+        h2 = bytesutils.sha256(test_aip_tmp)
+        self.assertTrue(h1 == h2)
+
+    def test_blocks(self):
+        """Test data split in more blocks than required (blocks and max_blocksize options),
+        layout is read back from the index without parameters"""
+
+        test_package = "tests/data/aip_olos.zip"
+        test_package = test_package.replace("/", os.sep)
+        with open(test_package, "rb") as f:
+            binary_data = f.read()
+
+        for options in [{"blocks": 4}, {"max_blocksize": 300}]:
+            # from bytes to DNA
+            c = package.Container(logging_file=logging_file, **options)
+            c.load_binary(binary_data)
+            c.create_logical_redundancy()
+            c.convert_to_dna()
+            self.assertGreaterEqual(c.numblocks, 4)
+            self.assertLessEqual(c.dblocksize, options.get("max_blocksize", c.dn))
+            self.assertAlmostEqual(c.dnecso * c.numblocks / c.dn, 0.4, delta=0.02)
+            segments = remove_segments(c.dna, n=100)
+            segments[200] = replace_base(segments[200])
+
+            # from DNA to bytes
+            c2 = package.Container(logging_file=logging_file)
+            c2.load_dna("\n".join(segments))
+            c2.check_and_correct_logical_redundancy()
+            self.assertEqual(
+                (c2.numblocks, c2.dblocksize, c2.dnecso),
+                (c.numblocks, c.dblocksize, c.dnecso),
+            )
+            self.assertEqual(c2.write_binary(), binary_data)
+
+        # last block of a single (short) data column: lines past it have an empty
+        # outer message and zero ecc
+        with open("tests/data/aip_matterhorn.zip".replace("/", os.sep), "rb") as f:
+            matterhorn = f.read()
+        for workers in [1, 2]:
+            c = package.Container(
+                mo=8,
+                blocks=100,
+                auto_zip=False,
+                workers=workers,
+                logging_file=logging_file,
+            )
+            c.load_binary(matterhorn)
+            self.assertEqual(c.dk - (c.numblocks - 1) * (c.dblocksize - c.dnecso), 1)
+            c.create_logical_redundancy()
+            c.convert_to_dna()
+            segments = remove_segments(c.dna, n=len(c.dna) - 10)
+            segments[-5] = replace_base(segments[-5], pos=40)
+            c2 = package.Container(
+                mo=8, auto_zip=False, workers=workers, logging_file=logging_file
+            )
+            c2.load_dna("\n".join(segments))
+            c2.check_and_correct_logical_redundancy()
+            self.assertEqual(c2.numblocks, c.numblocks)
+            self.assertEqual(c2.write_binary(), matterhorn)
+
+        # a block holds at least dmo data columns and their ecc columns
+        c = package.Container(mo=8, max_blocksize=5, logging_file=logging_file)
+        with self.assertRaises(ValueError):
+            c.load_binary(binary_data)
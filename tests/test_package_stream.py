@@ -0,0 +1,91 @@
+from unittest import TestCase
+import os
+import io
+
+from archive2dna import package
+
+# directories setup
+test_package = "tests/data/aip_olos.zip"
+test_package = test_package.replace("/", os.sep)
+test_tmp_dir = "tests/tmp/"
+test_tmp_dir = test_tmp_dir.replace("/", os.sep)
+logging_file = test_tmp_dir + "tests.log"
+
+if not os.path.isdir(test_tmp_dir):
+    os.mkdir(test_tmp_dir)
+
+
+def encode(binary_data, **kwargs):
+    c = package.Container(logging_file=logging_file, **kwargs)
+    c.load_binary(binary_data)
+    c.create_logical_redundancy()
+    c.convert_to_dna()
+    return c.dna
+
+
+class PackageStream(TestCase):
+    def test_encode_stream_identical(self):
+        """Test streaming encoder returns the same segments as in memory encoding"""
+        with open(test_package, "rb") as f:
+            binary_data = f.read()
+        for mo in [14, 8]:  # one and several blocks
+            segments = encode(binary_data, package_id="olos:1", mo=mo, auto_zip=False)
+            c = package.Container(
+                package_id="olos:1", mo=mo, auto_zip=False, logging_file=logging_file
+            )
+            with open(test_package, "rb") as f:
+                segments_stream = list(c.encode_stream(f))
+            self.assertEqual(segments, segments_stream)
+            stats = c.compute_stats()
+            self.assertEqual(stats["dna_segments"]["count"], str(len(segments)))
+
+    def test_encode_stream_roundtrip(self):
+        """Test streaming encoder (zipped package) decodes back"""
+        with open(test_package, "rb") as f:
+            binary_data = f.read()
+        c = package.Container(mo=8, logging_file=logging_file)
+        text = "\n".join(c.encode_stream(io.BytesIO(binary_data)))
+        c2 = package.Container(mo=8, logging_file=logging_file)
+        c2.load_dna(text)
+        c2.check_and_correct_logical_redundancy()
+        self.assertEqual(c2.write_binary(), binary_data)
+
+    def test_write_binary_stream(self):
+        """Test decoding written to a file object (zipped and not zipped package)"""
+        with open(test_package, "rb") as f:
+            binary_data = f.read()
+        for auto_zip in [True, False]:
+            text = "\n".join(encode(binary_data, mo=8, auto_zip=auto_zip))
+            c = package.Container(mo=8, auto_zip=auto_zip, logging_file=logging_file)
+            c.load_dna(text)
+            c.check_and_correct_logical_redundancy()
+            out = io.BytesIO()
+            size = c.write_binary(out)
+            self.assertEqual(size, len(binary_data))
+            self.assertEqual(out.getvalue(), binary_data)
+
+    def test_write_dna_formats(self):
+        """Test DNA written as text or FASTA, gzip compressed or not, reads back"""
+        with open(test_package, "rb") as f:
+            binary_data = f.read()
+        c = package.Container(package_id="olos:1", logging_file=logging_file)
+        c.load_binary(binary_data)
+        c.create_logical_redundancy()
+        c.convert_to_dna()
+        self.assertEqual(c.write_dna(), "\n".join(c.dna))
+        for dna_format in ["text", "fasta"]:
+            for compress in [False, True]:
+                out = io.BytesIO()
+                c.write_dna(out, dna_format=dna_format, compress=compress)
+                if not compress:
+                    text = c.write_dna(dna_format=dna_format)
+                    self.assertEqual(out.getvalue(), text.encode("ascii"))
+                c2 = package.Container(package_id="olos:1", logging_file=logging_file)
+                c2.read_dna(io.BytesIO(out.getvalue()))
+                self.assertEqual(c2.dna, c.dna)
+        fasta = c.write_dna(dna_format="fasta")
+        self.assertTrue(fasta.startswith(">segment_0\n" + c.dna[0] + "\n"))
+        # compressed or binary DNA is not written to a text stream without buffer
+        for dna_format, compress in [("text", True), ("binary", False)]:
+            with self.assertRaises(ValueError):
+                c.write_dna(io.StringIO(), dna_format=dna_format, compress=compress)
@@ -0,0 +1,152 @@
+from unittest import TestCase
+import os
+import io
+import random
+import array
+import concurrent.futures
+from unittest import mock
+
+from archive2dna import dna
+from archive2dna import package
+from archive2dna import parallel
+
+# directories setup
+test_package = "tests/data/aip_olos.zip"
+test_package = test_package.replace("/", os.sep)
+test_tmp_dir = "tests/tmp/"
+test_tmp_dir = test_tmp_dir.replace("/", os.sep)
+logging_file = test_tmp_dir + "tests.log"
+
+if not os.path.isdir(test_tmp_dir):
+    os.mkdir(test_tmp_dir)
+
+
+class ParallelModule(TestCase):
+    def test_row_ranges(self):
+        """Test rows are split in contiguous ranges covering all rows"""
+        self.assertEqual(parallel.row_ranges(10, 3), [(0, 3), (3, 6), (6, 10)])
+        self.assertEqual(parallel.row_ranges(2, 4), [(0, 1), (1, 2)])
+        self.assertEqual(parallel.row_ranges(0, 4), [])
+
+    def test_matrix_by_columns(self):
+        """Test rows of a matrix stored by columns are the lines of its columns, a short
+        column being skipped, and are written in place"""
+        columns = [b"\x00\x01\x02", b"\x03\x00\x01", b"\x02\x03"]
+        matrix = parallel.SharedMatrix.from_columns(columns, 3)
+        try:
+            self.assertEqual(matrix.lengths, [3, 3, 2])
+            self.assertEqual(matrix.row(0), b"\x00\x03\x02")
+            self.assertEqual(matrix.row(2), b"\x02\x01")
+            self.assertEqual(matrix.row(1, 1), b"\x00\x03")
+            matrix.setrow(1, b"\x02\x02", start=1)
+            matrix.setrow(2, b"\x03\x03")
+            self.assertEqual(
+                [matrix.column(k) for k in range(3)],
+                [b"\x00\x01\x03", b"\x03\x02\x03", b"\x02\x02"],
+            )
+        finally:
+            matrix.close(unlink=True)
+
+    def test_matrix_short_columns(self):
+        """Test rows of a matrix stored by columns skip short columns anywhere, columns
+        may be arrays of the representation"""
+        columns = [b"\x00\x01\x02", b"\x03", array.array("b", [1, 2, 3]), b"\x02\x03"]
+        matrix = parallel.SharedMatrix.from_columns(columns, 3)
+        try:
+            self.assertEqual(matrix.lengths, [4, 3, 2])
+            self.assertEqual(matrix.row(0), b"\x00\x03\x01\x02")
+            self.assertEqual(matrix.row(1), b"\x01\x02\x03")
+            self.assertEqual(matrix.row(2), b"\x02\x03")
+            self.assertEqual(matrix.row(1, 1), b"\x02\x03")
+            matrix.setrow(2, b"\x01\x01")
+            matrix.setrow(1, b"\x00", start=2)
+            self.assertEqual(
+                [matrix.column(k) for k in range(4)],
+                [b"\x00\x01\x01", b"\x03", b"\x01\x02\x01", b"\x02\x00"],
+            )
+        finally:
+            matrix.close(unlink=True)
+
+    def test_workers(self):
+        """Test inner and outer coding on worker processes give the same results as in one
+        process (including corrections and segments beyond repair)"""
+        with open(test_package, "rb") as f:
+            binary_data = f.read()
+        results = []
+        for workers in [1, 2]:
+            c = package.Container(
+                mo=8, workers=workers, auto_zip=False, logging_file=logging_file
+            )
+            c.load_binary(binary_data)
+            c.create_logical_redundancy()
+            c.convert_to_dna()
+            random.seed(1)
+            segments = [dna.corrupt_dna_segment(s, 0.005) for s in c.dna]
+            for i in [30, 300, 1000]:  # beyond repair
+                segments[i] = dna.corrupt_dna_segment(segments[i], 0.05)
+            c2 = package.Container(
+                mo=8, workers=workers, auto_zip=False, logging_file=logging_file
+            )
+            c2.load_dna("\n".join(segments[:10] + segments[20:]))
+            c2.check_and_correct_logical_redundancy()
+            self.assertEqual(c2.write_binary(), binary_data)
+            results.append(
+                (
+                    c.dna,
+                    c2.inner_corrections,
+                    c2.segments_beyond_repair,
+                    c2.outer_corrections,
+                    c2.error_message,
+                )
+            )
+        self.assertGreater(results[0][2], 0)
+        self.assertEqual(results[0], results[1])
+
+    def test_decode_blocks(self):
+        """Test blocks decoded as independent tasks, and isolation of a failed block"""
+        with open(test_package, "rb") as f:
+            binary_data = f.read()
+        c = package.Container(mo=8, auto_zip=False, logging_file=logging_file)
+        c.load_binary(binary_data)
+        c.create_logical_redundancy()
+        c.convert_to_dna()
+        random.seed(2)
+        segments = [dna.corrupt_dna_segment(s, 0.005) for s in c.dna]
+        text = "\n".join(segments)
+
+        results = []
+        for workers in [1, 3]:
+            c2 = package.Container(
+                mo=8, workers=workers, auto_zip=False, logging_file=logging_file
+            )
+            c2.load_dna(text)
+            out = io.BytesIO()
+            c2.decode_binary(out)
+            self.assertEqual(out.getvalue(), binary_data)
+            results.append((c2.outer_corrections, c2.error_message))
+        self.assertEqual(results[0], results[1])
+
+        # failure of the task of block 1 (tasks are submitted in block order)
+        decode_rows = parallel.outer_decode_rows
+        calls = []
+
+        def failing_decode_rows(*args):
+            calls.append(args)
+            if len(calls) == 2:
+                raise RuntimeError("worker failure")
+            return decode_rows(*args)
+
+        c3 = package.Container(
+            mo=8, workers=3, auto_zip=False, logging_file=logging_file
+        )
+        c3.load_dna(text)
+        c3.decode_inner_code()
+        c3.sort_segments()
+        outerCoder = package.RSCodec(c3.necso, nsize=c3.n)
+        with mock.patch.object(parallel, "outer_decode_rows", failing_decode_rows):
+            with concurrent.futures.ThreadPoolExecutor(3) as pool:
+                blocks = list(c3.outer_decoded_blocks(outerCoder, pool))
+        self.assertEqual(blocks, [0, 1, 2])
+        self.assertTrue(c3.error)
+        self.assertIn("Block:1. Error: worker failure", c3.error_message)
+        self.assertGreater(c3.outer_corrections, 0)
@@ -0,0 +1,68 @@
+from unittest import TestCase
+import os
+import io
+import zipfile
+
+from archive2dna import package
+from archive2dna import partial
+
+# directories setup
+test_package = "tests/data/aip_matterhorn.zip"
+test_package = test_package.replace("/", os.sep)
+test_tmp_dir = "tests/tmp/"
+test_tmp_dir = test_tmp_dir.replace("/", os.sep)
+logging_file = test_tmp_dir + "tests.log"
+
+if not os.path.isdir(test_tmp_dir):
+    os.mkdir(test_tmp_dir)
+
+
+def encode(binary_data, **kwargs):
+    c = package.Container(logging_file=logging_file, **kwargs)
+    c.load_binary(binary_data)
+    c.create_logical_redundancy()
+    c.convert_to_dna()
+    return c.dna
+
+
+def open_binary(segments, **kwargs):
+    c = package.Container(logging_file=logging_file, **kwargs)
+    c.load_dna("\n".join(segments))
+    return partial.open_binary(c)
+
+
+class PartialDecoding(TestCase):
+    def setUp(self):
+        with open(test_package, "rb") as f:
+            self.binary_data = f.read()
+
+    def test_member(self):
+        """Test a member of a stored package is decoded from its blocks only"""
+        segments = encode(self.binary_data, mo=8, zip_stored=True)
+        segments = segments[:100] + segments[101:]
+        segments[3000] = segments[3000][:10] + "A" + segments[3000][11:]
+        binary = open_binary(segments, mo=8)
+        self.assertIsInstance(binary, partial.RangeFile)
+
+        with zipfile.ZipFile(io.BytesIO(self.binary_data)) as zip_file:
+            member = zip_file.read("mets.xml")
+        self.assertEqual(partial.read_member(binary, "mets.xml"), member)
+        self.assertEqual(binary.f.decoded, {0, 14})  # first block, and last of 15
+        self.assertEqual(
+            partial.read_range(binary, 1000, 5000), self.binary_data[1000:5000]
+        )
+
+    def test_range(self):
+        """Test byte ranges of packages not zipped, and zipped with compression"""
+        segments = encode(self.binary_data, mo=8, auto_zip=False)
+        binary = open_binary(segments, mo=8, auto_zip=False)
+        self.assertEqual(
+            partial.read_range(binary, 60000, 60100), self.binary_data[60000:60100]
+        )
+        self.assertEqual(binary.decoded, {7})
+
+        segments = encode(self.binary_data[:20000], mo=8)
+        binary = open_binary(segments, mo=8)
+        self.assertEqual(
+            partial.read_range(binary, 1000, 2000), self.binary_data[1000:2000]
+        )
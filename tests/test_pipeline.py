@@ -0,0 +1,62 @@
+from unittest import TestCase
+import os
+import io
+import time
+
+from archive2dna import pipeline
+from archive2dna import package
+
+# directories setup
+test_package = "tests/data/aip_olos.zip"
+test_package = test_package.replace("/", os.sep)
+test_tmp_dir = "tests/tmp/"
+test_tmp_dir = test_tmp_dir.replace("/", os.sep)
+logging_file = test_tmp_dir + "tests.log"
+
+if not os.path.isdir(test_tmp_dir):
+    os.mkdir(test_tmp_dir)
+
+
+class PipelineModule(TestCase):
+    def test_run_order(self):
+        """Test pipeline output is in order, with or without threads"""
+
+        def slow_square(x):
+            time.sleep(0.01 * (x % 3))
+            return x * x
+
+        stages = [slow_square, lambda x: x + 1]
+        expected = [x * x + 1 for x in range(20)]
+        for depth in [0, 1, 3]:
+            self.assertEqual(list(pipeline.run(range(20), stages, depth)), expected)
+
+    def test_run_error(self):
+        """Test an exception raised in a stage is re-raised by the consumer"""
+
+        def fail(x):
+            if x == 5:
+                raise ValueError("stage failure")
+            return x
+
+        with self.assertRaises(ValueError):
+            list(pipeline.run(range(100), [fail, lambda x: x], 2))
+
+    def test_package_pipeline(self):
+        """Test pipelined encoding and decoding give the same results as sequential ones"""
+        with open(test_package, "rb") as f:
+            binary_data = f.read()
+        texts = []
+        for depth in [0, 2]:
+            c = package.Container(
+                mo=8, auto_zip=False, pipeline_depth=depth, logging_file=logging_file
+            )
+            texts.append("\n".join(c.encode_stream(io.BytesIO(binary_data))))
+        self.assertEqual(texts[0], texts[1])
+        for depth in [0, 2]:
+            c = package.Container(
+                mo=8, auto_zip=False, pipeline_depth=depth, logging_file=logging_file
+            )
+            c.load_dna(texts[0])
+            out = io.BytesIO()
+            c.decode_binary(out)
+            self.assertEqual(out.getvalue(), binary_data)
@@ -0,0 +1,68 @@
+from unittest import TestCase
+import os
+
+from archive2dna import package
+
+# directories setup
+test_package = "tests/data/aip_olos.zip"
+test_package = test_package.replace("/", os.sep)
+test_tmp_dir = "tests/tmp/"
+test_tmp_dir = test_tmp_dir.replace("/", os.sep)
+logging_file = test_tmp_dir + "tests.log"
+
+if not os.path.isdir(test_tmp_dir):
+    os.mkdir(test_tmp_dir)
+
+
+class RegenerateSegments(TestCase):
+    def setUp(self):
+        with open(test_package, "rb") as f:
+            self.binary_data = f.read()
+        c = package.Container(mo=8, package_id="olos:1", logging_file=logging_file)
+        c.load_binary(self.binary_data)
+        c.create_logical_redundancy()
+        c.convert_to_dna()
+        self.container = c
+        self.segments = c.dna
+
+    def decode(self, reads):
+        c = package.Container(mo=8, package_id="olos:1", logging_file=logging_file)
+        c.load_dna("\n".join(reads))
+        c.decode_binary()
+        return c
+
+    def test_regenerate(self):
+        """Test lost and beyond repair segments (ecc and data) are regenerated"""
+        lost = [5, 100, 101, 1200, 2000]
+        reads = [x for i, x in enumerate(self.segments) if i not in lost]
+        # segment 303 (300 once 5, 100 and 101 are removed) beyond repair
+        reads[300] = (
+            reads[300][:30]
+            + "".join(["C" if b == "A" else "A" for b in reads[300][30:60]])
+            + reads[300][60:]
+        )
+        c = self.decode(reads)
+        self.assertEqual(c.binary_data, self.binary_data)
+        self.assertEqual(c.lost_indexes, [5, 100, 101, 303, 1200, 2000])
+        segments = c.regenerate_segments()
+        self.assertEqual(segments, [self.segments[i] for i in c.lost_indexes])
+        self.assertEqual(
+            c.regenerate_segments([0, 2500]),
+            [self.segments[0], self.segments[2500]],
+        )
+
+        # topped up pool (in order, see sort_segments)
+        for i, segment in zip(c.lost_indexes, segments):
+            reads.insert(i, segment)
+        c = self.decode(reads)
+        self.assertEqual(c.binary_data, self.binary_data)
+        self.assertEqual(c.lost_indexes, [])
+
+    def test_not_decoded(self):
+        """Test segments are not regenerated if decoding failed"""
+        block_start = self.container.dblocksize
+        reads = self.segments[:block_start] + self.segments[block_start + 700 :]
+        c = package.Container(mo=8, package_id="olos:1", logging_file=logging_file)
+        c.load_dna("\n".join(reads))
+        c.check_and_correct_logical_redundancy()
+        self.assertRaises(ValueError, c.regenerate_segments)
@@ -0,0 +1,241 @@
+from unittest import TestCase
+import os
+import io
+import json
+import random
+import zipfile
+
+from archive2dna import package
+from archive2dna import zipalign
+
+# directories setup
+test_package = "tests/data/aip_olos.zip"
+test_package = test_package.replace("/", os.sep)
+test_tmp_dir = "tests/tmp/"
+test_tmp_dir = test_tmp_dir.replace("/", os.sep)
+logging_file = test_tmp_dir + "tests.log"
+
+if not os.path.isdir(test_tmp_dir):
+    os.mkdir(test_tmp_dir)
+
+
+def make_zip(members):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zip_file:
+        for name, content in members:
+            info = zipfile.ZipInfo(name, date_time=(2022, 2, 2, 0, 0, 0))
+            zip_file.writestr(info, content)
+    return buffer.getvalue()
+
+
+def read_members(binary_data):
+    with zipfile.ZipFile(io.BytesIO(binary_data)) as zip_file:
+        return [(name, zip_file.read(name)) for name in zip_file.namelist()]
+
+
+class Stream(io.RawIOBase):
+    """Non seekable binary stream (e.g. stdin)."""
+
+    def __init__(self, data):
+        self.data = io.BytesIO(data)
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        return self.data.readinto(b)
+
+
+class BlockAlignedRevision(TestCase):
+    def setUp(self):
+        with open(test_package, "rb") as f:
+            self.members = read_members(f.read())
+        self.binary_data = make_zip(self.members)
+        c = package.Container(
+            mo=8,
+            package_id="olos:1",
+            block_aligned=True,
+            max_blocksize=300,
+            logging_file=logging_file,
+        )
+        self.segments = list(c.encode_stream(io.BytesIO(self.binary_data)))
+        self.manifest = json.loads(json.dumps(c.layout_manifest()))
+        self.container = c
+
+    def decode(self, segments, manifest):
+        c = package.Container.from_manifest(manifest, logging_file=logging_file)
+        c.load_dna("\n".join(segments))
+        binary_data = c.decode_binary()
+        self.assertFalse(c.error)
+        return binary_data
+
+    def test_aligned(self):
+        """Test members start on blocks, and the aligned package decodes to them"""
+        c = package.Container(
+            mo=8,
+            package_id="olos:1",
+            block_aligned=True,
+            max_blocksize=300,
+            logging_file=logging_file,
+        )
+        c.load_binary(self.binary_data)
+        c.create_logical_redundancy()
+        c.convert_to_dna()
+        self.assertEqual(c.dna, self.segments)
+
+        binary_data = self.decode(self.segments, self.manifest)
+        self.assertEqual(read_members(binary_data), self.members)
+        block_bases = c.block_bases()
+        with zipfile.ZipFile(io.BytesIO(binary_data)) as zip_file:
+            for info in zip_file.infolist():
+                blk = -(-4 * info.header_offset // block_bases)
+                self.assertEqual(info.header_offset, -(-blk * block_bases // 4))
+
+    def test_revision(self):
+        """Test a revision only encodes the blocks of changed members"""
+        members = list(self.members)
+        members[1] = (members[1][0], members[1][1].replace(b"a", b"b", 3))
+        binary_data = make_zip(members)
+
+        c = package.Container.from_manifest(self.manifest, logging_file=logging_file)
+        delta = list(c.encode_revision(io.BytesIO(binary_data)))
+        delta_segments = list(delta)
+        manifest = json.loads(json.dumps(c.layout_manifest()))
+        # blocks of the changed member and of the central directory
+        self.assertEqual(len(c.revised_blocks), 2)
+        self.assertEqual(c.revised_blocks[-1], c.numblocks - 1)
+
+        # segments of revised blocks replace the previous ones
+        segments = self.segments[: c.dn]
+        delta = iter(delta)
+        for blk in c.revised_blocks:
+            block_start = blk * c.dblocksize
+            for i in range(block_start, min([block_start + c.dblocksize, c.dn])):
+                segments[i] = next(delta)
+        self.assertIsNone(next(delta, None))
+
+        full = package.Container.from_manifest(self.manifest, logging_file=logging_file)
+        self.assertEqual(list(full.encode_stream(io.BytesIO(binary_data))), segments)
+        self.assertEqual(read_members(self.decode(segments, manifest)), members)
+
+        # revised package read from a non seekable stream
+        c = package.Container.from_manifest(self.manifest, logging_file=logging_file)
+        self.assertEqual(list(c.encode_revision(Stream(binary_data))), delta_segments)
+
+    def test_slack(self):
+        """Test a member growing within its spare blocks does not move the following ones,
+        whose blocks and segments are unchanged"""
+        block_bases = self.container.block_bases()
+        members = list(self.members)
+        # member grown into its spare block: gap to the next member but an eighth of block
+        with zipfile.ZipFile(io.BytesIO(self.binary_data)) as zip_file:
+            infos = zip_file.infolist()
+        offsets = self.manifest["members"]
+        size = infos[2].header_offset - infos[1].header_offset
+        gap = offsets[infos[2].filename] - offsets[infos[1].filename] - size
+        self.assertGreater(gap, block_bases // 4)
+        grown = random.Random(1).randbytes(gap - block_bases // 8)  # not compressed
+        members[1] = (members[1][0], members[1][1] + grown)
+        binary_data = make_zip(members)
+
+        c = package.Container.from_manifest(self.manifest, logging_file=logging_file)
+        with self.assertNoLogs(level="WARNING"):
+            list(c.encode_revision(io.BytesIO(binary_data)))
+        self.assertEqual(c.members, self.manifest["members"])
+
+        # blocks from the next member to the central directory are not revised
+        start = -(-4 * c.members[members[2][0]] // block_bases) * c.dblocksize
+        stop = (c.numblocks - 1) * c.dblocksize
+        self.assertTrue(
+            all([(b + 1) * c.dblocksize <= start for b in c.revised_blocks[:-1]])
+        )
+        full = package.Container.from_manifest(self.manifest, logging_file=logging_file)
+        segments = list(full.encode_stream(io.BytesIO(binary_data)))
+        self.assertEqual(segments[start:stop], self.segments[start:stop])
+
+    def test_moved_members(self):
+        """Test members following a member grown beyond its spare blocks are reported as
+        moved"""
+        block_bases = self.container.block_bases()
+        members = list(self.members)
+        grown = random.Random(1).randbytes(3 * block_bases // 4)  # not compressed
+        members[1] = (members[1][0], members[1][1] + grown)
+        binary_data = make_zip(members)
+
+        c = package.Container.from_manifest(self.manifest, logging_file=logging_file)
+        with self.assertLogs(level="WARNING") as logs:
+            delta = list(c.encode_revision(io.BytesIO(binary_data)))
+        for name, content in members[2:]:
+            self.assertIn(repr(name), logs.output[0])
+            self.assertNotEqual(c.members[name], self.manifest["members"][name])
+        self.assertNotIn(repr(members[0][0]), logs.output[0])
+
+        segments = self.segments[: c.dn] + [""] * (c.dn - len(self.segments))
+        delta = iter(delta)
+        for blk in c.revised_blocks:
+            block_start = blk * c.dblocksize
+            for i in range(block_start, min([block_start + c.dblocksize, c.dn])):
+                segments[i] = next(delta)
+        manifest = json.loads(json.dumps(c.layout_manifest()))
+        self.assertEqual(read_members(self.decode(segments, manifest)), members)
+
+    def test_not_aligned(self):
+        """Test revisions require a block aligned package, and aligned ZIP files"""
+        c = package.Container(mo=8, logging_file=logging_file)
+        c.load_binary(self.binary_data)
+        c = package.Container.from_manifest(
+            c.layout_manifest(), logging_file=logging_file
+        )
+        with self.assertRaises(ValueError):
+            list(c.encode_revision(io.BytesIO(self.binary_data)))
+        with self.assertRaises(ValueError):
+            zipalign.align_zip(io.BytesIO(b"not a zip"), io.BytesIO(), lambda p, n: p)
+
+    def test_shared_byte(self):
+        """Test a change in a byte holding bases of two blocks revises both blocks"""
+        content = bytes(range(256)) * 24
+
+        def make_stored_zip(content):
+            buffer = io.BytesIO()
+            with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED) as zip_file:
+                info = zipfile.ZipInfo("data.bin", date_time=(2022, 2, 2, 0, 0, 0))
+                zip_file.writestr(info, content)
+            return buffer.getvalue()
+
+        c = package.Container(
+            mo=14,
+            index_length=34,
+            package_id="olos:1",
+            block_aligned=True,
+            max_blocksize=67,
+            logging_file=logging_file,
+        )
+        binary_data = make_stored_zip(content)
+        segments = list(c.encode_stream(io.BytesIO(binary_data)))
+        manifest = json.loads(json.dumps(c.layout_manifest()))
+        block_bases = c.block_bases()
+        self.assertNotEqual(block_bases % 4, 0)
+        self.assertEqual(
+            read_members(self.decode(segments, manifest)), read_members(binary_data)
+        )
+
+        # first base of the byte is the last one of block blk - 1
+        start = binary_data.index(content)
+        blk = next(b for b in range(3, c.numblocks) if b * block_bases % 4 != 0)
+        position = blk * block_bases // 4 - start
+        content = bytearray(content)
+        content[position] ^= 0x80
+        binary_data = make_stored_zip(bytes(content))
+
+        c = package.Container.from_manifest(manifest, logging_file=logging_file)
+        list(c.encode_revision(io.BytesIO(binary_data)))
+        full = package.Container.from_manifest(manifest, logging_file=logging_file)
+        revised = list(full.encode_stream(io.BytesIO(binary_data)))
+        changed = [
+            b
+            for b in range(c.numblocks)
+            if segments[b * c.dblocksize : (b + 1) * c.dblocksize]
+            != revised[b * c.dblocksize : (b + 1) * c.dblocksize]
+        ]
+        self.assertIn(blk - 1, changed)
+        self.assertTrue(set(changed) <= set(c.revised_blocks))
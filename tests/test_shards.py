@@ -0,0 +1,89 @@
+from unittest import TestCase
+import os
+import io
+import shutil
+
+from archive2dna import package
+from archive2dna import shards
+
+# directories setup
+test_package = "tests/data/aip_olos.zip"
+test_package = test_package.replace("/", os.sep)
+test_tmp_dir = "tests/tmp/"
+test_tmp_dir = test_tmp_dir.replace("/", os.sep)
+test_job_dir = test_tmp_dir + "job"
+logging_file = test_tmp_dir + "tests.log"
+
+if not os.path.isdir(test_tmp_dir):
+    os.mkdir(test_tmp_dir)
+
+
+def encode(binary_data, **kwargs):
+    c = package.Container(logging_file=logging_file, **kwargs)
+    c.load_binary(binary_data)
+    c.create_logical_redundancy()
+    c.convert_to_dna()
+    return c.dna
+
+
+def run_all(directory, job):
+    for k in range(len(job["shards"])):
+        shards.run_shard(directory, k, logging_file=logging_file)
+
+
+class ShardsModule(TestCase):
+    def setUp(self):
+        shutil.rmtree(test_job_dir, ignore_errors=True)
+        with open(test_package, "rb") as f:
+            self.binary_data = f.read()
+
+    def tearDown(self):
+        shutil.rmtree(test_job_dir, ignore_errors=True)
+
+    def test_encode(self):
+        """Test sharded encoding returns the same segments as in memory encoding"""
+        parameters = {"package_id": "olos:1", "blocks": 3, "auto_zip": False}
+        segments = encode(self.binary_data, **parameters)
+        c = package.Container(logging_file=logging_file, **parameters)
+        job = shards.prepare_encode(c, io.BytesIO(self.binary_data), test_job_dir, 2)
+        self.assertEqual(job["shards"], [[0], [1, 2]])
+        run_all(test_job_dir, job)
+        text = shards.merge(test_job_dir, logging_file=logging_file)
+        self.assertEqual(text, "\n".join(segments))
+
+    def test_decode(self):
+        """Test sharded decoding, with lost and corrupted segments"""
+        segments = encode(self.binary_data, mo=8)
+        segments = segments[:100] + segments[101:]
+        segments[1500] = segments[1500][:10] + "A" + segments[1500][11:]
+        text = "\n".join(segments)
+
+        c = package.Container(mo=8, logging_file=logging_file)
+        c.load_dna(text)
+        c.check_and_correct_logical_redundancy()
+        self.assertEqual(c.write_binary(), self.binary_data)
+        stats = c.compute_stats()
+
+        c = package.Container(mo=8, logging_file=logging_file)
+        job = shards.prepare_decode(c, text, test_job_dir, 2)
+        run_all(test_job_dir, job)
+        out = io.BytesIO()
+        c = shards.merge(test_job_dir, out, logging_file=logging_file)
+        self.assertEqual(out.getvalue(), self.binary_data)
+        self.assertEqual(c.compute_stats(), stats)
+
+    def test_incomplete(self):
+        """Test merge detects missing and stale shards"""
+        c = package.Container(mo=8, logging_file=logging_file)
+        job = shards.prepare_encode(c, io.BytesIO(self.binary_data), test_job_dir, 3)
+        shards.run_shard(test_job_dir, 1, logging_file=logging_file)
+        self.assertEqual(shards.missing_shards(test_job_dir), [0, 2])
+        with self.assertRaises(ValueError):
+            shards.merge(test_job_dir, logging_file=logging_file)
+
+        # shards of a previous job in the same directory are not complete
+        run_all(test_job_dir, job)
+        self.assertEqual(shards.missing_shards(test_job_dir), [])
+        c = package.Container(mo=8, logging_file=logging_file)
+        shards.prepare_encode(c, io.BytesIO(self.binary_data), test_job_dir, 3)
+        self.assertEqual(shards.missing_shards(test_job_dir), [0, 1, 2])